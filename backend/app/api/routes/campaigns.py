@@ -1,17 +1,16 @@
 import asyncio
-import csv
-import io
+import json
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, WebSocket, WebSocketDisconnect, status
+from fastapi import APIRouter, Depends, Query, WebSocket, WebSocketDisconnect, status
 from fastapi.responses import StreamingResponse
-from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.api.deps import get_current_active_user, get_db
+from app.api.streaming import NDJSON_MEDIA_TYPE, export_response, iter_ndjson
 from app.core.security import decode_token
 from app.db.session import async_session
-from app.models import Campaign, CampaignStatus, User
+from app.models import Campaign, CampaignStatus, DeliveryStatus, User
 from app.schemas.campaigns import (
     CampaignActionResponse,
     CampaignCreate,
@@ -20,12 +19,17 @@ from app.schemas.campaigns import (
     CampaignRecipientRead,
 )
 from app.services import campaigns as campaigns_service
+from app.services import progress as progress_service
+from app.services.exports import RECIPIENT_COLUMNS, ExportFormat
+from app.services.queue import get_async_redis_connection
 
 
 router = APIRouter()
 
+TERMINAL_STATUSES = {CampaignStatus.COMPLETED, CampaignStatus.FAILED, CampaignStatus.CANCELLED}
 
-def _serialize_campaign(campaign: Campaign) -> CampaignRead:
+
+def _serialize_campaign(campaign: Campaign, skipped_recipients: int | None = None) -> CampaignRead:
     return CampaignRead(
         id=campaign.id,
         name=campaign.name,
@@ -42,6 +46,10 @@ def _serialize_campaign(campaign: Campaign) -> CampaignRead:
         started_at=campaign.started_at,
         completed_at=campaign.completed_at,
         created_at=campaign.created_at,
+        total_recipients=campaign.total_recipients,
+        sent_count=campaign.sent_count,
+        failed_count=campaign.failed_count,
+        skipped_recipients=skipped_recipients,
         metadata=campaign.meta,
     )
 
@@ -76,8 +84,8 @@ async def create_campaign(
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user),
 ) -> CampaignRead:
-    campaign = await campaigns_service.create_campaign(db, current_user, payload)
-    return _serialize_campaign(campaign)
+    campaign, skipped = await campaigns_service.create_campaign(db, current_user, payload)
+    return _serialize_campaign(campaign, skipped_recipients=skipped)
 
 
 @router.get("/{campaign_id}", response_model=CampaignRead)
@@ -93,14 +101,36 @@ async def get_campaign(
 @router.get("/{campaign_id}/recipients", response_model=list[CampaignRecipientRead])
 async def get_recipients(
     campaign_id: UUID,
+    limit: int = Query(default=500, ge=1, le=1000),
+    after: UUID | None = None,
+    status: DeliveryStatus | None = None,
+    phone_prefix: str | None = None,
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user),
 ) -> list[CampaignRecipientRead]:
     campaign = await campaigns_service.get_campaign(db, current_user, campaign_id)
-    recipients = await campaigns_service.get_campaign_recipients(db, campaign)
+    recipients = await campaigns_service.list_campaign_recipients(
+        db, campaign, limit=limit, after=after, delivery_status=status, phone_prefix=phone_prefix
+    )
     return [_serialize_recipient(r) for r in recipients]
 
 
+@router.get("/{campaign_id}/recipients/stream")
+async def stream_recipients(
+    campaign_id: UUID,
+    after: UUID | None = None,
+    status: DeliveryStatus | None = None,
+    phone_prefix: str | None = None,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user),
+) -> StreamingResponse:
+    campaign = await campaigns_service.get_campaign(db, current_user, campaign_id)
+    query = campaigns_service.recipients_query(
+        campaign, after=after, delivery_status=status, phone_prefix=phone_prefix
+    )
+    return StreamingResponse(iter_ndjson(query, _serialize_recipient), media_type=NDJSON_MEDIA_TYPE)
+
+
 @router.post("/{campaign_id}/start", response_model=CampaignActionResponse)
 async def start(
     campaign_id: UUID,
@@ -160,28 +190,19 @@ async def progress(
 @router.get("/{campaign_id}/export")
 async def export_recipients(
     campaign_id: UUID,
+    export_format: ExportFormat = Query(default="csv", alias="format"),
+    gzip: bool = False,
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user),
 ) -> StreamingResponse:
     campaign = await campaigns_service.get_campaign(db, current_user, campaign_id)
-    recipients = await campaigns_service.get_campaign_recipients(db, campaign)
-
-    buffer = io.StringIO()
-    writer = csv.writer(buffer)
-    writer.writerow(["name", "phone", "status", "sent_at", "read_at", "last_error"])
-    for rec in recipients:
-        writer.writerow([
-            rec.name or "",
-            rec.phone_e164,
-            rec.status.value,
-            rec.sent_at.isoformat() if rec.sent_at else "",
-            rec.read_at.isoformat() if rec.read_at else "",
-            rec.last_error or "",
-        ])
-
-    buffer.seek(0)
-    headers = {"Content-Disposition": f"attachment; filename=campaign-{campaign.id}.csv"}
-    return StreamingResponse(iter([buffer.getvalue()]), media_type="text/csv", headers=headers)
+    return export_response(
+        campaigns_service.recipients_query(campaign),
+        RECIPIENT_COLUMNS,
+        f"campaign-{campaign.id}",
+        export_format,
+        gzip=gzip,
+    )
 
 
 @router.websocket("/ws/{campaign_id}")
@@ -208,21 +229,54 @@ async def campaign_progress_ws(websocket: WebSocket, campaign_id: str) -> None:
 
     await websocket.accept()
 
+    # Subscribe before taking the snapshot so no change can fall between the two; events the
+    # snapshot already includes are recognised by their seq and skipped.
+    pubsub = get_async_redis_connection().pubsub()
+    await pubsub.subscribe(progress_service.events_channel(campaign_uuid))
     try:
-        while True:
-            async with async_session() as session:
-                result = await session.execute(select(Campaign).where(Campaign.id == campaign_uuid))
-                campaign = result.scalar_one_or_none()
-                if campaign is None or str(campaign.user_id) != user_id:
-                    await websocket.close(code=1008, reason="Campaign not found")
-                    return
-                await session.refresh(campaign)
-                progress_data = await campaigns_service.compute_campaign_progress(session, campaign)
-                payload = {**progress_data, "status": campaign.status.value}
-                await websocket.send_json(payload)
-                if campaign.status in {CampaignStatus.COMPLETED, CampaignStatus.FAILED, CampaignStatus.CANCELLED}:
-                    await websocket.close()
-                    return
-            await asyncio.sleep(2)
+        async with async_session() as session:
+            campaign = await session.get(Campaign, campaign_uuid)
+            if campaign is None or str(campaign.user_id) != user_id:
+                await websocket.close(code=1008, reason="Campaign not found")
+                return
+            progress_data = await campaigns_service.compute_campaign_progress(session, campaign)
+            campaign_status = campaign.status
+        await websocket.send_json({"type": "snapshot", **progress_data, "status": campaign_status.value})
+        if campaign_status in TERMINAL_STATUSES:
+            await websocket.close()
+            return
+
+        forward = asyncio.create_task(_forward_campaign_events(websocket, pubsub, progress_data.get("seq", 0)))
+        disconnect = asyncio.create_task(_wait_for_disconnect(websocket))
+        done, pending = await asyncio.wait({forward, disconnect}, return_when=asyncio.FIRST_COMPLETED)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        for task in done:
+            task.result()
     except WebSocketDisconnect:
         return
+    finally:
+        await pubsub.unsubscribe()
+        await pubsub.aclose()
+
+
+async def _forward_campaign_events(websocket: WebSocket, pubsub, seq: int) -> None:
+    async for message in pubsub.listen():
+        if message["type"] != "message":
+            continue
+        event = json.loads(message["data"])
+        if event.get("seq", seq + 1) <= seq:
+            continue
+        await websocket.send_json(event)
+        if event["type"] == "status" and CampaignStatus(event["status"]) in TERMINAL_STATUSES:
+            await websocket.close()
+            return
+
+
+async def _wait_for_disconnect(websocket: WebSocket) -> None:
+    # The socket is push-only; reading is just how a client going away gets noticed.
+    while True:
+        message = await websocket.receive()
+        if message["type"] == "websocket.disconnect":
+            return
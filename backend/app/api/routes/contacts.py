@@ -1,14 +1,18 @@
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, File, Form, HTTPException, UploadFile, status
+from fastapi import APIRouter, Depends, File, Form, HTTPException, Query, UploadFile, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.api.deps import get_current_active_user, get_db
-from app.models import ContactSource, SessionStatus, User
-from app.schemas.contacts import ContactListCreate, ContactListRead, ContactRead, GroupImportRequest
+from app.api.streaming import NDJSON_MEDIA_TYPE, export_response, iter_ndjson
+from app.models import SessionStatus, User
+from app.schemas.contacts import ContactImportRead, ContactListRead, ContactRead, GroupImportRequest
 from app.services import contacts as contacts_service
 from app.services import groups as groups_service
 from app.services import session as session_service
+from app.services.exports import CONTACT_COLUMNS, ExportFormat
 
 
 router = APIRouter()
@@ -25,30 +29,73 @@ async def list_lists(
 @router.get("/lists/{list_id}", response_model=list[ContactRead])
 async def read_list_contacts(
     list_id: UUID,
+    limit: int = Query(default=500, ge=1, le=1000),
+    after: UUID | None = None,
+    phone_prefix: str | None = None,
+    consent: bool | None = None,
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user),
 ) -> list[ContactRead]:
     contact_list = await contacts_service.get_contact_list(db, current_user, list_id)
-    contacts = await contacts_service.list_contacts(db, contact_list)
+    contacts = await contacts_service.list_contacts(
+        db, contact_list, limit=limit, after=after, phone_prefix=phone_prefix, consent=consent
+    )
     return [ContactRead.model_validate(contact) for contact in contacts]
 
 
-@router.post("/upload", response_model=ContactListRead)
+@router.get("/lists/{list_id}/stream")
+async def stream_list_contacts(
+    list_id: UUID,
+    after: UUID | None = None,
+    phone_prefix: str | None = None,
+    consent: bool | None = None,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user),
+) -> StreamingResponse:
+    contact_list = await contacts_service.get_contact_list(db, current_user, list_id)
+    query = contacts_service.contacts_query(contact_list, after=after, phone_prefix=phone_prefix, consent=consent)
+    return StreamingResponse(iter_ndjson(query, ContactRead.model_validate), media_type=NDJSON_MEDIA_TYPE)
+
+
+@router.get("/lists/{list_id}/export")
+async def export_list_contacts(
+    list_id: UUID,
+    export_format: ExportFormat = Query(default="csv", alias="format"),
+    gzip: bool = False,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user),
+) -> StreamingResponse:
+    contact_list = await contacts_service.get_contact_list(db, current_user, list_id)
+    return export_response(
+        contacts_service.contacts_query(contact_list),
+        CONTACT_COLUMNS,
+        f"contacts-{contact_list.id}",
+        export_format,
+        gzip=gzip,
+    )
+
+
+@router.post("/upload", response_model=ContactImportRead, status_code=status.HTTP_202_ACCEPTED)
 async def upload_contacts(
     file: UploadFile = File(...),
     name: str = Form(...),
-    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user),
-) -> ContactListRead:
-    file_bytes = await file.read()
-    records = contacts_service.parse_contacts_file(file_bytes, file.filename or "")
-    contact_list = await contacts_service.create_contact_list(
-        db,
+) -> ContactImportRead:
+    return await run_in_threadpool(
+        contacts_service.enqueue_contact_import,
         current_user,
-        ContactListCreate(name=name, source=ContactSource.UPLOAD, metadata={"filename": file.filename}),
-        records,
+        file.file,
+        file.filename or "",
+        file.content_type,
+        name,
     )
-    return ContactListRead.model_validate(contact_list)
+
+
+@router.get("/imports/{job_id}", response_model=ContactImportRead)
+async def read_contact_import(
+    job_id: str, current_user: User = Depends(get_current_active_user)
+) -> ContactImportRead:
+    return await run_in_threadpool(contacts_service.get_contact_import, current_user, job_id)
 
 
 @router.post("/group", response_model=ContactListRead)
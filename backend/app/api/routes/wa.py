@@ -1,9 +1,10 @@
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Response, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.api.deps import get_current_active_user, get_db
+from app.core.config import get_settings
 from app.models import SessionStatus, User, WhatsAppSession
 from app.schemas.automation import AutoResponseResult, InboundMessage
 from app.schemas.session import (
@@ -15,6 +16,7 @@ from app.schemas.session import (
     WhatsAppGroupMember,
 )
 from app.services import automation as automation_service
+from app.services import inbound as inbound_service
 from app.services import session as session_service
 
 
@@ -178,7 +180,14 @@ async def send_group_member_message(
 @router.post("/inbound", response_model=list[AutoResponseResult])
 async def inbound_message(
     payload: InboundMessage,
+    response: Response,
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user),
 ) -> list[AutoResponseResult]:
+    """Evaluate auto-response rules now, or with ``INBOUND_INGEST_MODE=stream`` queue the message and return 202."""
+
+    if get_settings().inbound_ingest_mode == "stream":
+        await inbound_service.enqueue_inbound(current_user.id, payload)
+        response.status_code = status.HTTP_202_ACCEPTED
+        return []
     return await automation_service.handle_inbound(db, current_user, payload)
@@ -1,4 +1,6 @@
-from fastapi import APIRouter, Depends
+from uuid import UUID
+
+from fastapi import APIRouter, Depends, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.api.deps import get_current_active_user, get_db, get_points_admin
@@ -54,10 +56,12 @@ async def grant_points(
 
 @router.get("/txns", response_model=list[WalletTransactionRead])
 async def wallet_transactions(
+    limit: int = Query(default=100, ge=1, le=500),
+    before: UUID | None = None,
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user),
 ) -> list[WalletTransactionRead]:
-    txns = await wallet_service.list_wallet_transactions(db, current_user)
+    txns = await wallet_service.list_wallet_transactions(db, current_user, limit=limit, before=before)
     serialized: list[WalletTransactionRead] = []
     for txn in txns:
         serialized.append(
@@ -67,6 +71,7 @@ async def wallet_transactions(
                 points=txn.points,
                 balance_after=txn.balance_after,
                 reference=txn.reference,
+                recipients=(txn.meta or {}).get("recipients"),
                 expires_at=txn.expires_at,
                 created_at=txn.created_at,
             )
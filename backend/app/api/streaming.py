@@ -0,0 +1,170 @@
+from __future__ import annotations
+
+import csv
+import io
+import zlib
+from collections.abc import AsyncIterator, Callable, Sequence
+from typing import Any
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from sqlalchemy import Select
+
+from app.db.session import async_session
+from app.services import exports
+
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+CSV_MEDIA_TYPE = "text/csv"
+GZIP_MEDIA_TYPE = "application/gzip"
+
+_COLUMNAR_FILES = {
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+    "arrow": ("application/vnd.apache.arrow.file", "arrow"),
+}
+
+# Rows fetched per round trip from the server-side cursor, and per chunk written to the client.
+STREAM_BATCH_SIZE = 1000
+
+
+async def iter_ndjson(statement: Select, serialize: Callable[[Any], BaseModel]) -> AsyncIterator[str]:
+    """Yield the statement's rows as NDJSON, reading them through a server-side cursor.
+
+    The generator opens its own session: the response body is produced after the request's
+    session has been handed back.
+    """
+
+    async with async_session() as session:
+        result = await session.stream_scalars(statement.execution_options(yield_per=STREAM_BATCH_SIZE))
+        async for rows in result.partitions():
+            yield "".join(serialize(row).model_dump_json() + "\n" for row in rows)
+
+
+async def _iter_csv_text(
+    statement: Select, header: Sequence[str], to_row: Callable[[Any], Sequence[Any]]
+) -> AsyncIterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def drain() -> str:
+        text = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return text
+
+    # The header goes out before the query runs, so the download starts at once.
+    writer.writerow(header)
+    yield drain()
+    async with async_session() as session:
+        result = await session.stream_scalars(statement.execution_options(yield_per=STREAM_BATCH_SIZE))
+        async for rows in result.partitions():
+            writer.writerows(to_row(row) for row in rows)
+            yield drain()
+
+
+async def gzip_chunks(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """Compress a byte stream into one gzip member, flushing after every chunk.
+
+    The sync flush costs a few bytes per chunk but lets compressed data reach the client as
+    soon as its rows are read.
+    """
+
+    compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16)
+    async for chunk in chunks:
+        yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    yield compressor.flush()
+
+
+async def _encode(texts: AsyncIterator[str]) -> AsyncIterator[bytes]:
+    async for text in texts:
+        yield text.encode()
+
+
+def iter_csv(
+    statement: Select,
+    header: Sequence[str],
+    to_row: Callable[[Any], Sequence[Any]],
+    *,
+    gzip: bool = False,
+) -> AsyncIterator[bytes]:
+    """Stream the statement's rows as CSV, one chunk per cursor batch, optionally gzip-compressed.
+
+    Memory is bounded by one batch whatever the number of rows.
+    """
+
+    chunks = _encode(_iter_csv_text(statement, header, to_row))
+    return gzip_chunks(chunks) if gzip else chunks
+
+
+class _ChunkSink(io.RawIOBase):
+    """Append-only file for pyarrow writers whose bytes are drained as soon as they are written.
+
+    Parquet and Arrow footers record absolute offsets, so ``tell`` keeps counting across drains.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._chunks: list[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        chunk = bytes(data)
+        self._chunks.append(chunk)
+        self._position += len(chunk)
+        return len(chunk)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+async def iter_columnar(
+    statement: Select, columns: Sequence[exports.ExportColumn], export_format: str
+) -> AsyncIterator[bytes]:
+    """Stream the statement's rows as a Parquet or Arrow IPC file built batch by batch."""
+
+    schema = exports.arrow_schema(columns)
+    sink = _ChunkSink()
+    if export_format == "parquet":
+        writer = pq.ParquetWriter(sink, schema)
+    else:
+        writer = pa.ipc.new_file(sink, schema)
+    try:
+        async with async_session() as session:
+            result = await session.stream_scalars(statement.execution_options(yield_per=STREAM_BATCH_SIZE))
+            async for rows in result.partitions():
+                # One record batch per cursor batch; for Parquet, one row group.
+                writer.write_batch(exports.arrow_batch(columns, schema, rows))
+                yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def export_response(
+    statement: Select,
+    columns: Sequence[exports.ExportColumn],
+    filename: str,
+    export_format: exports.ExportFormat,
+    *,
+    gzip: bool = False,
+) -> StreamingResponse:
+    if export_format == "csv":
+        body = iter_csv(
+            statement, exports.csv_header(columns), lambda item: exports.csv_row(columns, item), gzip=gzip
+        )
+        media_type, extension = (GZIP_MEDIA_TYPE, "csv.gz") if gzip else (CSV_MEDIA_TYPE, "csv")
+    else:
+        body = iter_columnar(statement, columns, export_format)
+        media_type, extension = _COLUMNAR_FILES[export_format]
+    headers = {"Content-Disposition": f"attachment; filename={filename}.{extension}"}
+    return StreamingResponse(body, media_type=media_type, headers=headers)
@@ -1,5 +1,5 @@
 from functools import lru_cache
-from typing import List
+from typing import List, Literal
 
 from pydantic import AnyHttpUrl, Field, computed_field
 from pydantic_settings import BaseSettings, SettingsConfigDict
@@ -31,9 +31,33 @@ class Settings(BaseSettings):
     max_campaign_recipients: int = Field(default=200, alias="MAX_CAMPAIGN_RECIPIENTS")
     max_daily_recipients: int = Field(default=500, alias="MAX_DAILY_RECIPIENTS")
     points_per_recipient: int = Field(default=2, alias="POINTS_PER_RECIPIENT")
+    wallet_settle_every_sends: int = Field(default=100, alias="WALLET_SETTLE_EVERY_SENDS")
+    wallet_settle_interval_seconds: int = Field(default=60, alias="WALLET_SETTLE_INTERVAL_SECONDS")
+    # 0 uses one contact-parsing process per CPU.
+    contact_parse_workers: int = Field(default=0, ge=0, alias="CONTACT_PARSE_WORKERS")
 
     campaign_failure_backoff: str = Field(default="30,60,120", alias="CAMPAIGN_FAILURE_BACKOFF")
+    campaign_dispatch_mode: Literal["campaign", "recipient", "async"] = Field(
+        default="campaign", alias="CAMPAIGN_DISPATCH_MODE"
+    )
+    campaign_dispatch_batch_size: int = Field(default=20, ge=1, alias="CAMPAIGN_DISPATCH_BATCH_SIZE")
+    campaign_throttle_inline_seconds: float = Field(default=0, ge=0, alias="CAMPAIGN_THROTTLE_INLINE_SECONDS")
+    async_worker_poll_seconds: float = Field(default=2, gt=0, alias="ASYNC_WORKER_POLL_SECONDS")
+    async_worker_max_campaigns: int = Field(default=200, ge=1, alias="ASYNC_WORKER_MAX_CAMPAIGNS")
     auto_response_cooldown_seconds: int = Field(default=3600, alias="AUTO_RESPONSE_COOLDOWN_SECONDS")
+    auto_response_cooldown_backend: Literal["redis", "database"] = Field(
+        default="redis", alias="AUTO_RESPONSE_COOLDOWN_BACKEND"
+    )
+    auto_response_audit_log: bool = Field(default=True, alias="AUTO_RESPONSE_AUDIT_LOG")
+    auto_response_delivery: bool = Field(default=True, alias="AUTO_RESPONSE_DELIVERY")
+    auto_response_send_interval_seconds: float = Field(default=1, ge=0, alias="AUTO_RESPONSE_SEND_INTERVAL_SECONDS")
+    auto_response_batch_size: int = Field(default=20, ge=1, alias="AUTO_RESPONSE_BATCH_SIZE")
+    auto_response_regex_budget_ms: float = Field(default=50, gt=0, alias="AUTO_RESPONSE_REGEX_BUDGET_MS")
+    auto_response_regex_slow_ms: float = Field(default=10, gt=0, alias="AUTO_RESPONSE_REGEX_SLOW_MS")
+    inbound_ingest_mode: Literal["sync", "stream"] = Field(default="sync", alias="INBOUND_INGEST_MODE")
+    inbound_stream_maxlen: int = Field(default=100_000, ge=1, alias="INBOUND_STREAM_MAXLEN")
+    inbound_consumers: int = Field(default=4, ge=1, alias="INBOUND_CONSUMERS")
+    inbound_batch_size: int = Field(default=200, ge=1, alias="INBOUND_BATCH_SIZE")
 
     official_mode: bool = Field(default=False, alias="OFFICIAL_MODE")
     playwright_headless: bool = Field(default=True, alias="PLAYWRIGHT_HEADLESS")
@@ -44,6 +68,10 @@ class Settings(BaseSettings):
     whatsapp_api_token: str | None = Field(default=None, alias="WHATSAPP_API_TOKEN")
     whatsapp_phone_number_id: str | None = Field(default=None, alias="WHATSAPP_PHONE_NUMBER_ID")
     whatsapp_worker_url: AnyHttpUrl = Field(default="http://localhost:5005", alias="WHATSAPP_WORKER_URL")
+    whatsapp_api_http2: bool = Field(default=True, alias="WHATSAPP_API_HTTP2")
+    http_pool_max_connections: int = Field(default=100, ge=1, alias="HTTP_POOL_MAX_CONNECTIONS")
+    http_pool_max_keepalive: int = Field(default=20, ge=0, alias="HTTP_POOL_MAX_KEEPALIVE")
+    http_keepalive_expiry_seconds: float = Field(default=30, ge=0, alias="HTTP_KEEPALIVE_EXPIRY_SECONDS")
     support_whatsapp_number: str = Field(default="6282137138687", alias="SUPPORT_WHATSAPP_NUMBER")
     default_signup_points: int = Field(default=0, alias="DEFAULT_SIGNUP_POINTS")
     points_admin_emails_raw: str | list[str] | None = Field(default=None, alias="POINTS_ADMIN_EMAILS")
@@ -3,12 +3,16 @@ from __future__ import annotations
 from datetime import datetime, timezone
 
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from loguru import logger
+from redis.exceptions import RedisError
 from sqlalchemy import select
 from sqlalchemy.orm import selectinload
 
+from app.core.config import get_settings
 from app.db.session import async_session
 from app.models import User, WalletTransaction, WalletTxnType
 from app.services.auth import create_wallet_transaction
+from app.services.cooldowns import flush_cooldown_audit
 
 
 _scheduler: AsyncIOScheduler | None = None
@@ -45,10 +49,12 @@ async def _expire_wallet_coins() -> None:
             if user is None:
                 txn.expire_processed = True
                 continue
-            if user.points_balance <= 0:
+            # Points held for running campaigns are already promised; only the available part expires.
+            available = user.points_balance - user.points_reserved
+            if available <= 0:
                 txn.expire_processed = True
                 continue
-            deduct_amount = min(txn.points, max(user.points_balance, 0))
+            deduct_amount = min(txn.points, available)
             if deduct_amount <= 0:
                 txn.expire_processed = True
                 continue
@@ -63,6 +69,14 @@ async def _expire_wallet_coins() -> None:
         await session.commit()
 
 
+async def _flush_cooldown_audit() -> None:
+    async with async_session() as session:
+        try:
+            await flush_cooldown_audit(session)
+        except RedisError as exc:
+            logger.warning("Could not flush the auto-response audit queue: %s", exc)
+
+
 def start_scheduler() -> AsyncIOScheduler:
     global _scheduler
     if _scheduler and _scheduler.running:
@@ -71,6 +85,8 @@ def start_scheduler() -> AsyncIOScheduler:
     scheduler = AsyncIOScheduler()
     scheduler.add_job(_deactivate_expired_plans, "interval", hours=6, id="plan-expiry-check")
     scheduler.add_job(_expire_wallet_coins, "interval", hours=6, id="coin-expiry-check")
+    if get_settings().auto_response_audit_log:
+        scheduler.add_job(_flush_cooldown_audit, "interval", seconds=30, id="auto-response-audit-flush")
     scheduler.start()
     _scheduler = scheduler
     return scheduler
@@ -1,41 +1,104 @@
 from __future__ import annotations
 
 from sqlalchemy import text
-from sqlalchemy.engine import Engine
+from sqlalchemy.engine import Connection, Engine
 from sqlalchemy.ext.asyncio import AsyncEngine
 
 
-_ALTERS = (
+_WALLET_ALTERS = (
     "ALTER TABLE wallet_transactions ADD COLUMN IF NOT EXISTS expires_at TIMESTAMPTZ",
     "ALTER TABLE wallet_transactions ADD COLUMN IF NOT EXISTS expire_processed BOOLEAN DEFAULT FALSE",
     "ALTER TABLE wallet_transactions ALTER COLUMN expire_processed SET DEFAULT FALSE",
     "UPDATE wallet_transactions SET expire_processed = FALSE WHERE expire_processed IS NULL",
     "ALTER TABLE wallet_transactions ALTER COLUMN expire_processed SET NOT NULL",
-)
-
-_ENUM_ALTERS = (
     "ALTER TYPE wallet_txn_type ADD VALUE IF NOT EXISTS 'coin_purchase'",
     "ALTER TYPE wallet_txn_type ADD VALUE IF NOT EXISTS 'expire'",
 )
 
+_CAMPAIGN_ALTERS = (
+    "ALTER TABLE campaigns ADD COLUMN IF NOT EXISTS total_recipients INTEGER NOT NULL DEFAULT 0",
+    "ALTER TABLE campaigns ADD COLUMN IF NOT EXISTS sent_count INTEGER NOT NULL DEFAULT 0",
+    "ALTER TABLE campaigns ADD COLUMN IF NOT EXISTS failed_count INTEGER NOT NULL DEFAULT 0",
+    "ALTER TABLE campaigns ADD COLUMN IF NOT EXISTS points_reserved INTEGER NOT NULL DEFAULT 0",
+    "ALTER TABLE campaigns ADD COLUMN IF NOT EXISTS points_spent INTEGER NOT NULL DEFAULT 0",
+    "ALTER TABLE campaigns ADD COLUMN IF NOT EXISTS points_settled INTEGER NOT NULL DEFAULT 0",
+    "ALTER TABLE campaigns ADD COLUMN IF NOT EXISTS points_settled_at TIMESTAMPTZ",
+    "CREATE INDEX IF NOT EXISTS ix_campaigns_user_id_status ON campaigns (user_id, status)",
+    # Campaigns created before the counters existed still report zero recipients; count them once.
+    """
+    UPDATE campaigns AS c
+    SET total_recipients = s.total, sent_count = s.sent, failed_count = s.failed
+    FROM (
+        SELECT
+            campaign_id,
+            count(*) AS total,
+            count(*) FILTER (WHERE lower(status::text) IN ('sent', 'read')) AS sent,
+            count(*) FILTER (WHERE lower(status::text) = 'failed') AS failed
+        FROM campaign_recipients
+        WHERE campaign_id IN (SELECT id FROM campaigns WHERE total_recipients = 0)
+        GROUP BY campaign_id
+    ) AS s
+    WHERE c.id = s.campaign_id
+    """,
+)
+
+_USER_ALTERS = ("ALTER TABLE users ADD COLUMN IF NOT EXISTS points_reserved INTEGER NOT NULL DEFAULT 0",)
 
-async def ensure_wallet_schema(async_engine: AsyncEngine) -> None:
+_RECIPIENT_ALTERS = (
+    "ALTER TABLE campaign_recipients ADD COLUMN IF NOT EXISTS variables JSONB DEFAULT '{}'::jsonb",
+    "CREATE INDEX IF NOT EXISTS ix_campaign_recipients_campaign_id_status "
+    "ON campaign_recipients (campaign_id, status) INCLUDE (sent_at)",
+    "CREATE INDEX IF NOT EXISTS ix_campaign_recipients_campaign_id_id ON campaign_recipients (campaign_id, id)",
+)
+
+_CONTACT_ALTERS = ("CREATE INDEX IF NOT EXISTS ix_contacts_list_id_id ON contacts (list_id, id)",)
+
+_AUTO_RESPONSE_LOG_ALTERS = (
+    # One row per (rule, contact): fold older duplicates into the latest before indexing.
+    """
+    DO $$
+    BEGIN
+        IF to_regclass('ix_auto_response_logs_rule_id_contact_phone') IS NULL THEN
+            DELETE FROM auto_response_logs AS older
+            USING auto_response_logs AS newer
+            WHERE older.rule_id = newer.rule_id
+              AND older.contact_phone = newer.contact_phone
+              AND (older.last_triggered_at, older.id) < (newer.last_triggered_at, newer.id);
+            CREATE UNIQUE INDEX ix_auto_response_logs_rule_id_contact_phone
+                ON auto_response_logs (rule_id, contact_phone);
+        END IF;
+    END
+    $$
+    """,
+)
+
+_TABLE_ALTERS = {
+    "users": _USER_ALTERS,
+    "wallet_transactions": _WALLET_ALTERS,
+    "campaigns": _CAMPAIGN_ALTERS,
+    "campaign_recipients": _RECIPIENT_ALTERS,
+    "contacts": _CONTACT_ALTERS,
+    "auto_response_logs": _AUTO_RESPONSE_LOG_ALTERS,
+}
+
+
+def _pending_statements(conn: Connection) -> list[str]:
+    statements: list[str] = []
+    for table, alters in _TABLE_ALTERS.items():
+        if conn.execute(text("SELECT to_regclass(:table)"), {"table": table}).scalar() is None:
+            continue
+        statements.extend(alters)
+    return statements
+
+
+async def ensure_schema(async_engine: AsyncEngine) -> None:
     async with async_engine.begin() as conn:
-        result = await conn.execute(text("SELECT to_regclass('wallet_transactions')"))
-        if result.scalar() is None:
-            return
-        for statement in _ALTERS:
-            await conn.execute(text(statement))
-        for statement in _ENUM_ALTERS:
+        statements = await conn.run_sync(_pending_statements)
+        for statement in statements:
             await conn.execute(text(statement))
 
 
-def ensure_wallet_schema_sync(sync_engine: Engine) -> None:
+def ensure_schema_sync(sync_engine: Engine) -> None:
     with sync_engine.begin() as conn:
-        result = conn.execute(text("SELECT to_regclass('wallet_transactions')")).scalar()
-        if result is None:
-            return
-        for statement in _ALTERS:
-            conn.execute(text(statement))
-        for statement in _ENUM_ALTERS:
+        for statement in _pending_statements(conn):
             conn.execute(text(statement))
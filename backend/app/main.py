@@ -5,8 +5,11 @@ import re
 from app.api.api_v1 import api_router
 from app.core.config import get_settings
 from app.core.scheduler import shutdown_scheduler, start_scheduler
-from app.db.schema import ensure_wallet_schema
+from app.db.schema import ensure_schema
 from app.db.session import engine as async_engine
+from app.services.contacts import shutdown_validation_pool
+from app.services.http_clients import aclose_http_clients
+from app.services.queue import get_async_redis_connection
 
 
 def create_app() -> FastAPI:
@@ -54,12 +57,15 @@ def create_app() -> FastAPI:
 
     @app.on_event("startup")
     async def _startup() -> None:
-        await ensure_wallet_schema(async_engine)
+        await ensure_schema(async_engine)
         start_scheduler()
 
     @app.on_event("shutdown")
     async def _shutdown() -> None:
         shutdown_scheduler()
+        await aclose_http_clients()
+        await get_async_redis_connection().aclose()
+        shutdown_validation_pool()
 
     return app
 
@@ -4,7 +4,7 @@ import enum
 import uuid
 from datetime import datetime
 
-from sqlalchemy import Boolean, DateTime, Enum, ForeignKey, Integer, String, Text, func
+from sqlalchemy import Boolean, DateTime, Enum, ForeignKey, Index, Integer, String, Text, func
 from sqlalchemy.dialects.postgresql import UUID, JSONB
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
@@ -58,6 +58,9 @@ class ActiveSchedule(Base):
 
 class AutoResponseLog(Base):
     __tablename__ = "auto_response_logs"
+    __table_args__ = (
+        Index("ix_auto_response_logs_rule_id_contact_phone", "rule_id", "contact_phone", unique=True),
+    )
 
     id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     rule_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("auto_response_rules.id", ondelete="CASCADE"))
@@ -28,9 +28,17 @@ class CampaignBase(BaseModel):
         return value
 
 
+class RecipientFilters(BaseModel):
+    consent_only: bool = False
+    phone_prefixes: list[str] = []
+    metadata: dict[str, str] = Field(default_factory=dict, description="Exact matches on upload columns")
+
+
 class CampaignCreate(CampaignBase):
     list_id: UUID
     metadata: dict[str, Any] | None = None
+    filters: RecipientFilters | None = None
+    deduplicate: bool = False
 
 
 class CampaignRead(CampaignBase):
@@ -41,6 +49,10 @@ class CampaignRead(CampaignBase):
     started_at: datetime | None
     completed_at: datetime | None
     created_at: datetime
+    total_recipients: int = 0
+    sent_count: int = 0
+    failed_count: int = 0
+    skipped_recipients: int | None = None
     metadata: dict[str, Any] | None = Field(alias="meta")
 
     model_config = ConfigDict(from_attributes=True, populate_by_name=True)
@@ -41,6 +41,17 @@ class ContactListRead(ContactListBase):
     model_config = ConfigDict(from_attributes=True, populate_by_name=True)
 
 
+class ContactImportRead(BaseModel):
+    job_id: str
+    status: str
+    processed: int = 0
+    rejected: int = 0
+    deduplicated: int = 0
+    imported: int = 0
+    list_id: UUID | None = None
+    error: str | None = None
+
+
 class GroupImportRequest(BaseModel):
     group_name: str
 
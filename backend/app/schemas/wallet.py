@@ -8,6 +8,7 @@ from app.models.wallet import WalletTxnType
 
 class WalletSummary(BaseModel):
     balance: int
+    reserved: int = 0
     plan_expires_at: datetime | None
     points_per_recipient: int
     max_daily_recipients: int
@@ -48,6 +49,7 @@ class WalletTransactionRead(BaseModel):
     points: int
     balance_after: int
     reference: str | None
+    recipients: int | None = None
     expires_at: datetime | None
     created_at: datetime
 
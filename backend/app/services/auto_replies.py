@@ -0,0 +1,228 @@
+from __future__ import annotations
+
+import json
+import time
+from datetime import datetime, timezone
+from typing import Iterable
+from uuid import UUID
+
+from fastapi.concurrency import run_in_threadpool
+from loguru import logger
+from redis import Redis
+from redis.exceptions import RedisError
+
+from app.core.config import get_settings
+from app.schemas.automation import AutoResponseResult
+from app.services.queue import get_async_redis_connection, get_queue, get_redis_connection
+
+
+# Listed first in app.worker, so RQ takes replies before any waiting campaign job.
+AUTOMATION_QUEUE = "automation"
+
+# A session's outbox and pacing cursor outlive any delivery backlog; the marker only has to
+# outlast the longest gap between two delivery jobs (the retry backoff).
+OUTBOX_TTL_SECONDS = 24 * 3600
+SCHEDULED_TTL_SECONDS = 600
+
+# Append the replies (ARGV[3..]) to the outbox, kept for ARGV[1] seconds, and claim the delivery
+# marker for ARGV[2] seconds; 1 means the caller must enqueue the delivery job as none is pending.
+_PUSH_SCRIPT = """
+for index = 3, #ARGV do
+  redis.call('RPUSH', KEYS[1], ARGV[index])
+end
+redis.call('EXPIRE', KEYS[1], ARGV[1])
+if redis.call('SET', KEYS[2], '1', 'NX', 'EX', ARGV[2]) then
+  return 1
+end
+return 0
+"""
+
+# Take the session's next send slot if it is at most ARGV[3] seconds after ARGV[1]; the reply
+# is {taken, slot}, so a far-off slot is reported without being consumed.
+_RESERVE_SCRIPT = """
+local slot = math.max(tonumber(redis.call('GET', KEYS[1]) or '0'), tonumber(ARGV[1]))
+if slot - tonumber(ARGV[1]) > tonumber(ARGV[3]) then
+  return {0, tostring(slot)}
+end
+redis.call('SET', KEYS[1], tostring(slot + tonumber(ARGV[2])), 'EX', ARGV[4])
+return {1, tostring(slot)}
+"""
+
+# Move up to ARGV[1] replies from the head of the outbox to the processing list, where they stay
+# until sent or returned. Replies a crashed job left there go back to the head of the outbox
+# first, and the delivery marker is held for ARGV[3] seconds, as long as the job may run.
+_TAKE_SCRIPT = """
+while redis.call('LMOVE', KEYS[2], KEYS[1], 'RIGHT', 'LEFT') do end
+local replies = redis.call('LRANGE', KEYS[1], 0, tonumber(ARGV[1]) - 1)
+if #replies > 0 then
+  redis.call('LTRIM', KEYS[1], #replies, -1)
+  redis.call('RPUSH', KEYS[2], unpack(replies))
+  redis.call('EXPIRE', KEYS[2], ARGV[2])
+end
+redis.call('EXPIRE', KEYS[3], ARGV[3])
+return replies
+"""
+
+# Drop the job's processing list and put the replies it did not finish (ARGV[2..], in order)
+# back at the head of the outbox.
+_RETURN_SCRIPT = """
+redis.call('DEL', KEYS[2])
+for index = #ARGV, 2, -1 do
+  redis.call('LPUSH', KEYS[1], ARGV[index])
+end
+redis.call('EXPIRE', KEYS[1], ARGV[1])
+return 0
+"""
+
+# Release the delivery marker only if the outbox is empty; 0 means more replies arrived.
+_FINISH_SCRIPT = """
+if redis.call('LLEN', KEYS[1]) == 0 then
+  redis.call('DEL', KEYS[2])
+  return 1
+end
+return 0
+"""
+
+
+def _outbox_key(user_id: UUID | str) -> str:
+    return f"automation:outbox:{user_id}"
+
+
+def _processing_key(user_id: UUID | str) -> str:
+    return f"automation:outbox:{user_id}:processing"
+
+
+def _scheduled_key(user_id: UUID | str) -> str:
+    return f"automation:outbox:{user_id}:scheduled"
+
+
+def _cursor_key(user_id: UUID | str) -> str:
+    return f"automation:outbox:{user_id}:next_send_at"
+
+
+def delivery_job_timeout() -> int:
+    settings = get_settings()
+    return settings.auto_response_batch_size * (int(settings.auto_response_send_interval_seconds) + 60) + 60
+
+
+def reply_entries(replies: Iterable[tuple[str, AutoResponseResult]]) -> list[str]:
+    return [
+        json.dumps(
+            {
+                "phone": phone,
+                "rule_id": str(result.rule_id),
+                "body": result.response_text or "",
+                "media_url": result.response_media_url,
+                "attempts": 0,
+            }
+        )
+        for phone, result in replies
+    ]
+
+
+def schedule_delivery(user_id: UUID | str, *, at: float | None = None, redis: Redis | None = None) -> None:
+    redis = redis or get_redis_connection()
+    redis.set(_scheduled_key(user_id), "1", ex=SCHEDULED_TTL_SECONDS)
+    queue = get_queue(AUTOMATION_QUEUE)
+    if at is None or at <= time.time():
+        queue.enqueue("app.tasks.automation.deliver_auto_replies", str(user_id), job_timeout=delivery_job_timeout())
+    else:
+        queue.enqueue_at(
+            datetime.fromtimestamp(at, timezone.utc),
+            "app.tasks.automation.deliver_auto_replies",
+            str(user_id),
+            job_timeout=delivery_job_timeout(),
+        )
+
+
+async def enqueue_replies(user_id: UUID, replies: list[tuple[str, AutoResponseResult]]) -> None:
+    """Queue triggered responses for delivery from the user's WhatsApp session.
+
+    Replies share one outbox per session and at most one pending delivery job, so a burst of
+    inbound messages becomes a few batched jobs rather than one job per reply.
+    """
+
+    if not replies or not get_settings().auto_response_delivery:
+        return
+    try:
+        must_schedule = await get_async_redis_connection().eval(
+            _PUSH_SCRIPT,
+            2,
+            _outbox_key(user_id),
+            _scheduled_key(user_id),
+            OUTBOX_TTL_SECONDS,
+            SCHEDULED_TTL_SECONDS,
+            *reply_entries(replies),
+        )
+        if must_schedule == 1:
+            # RQ enqueues through the sync client; keep that off the inbound event loop.
+            await run_in_threadpool(schedule_delivery, user_id)
+    except RedisError as exc:
+        logger.error("Could not queue %s auto-replies for user %s: %s", len(replies), user_id, exc)
+
+
+def take_replies(user_id: UUID | str, limit: int, *, redis: Redis | None = None) -> list[dict]:
+    """Take a batch off the outbox into the user's processing list.
+
+    Each reply stays there until :func:`complete_reply` or :func:`return_replies`, so a job that
+    dies mid-batch loses nothing: the next delivery job takes its leftovers first.
+    """
+
+    redis = redis or get_redis_connection()
+    raw_entries = redis.eval(
+        _TAKE_SCRIPT,
+        3,
+        _outbox_key(user_id),
+        _processing_key(user_id),
+        _scheduled_key(user_id),
+        limit,
+        OUTBOX_TTL_SECONDS,
+        max(SCHEDULED_TTL_SECONDS, delivery_job_timeout()),
+    )
+    return [json.loads(raw) for raw in raw_entries]
+
+
+def complete_reply(user_id: UUID | str, *, redis: Redis | None = None) -> None:
+    """Drop the oldest taken reply, once it was sent or given up on."""
+
+    redis = redis or get_redis_connection()
+    redis.lpop(_processing_key(user_id))
+
+
+def return_replies(user_id: UUID | str, replies: list[dict], *, redis: Redis | None = None) -> None:
+    """Put the unfinished replies back at the head of the outbox, keeping their order."""
+
+    redis = redis or get_redis_connection()
+    redis.eval(
+        _RETURN_SCRIPT,
+        2,
+        _outbox_key(user_id),
+        _processing_key(user_id),
+        OUTBOX_TTL_SECONDS,
+        *(json.dumps(reply) for reply in replies),
+    )
+
+
+def reserve_send(user_id: UUID | str, max_wait: float, *, redis: Redis | None = None) -> tuple[bool, float]:
+    """Claim the session's next send slot unless it is more than ``max_wait`` seconds away.
+
+    Returns whether the slot was taken and when it is; slots are
+    ``AUTO_RESPONSE_SEND_INTERVAL_SECONDS`` apart, independent of campaign throttling.
+    """
+
+    redis = redis or get_redis_connection()
+    taken, slot = redis.eval(
+        _RESERVE_SCRIPT,
+        1,
+        _cursor_key(user_id),
+        repr(time.time()),
+        repr(get_settings().auto_response_send_interval_seconds),
+        repr(max_wait),
+        OUTBOX_TTL_SECONDS,
+    )
+    return taken == 1, float(slot)
+
+
+def finish_delivery(user_id: UUID | str, *, redis: Redis | None = None) -> bool:
+    redis = redis or get_redis_connection()
+    return redis.eval(_FINISH_SCRIPT, 2, _outbox_key(user_id), _scheduled_key(user_id)) == 1
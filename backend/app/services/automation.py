@@ -1,14 +1,16 @@
 from __future__ import annotations
 
-import re
+from collections import OrderedDict
 from datetime import datetime, timezone
-from zoneinfo import ZoneInfo
+from uuid import UUID
 
 from fastapi import HTTPException, status
+from loguru import logger
+from redis.exceptions import RedisError
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.models import ActiveSchedule, AutoResponseLog, AutoResponseRule, TriggerType, User
+from app.models import ActiveSchedule, AutoResponseRule, TriggerType, User
 from app.schemas.automation import (
     ActiveScheduleCreate,
     AutoResponseResult,
@@ -16,6 +18,66 @@ from app.schemas.automation import (
     AutoResponseRuleUpdate,
     InboundMessage,
 )
+from app.services import auto_replies
+from app.services.cooldowns import get_cooldown_store
+from app.services.queue import get_async_redis_connection
+from app.services.regex_safety import UnsafePatternError, compile_pattern
+from app.services.rule_matcher import RuleMatcher, compile_rules
+from app.services.windows import compile_windows, window_key
+
+
+_MATCHER_CACHE_SIZE = 1024
+
+# user id -> (rules version the matcher was built from, matcher)
+_matchers: OrderedDict[UUID, tuple[int, RuleMatcher]] = OrderedDict()
+
+
+def _rules_version_key(user_id: UUID) -> str:
+    return f"automation:rules:{user_id}:version"
+
+
+async def _rules_version(user_id: UUID) -> int | None:
+    try:
+        value = await get_async_redis_connection().get(_rules_version_key(user_id))
+    except RedisError as exc:
+        logger.warning("Rules version unavailable for user %s: %s", user_id, exc)
+        return None
+    return int(value or 0)
+
+
+async def invalidate_rule_matcher(user_id: UUID) -> None:
+    """Drop the user's compiled rules here and, through the version counter, in every other process."""
+
+    _matchers.pop(user_id, None)
+    try:
+        await get_async_redis_connection().incr(_rules_version_key(user_id))
+    except RedisError as exc:
+        logger.warning("Could not bump rules version for user %s: %s", user_id, exc)
+
+
+async def get_rule_matcher(db: AsyncSession, user_id: UUID) -> RuleMatcher:
+    """Return the user's compiled active rules, querying them only when they changed.
+
+    The version is read before the rules, so a change committed in between is picked up on
+    the next message rather than cached under the old version.
+    """
+
+    version = await _rules_version(user_id)
+    cached = _matchers.get(user_id)
+    if cached is not None and version is not None and cached[0] == version:
+        _matchers.move_to_end(user_id)
+        return cached[1]
+    result = await db.execute(
+        select(AutoResponseRule)
+        .where(AutoResponseRule.user_id == user_id, AutoResponseRule.active.is_(True))
+        .order_by(AutoResponseRule.created_at.desc())
+    )
+    matcher = compile_rules(result.scalars().all())
+    if version is not None:
+        _matchers[user_id] = (version, matcher)
+        if len(_matchers) > _MATCHER_CACHE_SIZE:
+            _matchers.popitem(last=False)
+    return matcher
 
 
 async def list_rules(db: AsyncSession, user: User) -> list[AutoResponseRule]:
@@ -35,7 +97,17 @@ async def get_rule(db: AsyncSession, user: User, rule_id):
     return rule
 
 
+def _validate_trigger(payload: AutoResponseRuleCreate | AutoResponseRuleUpdate) -> None:
+    if payload.trigger_type != TriggerType.REGEX:
+        return
+    try:
+        compile_pattern(payload.trigger_value)
+    except UnsafePatternError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid regex trigger: {exc}") from exc
+
+
 async def create_rule(db: AsyncSession, user: User, payload: AutoResponseRuleCreate) -> AutoResponseRule:
+    _validate_trigger(payload)
     rule = AutoResponseRule(
         user_id=user.id,
         name=payload.name,
@@ -49,11 +121,13 @@ async def create_rule(db: AsyncSession, user: User, payload: AutoResponseRuleCre
     )
     db.add(rule)
     await db.commit()
+    await invalidate_rule_matcher(user.id)
     await db.refresh(rule)
     return rule
 
 
 async def update_rule(db: AsyncSession, user: User, rule_id, payload: AutoResponseRuleUpdate) -> AutoResponseRule:
+    _validate_trigger(payload)
     rule = await get_rule(db, user, rule_id)
     rule.name = payload.name
     rule.trigger_type = payload.trigger_type
@@ -64,6 +138,7 @@ async def update_rule(db: AsyncSession, user: User, rule_id, payload: AutoRespon
     rule.active = payload.active
     rule.active_windows = [window.model_dump() for window in payload.active_windows]
     await db.commit()
+    await invalidate_rule_matcher(user.id)
     await db.refresh(rule)
     return rule
 
@@ -72,6 +147,7 @@ async def delete_rule(db: AsyncSession, user: User, rule_id) -> None:
     rule = await get_rule(db, user, rule_id)
     await db.delete(rule)
     await db.commit()
+    await invalidate_rule_matcher(user.id)
 
 
 async def set_active_schedule(db: AsyncSession, user: User, payload: ActiveScheduleCreate) -> ActiveSchedule:
@@ -106,77 +182,62 @@ async def get_active_schedule(db: AsyncSession, user: User) -> ActiveSchedule |
     return result.scalar_one_or_none()
 
 
-def _within_windows(windows: list[dict], timezone: str, timestamp: datetime) -> bool:
-    tz = ZoneInfo(timezone)
-    local_ts = timestamp.astimezone(tz)
-    for window in windows:
-        if window["day_of_week"] != local_ts.weekday():
-            continue
-        start = datetime.strptime(window["start_time"], "%H:%M").time()
-        end = datetime.strptime(window["end_time"], "%H:%M").time()
-        if start <= local_ts.time() <= end:
-            return True
-    return False
+async def handle_inbound(db: AsyncSession, user: User, payload: InboundMessage) -> list[AutoResponseResult]:
+    return (await handle_inbound_batch(db, user, [payload]))[0]
 
 
-def _matches_rule(rule: AutoResponseRule, message: str) -> bool:
-    normalized = message.lower()
-    if rule.trigger_type == TriggerType.KEYWORD:
-        return normalized == rule.trigger_value.lower()
-    if rule.trigger_type == TriggerType.CONTAINS:
-        return rule.trigger_value.lower() in normalized
-    if rule.trigger_type == TriggerType.REGEX:
-        return re.search(rule.trigger_value, message) is not None
-    return False
+async def handle_inbound_batch(
+    db: AsyncSession, user: User, payloads: list[InboundMessage]
+) -> list[list[AutoResponseResult]]:
+    """Evaluate a user's inbound messages in order, loading rules and schedule once and committing once.
 
+    Triggered responses are queued for delivery and also returned per message, in the order of
+    ``payloads``.
+    """
 
-async def handle_inbound(db: AsyncSession, user: User, payload: InboundMessage) -> list[AutoResponseResult]:
     if user.plan_expires_at and user.plan_expires_at < datetime.now(timezone.utc):
-        return []
+        return [[] for _ in payloads]
 
     schedule = await get_active_schedule(db, user)
     if schedule and not schedule.is_active:
-        return []
-
-    timestamp = payload.timestamp
+        return [[] for _ in payloads]
+    schedule_index = None
     if schedule and schedule.windows:
-        if not _within_windows(schedule.windows, schedule.timezone, timestamp):
-            return []
-
-    rules = await list_rules(db, user)
-    results: list[AutoResponseResult] = []
-    for rule in rules:
-        if not rule.active:
-            continue
-        rule_windows = rule.active_windows or []
-        if rule_windows and not _within_windows(rule_windows, schedule.timezone if schedule else user.timezone, timestamp):
-            continue
-        if not _matches_rule(rule, payload.message):
-            continue
-
-        log_result = await db.execute(
-            select(AutoResponseLog).where(
-                AutoResponseLog.rule_id == rule.id,
-                AutoResponseLog.contact_phone == payload.contact_phone,
-            )
-        )
-        log = log_result.scalar_one_or_none()
-        if log:
-            delta = (timestamp - log.last_triggered_at).total_seconds()
-            if delta < rule.cooldown_seconds:
+        schedule_index = compile_windows(window_key(schedule.windows), schedule.timezone)
+
+    matcher = await get_rule_matcher(db, user.id)
+    cooldowns = get_cooldown_store(db)
+    rules_timezone = schedule.timezone if schedule else user.timezone
+    batch: list[list[AutoResponseResult]] = []
+    try:
+        for payload in payloads:
+            timestamp = payload.timestamp
+            results: list[AutoResponseResult] = []
+            batch.append(results)
+            if schedule_index is not None and not schedule_index.is_open(timestamp):
                 continue
-            log.last_triggered_at = timestamp
-        else:
-            log = AutoResponseLog(rule_id=rule.id, contact_phone=payload.contact_phone, last_triggered_at=timestamp)
-            db.add(log)
-
-        results.append(
-            AutoResponseResult(
-                rule_id=rule.id,
-                response_text=rule.response_text,
-                response_media_url=rule.response_media_url,
-            )
-        )
 
-    await db.commit()
-    return results
+            for rule in matcher.match(payload.message):
+                if rule.active_windows and not compile_windows(rule.active_windows, rules_timezone).is_open(timestamp):
+                    continue
+
+                if not await cooldowns.acquire(rule.id, payload.contact_phone, rule.cooldown_seconds, timestamp):
+                    continue
+
+                results.append(
+                    AutoResponseResult(
+                        rule_id=rule.id,
+                        response_text=rule.response_text,
+                        response_media_url=rule.response_media_url,
+                    )
+                )
+
+        await db.commit()
+    except Exception:
+        # Nothing was sent; a retry of these messages must be able to trigger the same rules.
+        await cooldowns.discard()
+        raise
+    await auto_replies.enqueue_replies(
+        user.id, [(payload.contact_phone, result) for payload, results in zip(payloads, batch) for result in results]
+    )
+    return batch
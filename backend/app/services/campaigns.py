@@ -2,14 +2,16 @@ from __future__ import annotations
 
 import asyncio
 import random
+import time
 from datetime import UTC, datetime, timedelta
 from typing import Iterable
 from uuid import UUID
 
 from fastapi import HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from redis import Redis
 from rq import Queue
-from sqlalchemy import select
+from sqlalchemy import Numeric, Select, Text, case, cast, func, insert, literal, or_, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.config import get_settings
@@ -22,36 +24,138 @@ from app.models import (
     DeliveryStatus,
     User,
 )
-from app.schemas.campaigns import CampaignCreate
-from app.services.contacts import get_contact_list, list_contacts
+from app.schemas.campaigns import CampaignCreate, RecipientFilters
+from app.services import dispatch, escrow, progress, quota, templates, throttle
+from app.services.contacts import get_contact_list, normalize_phone_prefix
 from app.services.queue import get_queue
 
 
-def _enqueue_recipient(recipient: CampaignRecipient) -> None:
+def _enqueue_recipients(campaign: Campaign, recipient_ids: list[UUID]) -> None:
     queue = get_queue("campaigns")
+    # Jobs from an earlier run (before a pause) still sit in the scheduler; the new token
+    # turns them into no-ops so each recipient is sent by this run only.
+    token = throttle.issue_dispatcher_token(campaign.id)
+    # Lay the whole campaign out on its throttle timeline now so no job has to sleep for its turn.
+    start = max(throttle.next_slot(campaign.id), time.time())
+    slots, following = throttle.plan_slots(
+        start,
+        campaign.throttle_min_seconds,
+        campaign.throttle_max_seconds,
+        limit=len(recipient_ids),
+    )
+    throttle.advance_cursor(campaign.id, following)
+    for recipient_id, slot in zip(recipient_ids, slots):
+        queue.enqueue_at(
+            datetime.fromtimestamp(slot, UTC),
+            "app.tasks.campaigns.process_campaign_recipient",
+            str(recipient_id),
+            token,
+            job_timeout=600,
+        )
+
+
+def _enqueue_campaign(campaign: Campaign) -> None:
+    queue = get_queue("campaigns")
+    token = throttle.issue_dispatcher_token(campaign.id)
     queue.enqueue(
-        "app.tasks.campaigns.process_campaign_recipient",
-        str(recipient.id),
-        job_timeout=600,
+        "app.tasks.campaigns.dispatch_campaign",
+        str(campaign.id),
+        token,
+        job_timeout=throttle.dispatch_job_timeout(),
     )
 
 
-async def create_campaign(db: AsyncSession, user: User, payload: CampaignCreate) -> Campaign:
-    contact_list = await get_contact_list(db, user, payload.list_id)
-    contacts = await list_contacts(db, contact_list)
+async def _enqueue_pending(db: AsyncSession, campaign: Campaign) -> None:
+    if campaign.status not in {CampaignStatus.QUEUED, CampaignStatus.SENDING}:
+        return
+    mode = get_settings().campaign_dispatch_mode
+    if mode == "async":
+        # The asyncio runtime (python -m app.worker --async) adopts QUEUED campaigns on its own.
+        return
+    # RQ and the throttle timeline speak to Redis synchronously; keep them off the event loop.
+    if mode == "campaign":
+        await run_in_threadpool(_enqueue_campaign, campaign)
+        return
+    result = await db.execute(
+        select(CampaignRecipient.id).where(
+            CampaignRecipient.campaign_id == campaign.id,
+            CampaignRecipient.status == DeliveryStatus.QUEUED,
+        )
+    )
+    pending = list(result.scalars().all())
+    if pending:
+        await run_in_threadpool(_enqueue_recipients, campaign, pending)
+
 
+def _variable_expr(name: str):
+    # Trimmed text, and whole numbers without a trailing ".0" (spreadsheets send 42 as 42.0).
+    value = Contact.meta[name]
+    return case(
+        (func.jsonb_typeof(value) == "number", cast(func.trim_scale(cast(value.astext, Numeric)), Text)),
+        else_=func.btrim(value.astext),
+    )
+
+
+def _recipient_source(
+    campaign: Campaign,
+    contact_list: ContactList,
+    payload: CampaignCreate,
+    contact_variables: list[str],
+    limit: int,
+):
+    filters = payload.filters or RecipientFilters()
+    criteria = [Contact.list_id == contact_list.id]
+    if filters.consent_only:
+        criteria.append(Contact.consent.is_(True))
+    if filters.phone_prefixes:
+        prefixes = [normalize_phone_prefix(prefix) for prefix in filters.phone_prefixes]
+        criteria.append(or_(*(Contact.phone_e164.startswith(prefix, autoescape=True) for prefix in prefixes)))
+    for column, expected in filters.metadata.items():
+        criteria.append(Contact.meta[column].astext == expected)
+
+    variables = func.jsonb_strip_nulls(
+        func.jsonb_build_object(*(part for name in contact_variables for part in (name, _variable_expr(name))))
+    )
+    source = select(
+        func.gen_random_uuid(),
+        cast(literal(campaign.id), CampaignRecipient.campaign_id.type),
+        Contact.id,
+        Contact.name,
+        Contact.phone_e164,
+        cast(literal(DeliveryStatus.QUEUED, CampaignRecipient.status.type), CampaignRecipient.status.type),
+        literal(0),
+        variables,
+    ).where(*criteria)
+    if payload.deduplicate:
+        source = source.distinct(Contact.phone_e164).order_by(Contact.phone_e164, Contact.created_at)
+    else:
+        source = source.order_by(Contact.created_at, Contact.id)
+    return source.limit(limit)
+
+
+async def create_campaign(db: AsyncSession, user: User, payload: CampaignCreate) -> tuple[Campaign, int]:
+    """Create a campaign and snapshot its recipients; return it with the number of contacts skipped.
+
+    Contacts are skipped when the filters exclude them or they duplicate a number already taken.
+    """
+
+    contact_list = await get_contact_list(db, user, payload.list_id)
     settings = get_settings()
-    if len(contacts) == 0:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Contact list has no contacts")
-    if len(contacts) > settings.max_campaign_recipients:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Campaign recipient cap exceeded")
+
+    template = templates.compile_template(payload.template_body)
+    declared = [name.strip() for name in payload.template_variables]
+    contact_variables = [
+        name
+        for name in dict.fromkeys([*template.contact_variables, *declared])
+        if name and name not in templates.BUILTIN_VARIABLES
+    ]
 
     campaign = Campaign(
         user_id=user.id,
         list_id=contact_list.id,
         name=payload.name,
         template_body=payload.template_body,
-        template_variables=payload.template_variables,
+        template_variables=payload.template_variables or template.variables,
         media_url=payload.media_url,
         document_url=payload.document_url,
         throttle_min_seconds=payload.throttle_min_seconds,
@@ -62,20 +166,39 @@ async def create_campaign(db: AsyncSession, user: User, payload: CampaignCreate)
     db.add(campaign)
     await db.flush()
 
-    recipients = [
-        CampaignRecipient(
-            campaign_id=campaign.id,
-            contact_id=contact.id,
-            name=contact.name,
-            phone_e164=contact.phone_e164,
+    # Snapshot the list into campaign_recipients in one statement; one row past the cap is
+    # enough to know the cap is exceeded without copying the whole list.
+    source = _recipient_source(
+        campaign, contact_list, payload, contact_variables, limit=settings.max_campaign_recipients + 1
+    )
+    result = await db.execute(
+        insert(CampaignRecipient).from_select(
+            [
+                CampaignRecipient.id,
+                CampaignRecipient.campaign_id,
+                CampaignRecipient.contact_id,
+                CampaignRecipient.name,
+                CampaignRecipient.phone_e164,
+                CampaignRecipient.status,
+                CampaignRecipient.attempts,
+                CampaignRecipient.variables,
+            ],
+            source,
         )
-        for contact in contacts
-    ]
-    db.add_all(recipients)
+    )
+    total = result.rowcount
+    if total == 0:
+        await db.rollback()
+        detail = "No contacts match the campaign filters" if payload.filters else "Contact list has no contacts"
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=detail)
+    if total > settings.max_campaign_recipients:
+        await db.rollback()
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Campaign recipient cap exceeded")
 
+    campaign.total_recipients = total
     await db.commit()
-    await db.refresh(campaign, attribute_names=["recipients"])
-    return campaign
+    await progress.seed_progress(campaign.id, {"total": total, DeliveryStatus.QUEUED.value: total})
+    return campaign, max(contact_list.total_contacts - total, 0)
 
 
 async def get_campaign(db: AsyncSession, user: User, campaign_id: UUID) -> Campaign:
@@ -100,55 +223,47 @@ async def start_campaign(db: AsyncSession, user: User, campaign: Campaign) -> Ca
     if user.plan_expires_at and user.plan_expires_at < now:
         raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="Subscription expired")
 
-    await db.refresh(campaign, attribute_names=["recipients"])
+    await db.refresh(campaign)
 
     if campaign.status not in {CampaignStatus.DRAFT, CampaignStatus.PAUSED}:
         raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Campaign already in progress")
 
-    settings = get_settings()
-
-    total_recipients = len(campaign.recipients)
-    if total_recipients == 0:
+    if campaign.total_recipients == 0:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No recipients to send")
 
-    required_points = total_recipients * settings.points_per_recipient
-    if user.points_balance < required_points:
-        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="Insufficient points balance")
-
-    today = datetime.now(UTC).date()
-    result = await db.execute(
-        select(CampaignRecipient)
-        .join(Campaign)
-        .where(
-            Campaign.user_id == user.id,
-            CampaignRecipient.sent_at.is_not(None),
-            CampaignRecipient.status == DeliveryStatus.SENT,
-            CampaignRecipient.sent_at >= datetime.combine(today, datetime.min.time(), tzinfo=UTC),
-        )
-    )
-    sent_today = len(result.scalars().all())
-    if sent_today + total_recipients > settings.max_daily_recipients:
+    pending = campaign.total_recipients - campaign.sent_count - campaign.failed_count
+    if (campaign.meta or {}).get("quota_day") == quota.quota_day():
+        # Restarting a campaign paused earlier today; its recipients already hold today's slots.
+        pending = 0
+    if not await quota.reserve_async(db, user.id, pending):
         raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail="Daily limit exceeded")
 
+    if not await db.run_sync(escrow.reserve_for_pending, campaign.id):
+        await db.rollback()
+        await run_in_threadpool(quota.release, user.id, pending)
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="Insufficient points balance")
+
+    campaign.meta = {**(campaign.meta or {}), "quota_day": quota.quota_day()}
     campaign.status = CampaignStatus.QUEUED
     campaign.started_at = datetime.now(UTC)
     await db.commit()
-    await db.refresh(campaign, attribute_names=["recipients"])
+    await progress.flush_committed(db)
+    await db.refresh(campaign)
 
-    for recipient in campaign.recipients:
-        _enqueue_recipient(recipient)
+    await _enqueue_pending(db, campaign)
 
     return campaign
 
 
 async def update_campaign_status(db: AsyncSession, campaign: Campaign, status: CampaignStatus) -> Campaign:
     campaign.status = status
+    cancelled = 0
     if status == CampaignStatus.CANCELLED:
-        for recipient in campaign.recipients:
-            if recipient.status in {DeliveryStatus.QUEUED, DeliveryStatus.SENDING}:
-                recipient.status = DeliveryStatus.FAILED
-                recipient.last_error = "Cancelled"
+        cancelled = await db.run_sync(dispatch.fail_pending_recipients, campaign.id, "Cancelled")
+        await db.run_sync(escrow.release_campaign, campaign.id)
     await db.commit()
+    await progress.flush_committed(db)
+    await run_in_threadpool(quota.release_for_campaign, campaign, cancelled)
     await db.refresh(campaign)
     return campaign
 
@@ -158,7 +273,8 @@ async def pause_campaign(db: AsyncSession, campaign: Campaign) -> Campaign:
         raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Campaign cannot be paused")
     campaign.status = CampaignStatus.PAUSED
     await db.commit()
-    await db.refresh(campaign, attribute_names=["recipients"])
+    await progress.flush_committed(db)
+    await db.refresh(campaign)
     return campaign
 
 
@@ -170,40 +286,77 @@ async def resume_campaign(db: AsyncSession, campaign: Campaign) -> Campaign:
     meta["consecutive_failures"] = 0
     campaign.meta = meta
     await db.commit()
-    await db.refresh(campaign, attribute_names=["recipients"])
-    for recipient in campaign.recipients:
-        if recipient.status == DeliveryStatus.QUEUED:
-            _enqueue_recipient(recipient)
+    await progress.flush_committed(db)
+    # A campaign paused by its final failures has nothing left to send; settle it instead.
+    if await db.run_sync(dispatch.finalize_campaign_if_done, campaign.id):
+        await db.commit()
+        await progress.flush_committed(db)
+    else:
+        await reconcile_campaign_progress(db, campaign)
+    await db.refresh(campaign)
+    await _enqueue_pending(db, campaign)
     return campaign
 
 
 async def cancel_campaign(db: AsyncSession, campaign: Campaign) -> Campaign:
-    await db.refresh(campaign, attribute_names=["recipients"])
     campaign.status = CampaignStatus.CANCELLED
-    for recipient in campaign.recipients:
-        if recipient.status in {DeliveryStatus.QUEUED, DeliveryStatus.SENDING}:
-            recipient.status = DeliveryStatus.FAILED
-            recipient.last_error = "Campaign cancelled"
+    cancelled = await db.run_sync(dispatch.fail_pending_recipients, campaign.id, "Campaign cancelled")
+    await db.run_sync(escrow.release_campaign, campaign.id)
     await db.commit()
+    await progress.flush_committed(db)
+    await run_in_threadpool(quota.release_for_campaign, campaign, cancelled)
     await db.refresh(campaign)
     return campaign
 
 
-async def get_campaign_recipients(db: AsyncSession, campaign: Campaign) -> list[CampaignRecipient]:
-    result = await db.execute(select(CampaignRecipient).where(CampaignRecipient.campaign_id == campaign.id))
+def recipients_query(
+    campaign: Campaign,
+    *,
+    after: UUID | None = None,
+    delivery_status: DeliveryStatus | None = None,
+    phone_prefix: str | None = None,
+) -> Select:
+    """Select a campaign's recipients in id order, the order the (campaign_id, id) index walks."""
+
+    query = select(CampaignRecipient).where(CampaignRecipient.campaign_id == campaign.id)
+    if after is not None:
+        query = query.where(CampaignRecipient.id > after)
+    if delivery_status is not None:
+        query = query.where(CampaignRecipient.status == delivery_status)
+    if phone_prefix:
+        query = query.where(
+            CampaignRecipient.phone_e164.startswith(normalize_phone_prefix(phone_prefix), autoescape=True)
+        )
+    return query.order_by(CampaignRecipient.id)
+
+
+async def list_campaign_recipients(
+    db: AsyncSession,
+    campaign: Campaign,
+    *,
+    limit: int = 500,
+    after: UUID | None = None,
+    delivery_status: DeliveryStatus | None = None,
+    phone_prefix: str | None = None,
+) -> list[CampaignRecipient]:
+    """Return one page of recipients; pass the last id seen as ``after`` for the next page."""
+
+    query = recipients_query(campaign, after=after, delivery_status=delivery_status, phone_prefix=phone_prefix)
+    result = await db.execute(query.limit(limit))
     return list(result.scalars().all())
 
 
 async def compute_campaign_progress(db: AsyncSession, campaign: Campaign) -> dict[str, int]:
-    recipients = await get_campaign_recipients(db, campaign)
-    progress = {
-        "total": len(recipients),
-        "queued": 0,
-        "sending": 0,
-        "sent": 0,
-        "failed": 0,
-        "read": 0,
-    }
-    for rec in recipients:
-        progress[rec.status.value] += 1
-    return progress
+    cached = await progress.load_progress(campaign.id)
+    if cached is not None:
+        return cached
+    counts = await db.run_sync(progress.count_progress, campaign.id)
+    await progress.seed_progress(campaign.id, counts)
+    # Read back whichever seed won, with its seq.
+    return await progress.load_progress(campaign.id) or counts
+
+
+async def reconcile_campaign_progress(db: AsyncSession, campaign: Campaign) -> dict[str, int]:
+    """Rebuild the campaign's progress hash from the recipient table."""
+
+    return await progress.reconcile_progress(db, campaign.id)
@@ -1,76 +1,325 @@
 from __future__ import annotations
 
 import io
+import json
+import multiprocessing
+import os
+import uuid
 from collections import OrderedDict
-from typing import Iterable
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import BinaryIO, Iterable, Iterator
 
 import pandas as pd
 import phonenumbers
 from fastapi import HTTPException, UploadFile, status
-from sqlalchemy import func, select
+from openpyxl import load_workbook
+from rq.exceptions import NoSuchJobError
+from rq.job import Job
+from sqlalchemy import Select, func, insert, select
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
 
+from app.core.config import get_settings
 from app.models import Contact, ContactList, ContactSource, User
-from app.schemas.contacts import ContactListCreate
+from app.schemas.contacts import ContactImportRead, ContactListCreate
+from app.services import storage
+from app.services.queue import get_queue, get_redis_connection
 
 
 REQUIRED_HEADERS = {"name", "phone_e164", "consent"}
 
+CONSENT_VALUES = ("true", "1", "yes", "y")
 
-def parse_contacts_file(file_bytes: bytes, filename: str) -> list[dict]:
-    if filename.lower().endswith(".csv"):
-        df = pd.read_csv(io.BytesIO(file_bytes))
-    elif filename.lower().endswith((".xlsx", ".xls")):
-        df = pd.read_excel(io.BytesIO(file_bytes))
-    else:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Unsupported file type")
+# Rows parsed, validated and written per step of an upload.
+DEFAULT_CHUNK_SIZE = 20000
 
-    missing = REQUIRED_HEADERS - set(df.columns.str.lower())
-    if missing:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Missing required headers: {', '.join(sorted(missing))}",
-        )
+IMPORT_QUEUE = "imports"
+IMPORT_JOB_TIMEOUT_SECONDS = 3600
+# How long a finished or failed import's status stays readable.
+IMPORT_STATUS_TTL_SECONDS = 24 * 3600
+
+# Below this many distinct numbers, shipping them to worker processes costs more than it saves.
+PARALLEL_VALIDATION_THRESHOLD = 5000
+_VALIDATION_CHUNK_SIZE = 2000
+
+_CONTACT_COLUMNS = ("id", "list_id", "name", "phone_e164", "consent", "metadata")
+# PostgreSQL accepts at most 32767 bind parameters per statement.
+_INSERT_BATCH_SIZE = 32767 // len(_CONTACT_COLUMNS)
+
+_validation_pool: ProcessPoolExecutor | None = None
+
+
+class ContactImportError(ValueError):
+    """Raised when an uploaded contact file cannot be imported; the message is shown to the user."""
 
-    df.columns = [col.lower() for col in df.columns]
-    df = df.dropna(subset=["phone_e164"])
 
-    records: list[dict] = []
-    seen_numbers: set[str] = set()
+def _get_validation_pool() -> ProcessPoolExecutor:
+    global _validation_pool
+    if _validation_pool is None:
+        workers = get_settings().contact_parse_workers or os.cpu_count() or 1
+        # Spawned, not forked: the API process runs threads that a fork would copy mid-flight.
+        _validation_pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+    return _validation_pool
 
-    for _, row in df.iterrows():
-        raw_number = str(row["phone_e164"]).strip()
-        if not raw_number.startswith("+"):
-            raw_number = "+" + raw_number
+
+def shutdown_validation_pool() -> None:
+    global _validation_pool
+    if _validation_pool is not None:
+        _validation_pool.shutdown(cancel_futures=True)
+        _validation_pool = None
+
+
+def _format_numbers(raw_numbers: list[str]) -> list[str | None]:
+    """Return the E.164 form of each number, or ``None`` where it is not a valid number."""
+
+    formatted: list[str | None] = []
+    for raw_number in raw_numbers:
         try:
             parsed = phonenumbers.parse(raw_number, None)
-            if not phonenumbers.is_valid_number(parsed):
-                raise ValueError
-        except Exception as exc:  # noqa: BLE001
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Invalid phone number: {raw_number}",
-            ) from exc
-
-        e164 = phonenumbers.format_number(parsed, phonenumbers.PhoneNumberFormat.E164)
-        consent_value = row.get("consent")
-        consent = bool(consent_value) and str(consent_value).strip().lower() in {"true", "1", "yes", "y"}
-        if not consent:
+        except phonenumbers.NumberParseException:
+            formatted.append(None)
             continue
+        if phonenumbers.is_valid_number(parsed):
+            formatted.append(phonenumbers.format_number(parsed, phonenumbers.PhoneNumberFormat.E164))
+        else:
+            formatted.append(None)
+    return formatted
 
-        if e164 in seen_numbers:
-            continue
-        seen_numbers.add(e164)
 
-        name = str(row.get("name") or "").strip() or None
-        metadata = row.to_dict()
-        records.append({"name": name, "phone_e164": e164, "consent": consent, "metadata": metadata})
+def validate_numbers(raw_numbers: list[str]) -> dict[str, str | None]:
+    """Map each distinct raw number to its E.164 form (``None`` when invalid).
+
+    Large batches are split across a process pool; phonenumbers is pure Python and holds the GIL.
+    """
+
+    unique = list(dict.fromkeys(raw_numbers))
+    if len(unique) < PARALLEL_VALIDATION_THRESHOLD:
+        return dict(zip(unique, _format_numbers(unique)))
+    chunks = [unique[offset : offset + _VALIDATION_CHUNK_SIZE] for offset in range(0, len(unique), _VALIDATION_CHUNK_SIZE)]
+    formatted = [number for chunk in _get_validation_pool().map(_format_numbers, chunks) for number in chunk]
+    return dict(zip(unique, formatted))
+
+
+def _column_text(column: pd.Series) -> pd.Series:
+    # Numeric columns with blanks come back as floats; "6281234567890.0" is not a phone number.
+    if pd.api.types.is_float_dtype(column):
+        rounded = column.dropna()
+        if (rounded == rounded.round()).all():
+            column = column.astype("Int64")
+    return column.astype("string").str.strip()
+
+
+def _read_xlsx_frames(fileobj: BinaryIO, chunk_size: int) -> Iterator[pd.DataFrame]:
+    # Read-only mode streams rows off the sheet XML instead of building the whole workbook.
+    workbook = load_workbook(fileobj, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = [str(value).strip() if value is not None else f"Unnamed: {index}" for index, value in enumerate(header)]
+        batch: list[tuple] = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= chunk_size:
+                yield pd.DataFrame.from_records(batch, columns=columns)
+                batch = []
+        yield pd.DataFrame.from_records(batch, columns=columns)
+    finally:
+        workbook.close()
+
+
+def _read_frames(fileobj: BinaryIO, filename: str, chunk_size: int) -> Iterator[pd.DataFrame]:
+    lowered = filename.lower()
+    if lowered.endswith(".csv"):
+        with pd.read_csv(fileobj, chunksize=chunk_size) as reader:
+            yield from reader
+    elif lowered.endswith(".xlsx"):
+        yield from _read_xlsx_frames(fileobj, chunk_size)
+    elif lowered.endswith(".xls"):
+        # Legacy workbooks have no streaming reader and are capped at 65k rows anyway.
+        yield pd.read_excel(fileobj)
+    else:
+        raise ContactImportError("Unsupported file type")
+
+
+@dataclass
+class ImportStats:
+    """Running totals for one import; every row read lands in exactly one of the last three."""
+
+    processed: int = 0
+    rejected: int = 0
+    deduplicated: int = 0
+    imported: int = 0
+
+
+def _parse_frame(df: pd.DataFrame, seen: set[str], stats: ImportStats) -> list[dict]:
+    stats.processed += len(df)
+    df = df.dropna(subset=["phone_e164"]).reset_index(drop=True)
+
+    raw_numbers = _column_text(df["phone_e164"])
+    raw_numbers = raw_numbers.where(raw_numbers.str.startswith("+"), "+" + raw_numbers)
+    formatted = raw_numbers.map(validate_numbers(raw_numbers.tolist()))
+
+    consent = _column_text(df["consent"]).str.lower().isin(CONSENT_VALUES).fillna(False).astype(bool)
+    accepted = formatted[consent & formatted.notna()]
+    numbers = accepted[~accepted.duplicated() & ~accepted.isin(seen)]
+    seen.update(numbers)
+    stats.deduplicated += len(accepted) - len(numbers)
+    stats.imported += len(numbers)
+    stats.rejected = stats.processed - stats.deduplicated - stats.imported
+
+    kept = df.loc[numbers.index]
+    names = kept["name"].astype("string").str.strip().replace("", pd.NA)
+    names = names.astype(object).where(names.notna(), None)
+    metadata = kept.astype(object).where(kept.notna(), None).to_dict(orient="records")
+    return [
+        {"name": name, "phone_e164": e164, "consent": True, "metadata": meta}
+        for name, e164, meta in zip(names, numbers, metadata)
+    ]
+
+
+def iter_contact_records(
+    fileobj: BinaryIO,
+    filename: str,
+    *,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    stats: ImportStats | None = None,
+) -> Iterator[list[dict]]:
+    """Yield validated, deduplicated contact records one chunk of the file at a time.
+
+    Rows without consent or a valid number are rejected and counted in ``stats``. Only the
+    current chunk and the set of numbers already taken are held in memory.
+    """
+
+    stats = stats if stats is not None else ImportStats()
+    seen: set[str] = set()
+    checked_headers = False
+    for df in _read_frames(fileobj, filename, chunk_size):
+        if not checked_headers:
+            missing = REQUIRED_HEADERS - set(df.columns.str.lower())
+            if missing:
+                raise ContactImportError(f"Missing required headers: {', '.join(sorted(missing))}")
+            checked_headers = True
+        df.columns = [col.lower() for col in df.columns]
+        records = _parse_frame(df, seen, stats)
+        if records:
+            yield records
 
+
+def parse_contacts_file(file_bytes: bytes, filename: str) -> list[dict]:
+    records = [record for chunk in iter_contact_records(io.BytesIO(file_bytes), filename) for record in chunk]
     if not records:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No valid contacts found")
+        raise ContactImportError("No valid contacts found")
     return records
 
 
+def _contact_rows(list_id: uuid.UUID, records: Iterable[dict]) -> list[tuple]:
+    return [
+        (
+            uuid.uuid4(),
+            list_id,
+            record.get("name"),
+            record["phone_e164"],
+            record.get("consent", True),
+            record.get("metadata") or {},
+        )
+        for record in records
+    ]
+
+
+def _json_text(value: dict) -> str:
+    # Spreadsheet dates and the like are stored as their string form.
+    return json.dumps(value, default=str)
+
+
+async def bulk_insert_contacts(db: AsyncSession, list_id: uuid.UUID, records: Iterable[dict]) -> int:
+    """Write contacts straight into the table and return how many were written.
+
+    Uses COPY on asyncpg connections and multi-row INSERTs otherwise; either way no ORM
+    objects are built. Runs inside the caller's transaction, so the caller commits.
+    """
+
+    rows = _contact_rows(list_id, records)
+    if not rows:
+        return 0
+    connection = await db.connection()
+    driver_connection = (await connection.get_raw_connection()).driver_connection
+    if hasattr(driver_connection, "copy_records_to_table"):
+        await driver_connection.copy_records_to_table(
+            Contact.__tablename__,
+            records=[(*row[:-1], _json_text(row[-1])) for row in rows],
+            columns=_CONTACT_COLUMNS,
+        )
+    else:
+        for offset in range(0, len(rows), _INSERT_BATCH_SIZE):
+            batch = rows[offset : offset + _INSERT_BATCH_SIZE]
+            await db.execute(insert(Contact.__table__).values([dict(zip(_CONTACT_COLUMNS, row)) for row in batch]))
+    return len(rows)
+
+
+def copy_contacts(session: Session, list_id: uuid.UUID, records: Iterable[dict]) -> int:
+    """Synchronous counterpart of :func:`bulk_insert_contacts` for the RQ workers (psycopg COPY)."""
+
+    rows = _contact_rows(list_id, records)
+    if not rows:
+        return 0
+    cursor = session.connection().connection.driver_connection.cursor()
+    columns = ", ".join(_CONTACT_COLUMNS)
+    with cursor.copy(f"COPY {Contact.__tablename__} ({columns}) FROM STDIN") as copy:
+        for row in rows:
+            copy.write_row((*row[:-1], _json_text(row[-1])))
+    return len(rows)
+
+
+def enqueue_contact_import(
+    user: User, fileobj: BinaryIO, filename: str, content_type: str | None, list_name: str
+) -> ContactImportRead:
+    """Park the upload in object storage and queue the parse/validate/insert work.
+
+    Blocking (MinIO and Redis I/O); async callers run it in the threadpool.
+    """
+
+    lowered = filename.lower()
+    if not lowered.endswith((".csv", ".xlsx", ".xls")):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Unsupported file type")
+    object_name = storage.upload_import_file(fileobj, filename, content_type)
+    job = get_queue(IMPORT_QUEUE).enqueue(
+        "app.tasks.contacts.import_contact_file",
+        str(user.id),
+        object_name,
+        filename,
+        list_name,
+        job_timeout=IMPORT_JOB_TIMEOUT_SECONDS,
+        result_ttl=IMPORT_STATUS_TTL_SECONDS,
+        failure_ttl=IMPORT_STATUS_TTL_SECONDS,
+        meta={"user_id": str(user.id), "filename": filename},
+    )
+    return _import_status(job)
+
+
+def get_contact_import(user: User, job_id: str) -> ContactImportRead:
+    """Blocking (Redis I/O); async callers run it in the threadpool."""
+
+    try:
+        job = Job.fetch(job_id, connection=get_redis_connection())
+    except NoSuchJobError:
+        job = None
+    if job is None or job.meta.get("user_id") != str(user.id):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Import not found")
+    return _import_status(job)
+
+
+def _import_status(job: Job) -> ContactImportRead:
+    job_status = job.get_status(refresh=False)
+    return ContactImportRead(
+        job_id=job.id,
+        status=getattr(job_status, "value", job_status) or "queued",
+        **{key: job.meta[key] for key in ContactImportRead.model_fields if key in job.meta},
+    )
+
+
 async def create_contact_list(
     db: AsyncSession, user: User, data: ContactListCreate, contacts: Iterable[dict]
 ) -> ContactList:
@@ -83,19 +332,7 @@ async def create_contact_list(
     db.add(contact_list)
     await db.flush()
 
-    to_create = []
-    for row in contacts:
-        to_create.append(
-            Contact(
-                list_id=contact_list.id,
-                name=row.get("name"),
-                phone_e164=row["phone_e164"],
-                consent=row.get("consent", True),
-                meta=row.get("metadata") or {},
-            )
-        )
-    db.add_all(to_create)
-    contact_list.total_contacts = len(to_create)
+    contact_list.total_contacts = await bulk_insert_contacts(db, contact_list.id, contacts)
 
     await db.commit()
     await db.refresh(contact_list)
@@ -117,6 +354,40 @@ async def get_contact_list(db: AsyncSession, user: User, list_id) -> ContactList
     return contact_list
 
 
-async def list_contacts(db: AsyncSession, contact_list: ContactList) -> list[Contact]:
-    result = await db.execute(select(Contact).where(Contact.list_id == contact_list.id))
+def normalize_phone_prefix(prefix: str) -> str:
+    return "+" + prefix.strip().lstrip("+")
+
+
+def contacts_query(
+    contact_list: ContactList,
+    *,
+    after: uuid.UUID | None = None,
+    phone_prefix: str | None = None,
+    consent: bool | None = None,
+) -> Select:
+    """Select a list's contacts in id order, the order the (list_id, id) index walks."""
+
+    query = select(Contact).where(Contact.list_id == contact_list.id)
+    if after is not None:
+        query = query.where(Contact.id > after)
+    if phone_prefix:
+        query = query.where(Contact.phone_e164.startswith(normalize_phone_prefix(phone_prefix), autoescape=True))
+    if consent is not None:
+        query = query.where(Contact.consent.is_(consent))
+    return query.order_by(Contact.id)
+
+
+async def list_contacts(
+    db: AsyncSession,
+    contact_list: ContactList,
+    *,
+    limit: int = 500,
+    after: uuid.UUID | None = None,
+    phone_prefix: str | None = None,
+    consent: bool | None = None,
+) -> list[Contact]:
+    """Return one page of contacts; pass the last id seen as ``after`` for the next page."""
+
+    query = contacts_query(contact_list, after=after, phone_prefix=phone_prefix, consent=consent)
+    result = await db.execute(query.limit(limit))
     return list(result.scalars().all())
@@ -0,0 +1,191 @@
+from __future__ import annotations
+
+import json
+import math
+import time
+from datetime import datetime, timedelta
+from typing import Protocol
+from uuid import UUID
+
+from loguru import logger
+from redis.asyncio import Redis as AsyncRedis
+from redis.exceptions import RedisError
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import get_settings
+from app.models import AutoResponseLog, AutoResponseRule
+from app.services.queue import get_async_redis_connection
+
+
+# Triggers waiting to be copied into auto_response_logs, oldest first.
+COOLDOWN_AUDIT_KEY = "automation:cooldown:audit"
+AUDIT_BATCH_SIZE = 1000
+
+# The cooldown key (KEYS[1]) holds the timestamp of the message that last triggered the rule,
+# so a message is measured against it by its own timestamp (ARGV[1]) however late it is
+# processed. Start a cooldown of ARGV[2] seconds unless that one is still running, keep the key
+# for ARGV[3] seconds and, when auditing is on (ARGV[4] == '1'), queue the trigger (ARGV[5]) for
+# the audit table in the same round trip.
+_ACQUIRE_SCRIPT = """
+local last = redis.call('GET', KEYS[1])
+if last and tonumber(ARGV[1]) - tonumber(last) < tonumber(ARGV[2]) then
+  return 0
+end
+redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[3])
+if ARGV[4] == '1' then
+  redis.call('RPUSH', KEYS[2], ARGV[5])
+end
+return 1
+"""
+
+# Undo _ACQUIRE_SCRIPT: drop the cooldown (KEYS[1]) and its queued audit entry (ARGV[1]), which
+# sits near the tail of the audit list (KEYS[2]).
+_RELEASE_SCRIPT = """
+redis.call('DEL', KEYS[1])
+redis.call('LREM', KEYS[2], -1, ARGV[1])
+return 1
+"""
+
+
+class CooldownStore(Protocol):
+    async def acquire(self, rule_id: UUID, contact_phone: str, seconds: int, at: datetime) -> bool:
+        """Start the rule's cooldown for the contact; ``False`` when one is already running."""
+
+    async def discard(self) -> None:
+        """Undo every cooldown this store started; call it when the caller's transaction fails."""
+
+
+class DatabaseCooldownStore:
+    """Cooldowns kept in auto_response_logs, checked and started by one conditional upsert.
+
+    Writes to the caller's session; the caller commits.
+    """
+
+    def __init__(self, db: AsyncSession) -> None:
+        self.db = db
+
+    async def acquire(self, rule_id: UUID, contact_phone: str, seconds: int, at: datetime) -> bool:
+        statement = insert(AutoResponseLog).values(rule_id=rule_id, contact_phone=contact_phone, last_triggered_at=at)
+        statement = statement.on_conflict_do_update(
+            index_elements=[AutoResponseLog.rule_id, AutoResponseLog.contact_phone],
+            set_={"last_triggered_at": statement.excluded.last_triggered_at},
+            where=AutoResponseLog.last_triggered_at <= statement.excluded.last_triggered_at - timedelta(seconds=seconds),
+        ).returning(AutoResponseLog.id)
+        result = await self.db.execute(statement)
+        return result.first() is not None
+
+    async def discard(self) -> None:
+        # The upserts live in the caller's transaction; its rollback undoes them.
+        return None
+
+
+class RedisCooldownStore:
+    """Cooldowns as expiring Redis keys: one script both checks and starts a cooldown.
+
+    Like the database store, a cooldown runs from the triggering message's timestamp, not from
+    when the message was processed. Falls back to ``fallback`` while Redis is unreachable.
+    """
+
+    def __init__(
+        self, redis: AsyncRedis | None = None, *, audit: bool = True, fallback: CooldownStore | None = None
+    ) -> None:
+        self.redis = redis or get_async_redis_connection()
+        self.audit = audit
+        self.fallback = fallback
+        self._acquired: list[tuple[str, str]] = []
+
+    async def acquire(self, rule_id: UUID, contact_phone: str, seconds: int, at: datetime) -> bool:
+        entry = json.dumps({"rule_id": str(rule_id), "contact_phone": contact_phone, "at": at.isoformat()})
+        key = f"automation:cooldown:{rule_id}:{contact_phone}"
+        triggered_at = at.timestamp()
+        # Keep the key until the cooldown ends, counting from now for a message processed late.
+        ttl = seconds + max(0, math.ceil(time.time() - triggered_at))
+        try:
+            acquired = await self.redis.eval(
+                _ACQUIRE_SCRIPT,
+                2,
+                key,
+                COOLDOWN_AUDIT_KEY,
+                repr(triggered_at),
+                seconds,
+                max(ttl, 1),
+                "1" if self.audit else "0",
+                entry,
+            )
+        except RedisError as exc:
+            if self.fallback is None:
+                raise
+            logger.warning("Cooldown store unavailable, using the fallback: %s", exc)
+            return await self.fallback.acquire(rule_id, contact_phone, seconds, at)
+        if acquired == 1:
+            self._acquired.append((key, entry))
+        return acquired == 1
+
+    async def discard(self) -> None:
+        acquired, self._acquired = self._acquired, []
+        try:
+            for key, entry in acquired:
+                await self.redis.eval(_RELEASE_SCRIPT, 2, key, COOLDOWN_AUDIT_KEY, entry)
+        except RedisError as exc:
+            logger.warning("Could not release %s auto-response cooldowns: %s", len(acquired), exc)
+        if self.fallback is not None:
+            await self.fallback.discard()
+
+
+def get_cooldown_store(db: AsyncSession) -> CooldownStore:
+    settings = get_settings()
+    database = DatabaseCooldownStore(db)
+    if settings.auto_response_cooldown_backend == "database":
+        return database
+    return RedisCooldownStore(audit=settings.auto_response_audit_log, fallback=database)
+
+
+async def flush_cooldown_audit(db: AsyncSession, *, batch_size: int = AUDIT_BATCH_SIZE) -> int:
+    """Copy queued triggers into auto_response_logs, one upsert per batch; return how many were read.
+
+    Entries are popped before they are written, so a crash mid-batch loses that batch. That is
+    acceptable for an audit trail and keeps several API processes from writing an entry twice.
+    """
+
+    redis = get_async_redis_connection()
+    flushed = 0
+    while True:
+        raw_entries = await redis.lpop(COOLDOWN_AUDIT_KEY, batch_size)
+        if not raw_entries:
+            return flushed
+        flushed += len(raw_entries)
+
+        latest: dict[tuple[UUID, str], datetime] = {}
+        for raw in raw_entries:
+            entry = json.loads(raw)
+            key = (UUID(entry["rule_id"]), entry["contact_phone"])
+            at = datetime.fromisoformat(entry["at"])
+            if key not in latest or latest[key] < at:
+                latest[key] = at
+        # Rules deleted since the trigger have taken their logs with them.
+        existing = await db.execute(
+            select(AutoResponseRule.id).where(AutoResponseRule.id.in_({rule_id for rule_id, _ in latest}))
+        )
+        live_rules = set(existing.scalars().all())
+        rows = [
+            {"rule_id": rule_id, "contact_phone": phone, "last_triggered_at": at}
+            for (rule_id, phone), at in latest.items()
+            if rule_id in live_rules
+        ]
+        if rows:
+            statement = insert(AutoResponseLog).values(rows)
+            await db.execute(
+                statement.on_conflict_do_update(
+                    index_elements=[AutoResponseLog.rule_id, AutoResponseLog.contact_phone],
+                    set_={
+                        "last_triggered_at": func.greatest(
+                            AutoResponseLog.last_triggered_at, statement.excluded.last_triggered_at
+                        )
+                    },
+                )
+            )
+        await db.commit()
+        if len(raw_entries) < batch_size:
+            return flushed
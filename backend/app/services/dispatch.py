@@ -0,0 +1,276 @@
+from __future__ import annotations
+
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from uuid import UUID
+
+from sqlalchemy import case, cast, func, literal, select, update
+from sqlalchemy.orm import Session
+
+from app.core.config import get_settings
+from app.models import (
+    Campaign,
+    CampaignRecipient,
+    CampaignStatus,
+    DeliveryStatus,
+)
+from app.services import escrow, progress, quota, templates
+
+
+# These helpers take a synchronous Session so the RQ tasks can call them directly and the
+# asyncio runtime can reach them through AsyncSession.run_sync.
+
+
+IN_FLIGHT_STATUSES = (DeliveryStatus.QUEUED, DeliveryStatus.SENDING)
+
+
+@dataclass
+class ClaimedRecipient:
+    id: UUID
+    name: str | None
+    phone_e164: str
+    attempts: int
+    body: str
+
+
+@dataclass
+class SendOutcome:
+    recipient: ClaimedRecipient
+    sent: bool
+    transient: bool = False
+    error_message: str | None = None
+
+
+def claim_recipients(session: Session, campaign: Campaign, limit: int) -> list[ClaimedRecipient]:
+    claimable = (
+        select(CampaignRecipient.id)
+        .where(
+            CampaignRecipient.campaign_id == campaign.id,
+            CampaignRecipient.status == DeliveryStatus.QUEUED,
+        )
+        .order_by(CampaignRecipient.created_at, CampaignRecipient.id)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    result = session.execute(
+        update(CampaignRecipient)
+        .where(CampaignRecipient.id.in_(claimable))
+        .values(status=DeliveryStatus.SENDING, attempts=CampaignRecipient.attempts + 1)
+        .returning(
+            CampaignRecipient.id,
+            CampaignRecipient.name,
+            CampaignRecipient.phone_e164,
+            CampaignRecipient.attempts,
+            CampaignRecipient.variables,
+            CampaignRecipient.created_at,
+        )
+        .execution_options(synchronize_session=False)
+    )
+    rows = sorted(result.all(), key=lambda row: (row.created_at, row.id))
+    progress.record_transition(session, campaign.id, DeliveryStatus.QUEUED, DeliveryStatus.SENDING, len(rows))
+    if rows and not quota.admit_batch(session, campaign, len(rows)):
+        requeue_recipients(session, campaign.id, [row.id for row in rows], attempts=CampaignRecipient.attempts - 1)
+        pause_for_quota(campaign)
+        return []
+    template = templates.campaign_template(campaign.id, campaign.template_body)
+    bodies = template.render_many(
+        templates.recipient_context(row.name, row.phone_e164, row.variables) for row in rows
+    )
+    return [
+        ClaimedRecipient(id=row.id, name=row.name, phone_e164=row.phone_e164, attempts=row.attempts, body=body)
+        for row, body in zip(rows, bodies)
+    ]
+
+
+def pause_for_quota(campaign: Campaign) -> None:
+    campaign.status = CampaignStatus.PAUSED
+    campaign.meta = {**(campaign.meta or {}), "paused_reason": "daily_quota"}
+
+
+def will_retry(outcome: SendOutcome) -> bool:
+    settings = get_settings()
+    return outcome.transient and outcome.recipient.attempts < len(settings.campaign_failure_backoff_schedule)
+
+
+def _move_recipients(
+    session: Session, campaign_id: UUID, criteria: list, target: DeliveryStatus, **values
+) -> list[UUID]:
+    previous = (
+        select(CampaignRecipient.id, CampaignRecipient.status)
+        .where(CampaignRecipient.campaign_id == campaign_id, *criteria)
+        .with_for_update()
+        .subquery()
+    )
+    result = session.execute(
+        update(CampaignRecipient)
+        .where(CampaignRecipient.id == previous.c.id)
+        .values(status=target, **values)
+        .returning(CampaignRecipient.id, previous.c.status)
+        .execution_options(synchronize_session=False)
+    )
+    rows = result.all()
+    for source, count in Counter(row[1] for row in rows).items():
+        progress.record_transition(session, campaign_id, source, target, count)
+    return [row[0] for row in rows]
+
+
+def transition_recipients(
+    session: Session, campaign_id: UUID, recipient_ids: list[UUID], target: DeliveryStatus, **values
+) -> list[UUID]:
+    """Move recipients that are still in flight to ``target``; return the ids that actually moved.
+
+    Recipients already settled elsewhere (for example failed by a cancel) are left alone, so
+    every recipient reaches a terminal status, and is counted, exactly once.
+    """
+
+    if not recipient_ids:
+        return []
+    criteria = [CampaignRecipient.id.in_(recipient_ids), CampaignRecipient.status.in_(IN_FLIGHT_STATUSES)]
+    return _move_recipients(session, campaign_id, criteria, target, **values)
+
+
+def requeue_recipients(
+    session: Session, campaign_id: UUID, recipient_ids: list[UUID] | None = None, **values
+) -> list[UUID]:
+    """Put SENDING recipients back in the queue; all of the campaign's when ``recipient_ids`` is None."""
+
+    criteria = [CampaignRecipient.status == DeliveryStatus.SENDING]
+    if recipient_ids is not None:
+        if not recipient_ids:
+            return []
+        criteria.append(CampaignRecipient.id.in_(recipient_ids))
+    return _move_recipients(session, campaign_id, criteria, DeliveryStatus.QUEUED, **values)
+
+
+def record_transitions(session: Session, campaign_id: UUID, *, sent: int = 0, failed: int = 0) -> None:
+    if not sent and not failed:
+        return
+    session.execute(
+        update(Campaign)
+        .where(Campaign.id == campaign_id)
+        .values(sent_count=Campaign.sent_count + sent, failed_count=Campaign.failed_count + failed)
+    )
+
+
+def fail_pending_recipients(session: Session, campaign_id: UUID, reason: str) -> int:
+    criteria = [CampaignRecipient.status.in_(IN_FLIGHT_STATUSES)]
+    failed = len(_move_recipients(session, campaign_id, criteria, DeliveryStatus.FAILED, last_error=reason))
+    record_transitions(session, campaign_id, failed=failed)
+    return failed
+
+
+def apply_outcomes(
+    session: Session,
+    campaign_id: UUID,
+    outcomes: list[SendOutcome],
+    unsent: list[ClaimedRecipient],
+) -> list[tuple[UUID, int]]:
+    """Write a dispatched batch back and commit; return the (recipient id, backoff) pairs to retry."""
+
+    settings = get_settings()
+    now = datetime.now(timezone.utc)
+    backoff_schedule = settings.campaign_failure_backoff_schedule
+    retries: list[tuple[UUID, int]] = []
+
+    campaign = escrow.lock_campaign(session, campaign_id)
+    consecutive_failures = (campaign.meta or {}).get("consecutive_failures", 0)
+
+    sent_ids: list[UUID] = []
+    failures: dict[str, list[UUID]] = {}
+    retry_notes: dict[str, list[UUID]] = {}
+    for outcome in outcomes:
+        recipient = outcome.recipient
+        if outcome.sent:
+            consecutive_failures = 0
+            sent_ids.append(recipient.id)
+            continue
+
+        consecutive_failures += 1
+        if will_retry(outcome):
+            # Stay in SENDING so the dispatcher does not reclaim it before the backoff elapses.
+            retries.append((recipient.id, backoff_schedule[recipient.attempts - 1]))
+            note = outcome.error_message or "Transient failure; retry scheduled"
+            retry_notes.setdefault(note, []).append(recipient.id)
+            continue
+
+        if consecutive_failures >= 3:
+            campaign.status = CampaignStatus.PAUSED
+        failures.setdefault(outcome.error_message or "Failed after retries", []).append(recipient.id)
+
+    delivered = transition_recipients(
+        session, campaign_id, sent_ids, DeliveryStatus.SENT, sent_at=now, last_error=None
+    )
+    charged = escrow.charge(session, campaign, delivered)
+    unpaid = delivered[len(charged):]
+    escrow.settle(session, campaign)
+    if unpaid:
+        session.execute(
+            update(CampaignRecipient)
+            .where(CampaignRecipient.id.in_(unpaid))
+            .values(status=DeliveryStatus.FAILED, sent_at=None, last_error="Insufficient points")
+        )
+        progress.record_transition(session, campaign_id, DeliveryStatus.SENT, DeliveryStatus.FAILED, len(unpaid))
+
+    sent = len(charged)
+    failed = len(unpaid)
+    for reason, recipient_ids in failures.items():
+        failed += len(
+            transition_recipients(session, campaign_id, recipient_ids, DeliveryStatus.FAILED, last_error=reason)
+        )
+
+    for note, recipient_ids in retry_notes.items():
+        session.execute(
+            update(CampaignRecipient)
+            .where(CampaignRecipient.id.in_(recipient_ids), CampaignRecipient.status == DeliveryStatus.SENDING)
+            .values(last_error=note)
+        )
+
+    requeue_recipients(
+        session, campaign_id, [recipient.id for recipient in unsent], attempts=CampaignRecipient.attempts - 1
+    )
+
+    campaign.meta = {**(campaign.meta or {}), "consecutive_failures": consecutive_failures}
+    record_transitions(session, campaign_id, sent=sent, failed=failed)
+    finalize_campaign_if_done(session, campaign_id)
+    session.commit()
+    quota.release_for_campaign(campaign, failed)
+    return retries
+
+
+def finalize_campaign_if_done(session: Session, campaign_id: UUID) -> bool:
+    """Flip a campaign whose recipients are all settled to COMPLETED or FAILED.
+
+    The conditional UPDATE makes the flip happen once no matter how many workers race for it;
+    only the caller that performed it gets ``True``. The caller commits.
+    """
+
+    result = session.execute(
+        update(Campaign)
+        .where(
+            Campaign.id == campaign_id,
+            Campaign.status.in_((CampaignStatus.QUEUED, CampaignStatus.SENDING)),
+            Campaign.completed_at.is_(None),
+            Campaign.sent_count + Campaign.failed_count >= Campaign.total_recipients,
+        )
+        .values(
+            status=cast(
+                case(
+                    (Campaign.failed_count > 0, literal(CampaignStatus.FAILED, Campaign.status.type)),
+                    else_=literal(CampaignStatus.COMPLETED, Campaign.status.type),
+                ),
+                Campaign.status.type,
+            ),
+            completed_at=func.now(),
+        )
+        .returning(Campaign.status)
+        .execution_options(synchronize_session="fetch")
+    )
+    final_status = result.scalar()
+    if final_status is None:
+        return False
+    # Nothing moves after this point, so pin the final numbers to the database's count.
+    progress.record_snapshot(session, campaign_id, progress.count_progress(session, campaign_id))
+    progress.record_status(session, campaign_id, final_status)
+    escrow.release_campaign(session, campaign_id)
+    return True
@@ -0,0 +1,172 @@
+from __future__ import annotations
+
+import base64
+from datetime import datetime, timezone
+from uuid import UUID
+
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+from app.core.config import get_settings
+from app.models import Campaign, User, WalletTransaction, WalletTxnType
+
+
+# Points move through three stages: held on the user (users.points_reserved) when a campaign
+# starts, spent by the campaign as recipients are delivered, and settled into the ledger in
+# periodic batches, which is the only step that touches users.points_balance. Whatever is
+# still held when the campaign settles or is cancelled goes back to the user's balance.
+#
+# Callers lock the campaign row before the user row, and commit.
+
+
+# Delivered-but-unsettled recipient ids wait in the campaign's metadata until the next settlement.
+_UNSETTLED_KEY = "unsettled_recipients"
+
+
+def available_escrow(campaign: Campaign) -> int:
+    """Points the campaign still holds that are not yet spent."""
+
+    return campaign.points_reserved - (campaign.points_spent - campaign.points_settled)
+
+
+def lock_campaign(session: Session, campaign_id: UUID) -> Campaign:
+    return session.get(Campaign, campaign_id, with_for_update=True, populate_existing=True)
+
+
+def reserve_points(session: Session, campaign: Campaign, points: int) -> bool:
+    """Move ``points`` of the user's available balance into the campaign's escrow, all or nothing."""
+
+    if points <= 0:
+        return True
+    result = session.execute(
+        update(User)
+        .where(User.id == campaign.user_id, User.points_balance - User.points_reserved >= points)
+        .values(points_reserved=User.points_reserved + points)
+        .returning(User.id)
+        .execution_options(synchronize_session=False)
+    )
+    if result.first() is None:
+        return False
+    campaign.points_reserved += points
+    return True
+
+
+def reserve_for_pending(session: Session, campaign_id: UUID) -> bool:
+    """Top the escrow up to cover every recipient that has not settled yet."""
+
+    campaign = lock_campaign(session, campaign_id)
+    pending = campaign.total_recipients - campaign.sent_count - campaign.failed_count
+    shortfall = pending * get_settings().points_per_recipient - available_escrow(campaign)
+    return reserve_points(session, campaign, shortfall)
+
+
+def charge(session: Session, campaign: Campaign, recipient_ids: list[UUID]) -> list[UUID]:
+    """Spend escrow for delivered recipients; return the ones that are paid for.
+
+    Campaigns started before escrow existed hold nothing, so a shortfall is taken from the
+    user's available balance on the spot.
+    """
+
+    cost = get_settings().points_per_recipient
+    if cost <= 0 or not recipient_ids:
+        return recipient_ids
+    shortfall = len(recipient_ids) * cost - available_escrow(campaign)
+    if shortfall > 0 and not reserve_points(session, campaign, shortfall):
+        user = session.get(User, campaign.user_id, with_for_update=True, populate_existing=True)
+        reserve_points(session, campaign, min(shortfall, max(user.points_balance - user.points_reserved, 0)))
+    paid = recipient_ids[: available_escrow(campaign) // cost]
+    campaign.points_spent += len(paid) * cost
+    meta = dict(campaign.meta or {})
+    meta[_UNSETTLED_KEY] = meta.get(_UNSETTLED_KEY, []) + [recipient_id.hex for recipient_id in paid]
+    campaign.meta = meta
+    return paid
+
+
+def pack_recipient_ids(recipient_ids: list[UUID]) -> str:
+    """Encode recipient ids as one base64 string, 22 characters per recipient."""
+
+    return base64.urlsafe_b64encode(b"".join(recipient_id.bytes for recipient_id in recipient_ids)).decode()
+
+
+def unpack_recipient_ids(packed: str) -> list[UUID]:
+    raw = base64.urlsafe_b64decode(packed.encode())
+    return [UUID(bytes=raw[offset : offset + 16]) for offset in range(0, len(raw), 16)]
+
+
+def settlement_due(campaign: Campaign, now: datetime) -> bool:
+    settings = get_settings()
+    unsettled = campaign.points_spent - campaign.points_settled
+    if unsettled <= 0:
+        return False
+    if unsettled >= settings.wallet_settle_every_sends * max(settings.points_per_recipient, 1):
+        return True
+    last_settled_at = campaign.points_settled_at or campaign.started_at or now
+    return (now - last_settled_at).total_seconds() >= settings.wallet_settle_interval_seconds
+
+
+def settle(session: Session, campaign: Campaign, *, force: bool = False) -> None:
+    """Book the campaign's unsettled spend as one DEDUCT entry and take it off the user's balance.
+
+    Unless ``force`` is set this only happens every WALLET_SETTLE_EVERY_SENDS deliveries or
+    WALLET_SETTLE_INTERVAL_SECONDS, whichever comes first.
+    """
+
+    now = datetime.now(timezone.utc)
+    if not force and not settlement_due(campaign, now):
+        return
+    points = campaign.points_spent - campaign.points_settled
+    if points <= 0:
+        return
+    balance_after = session.execute(
+        update(User)
+        .where(User.id == campaign.user_id)
+        .values(
+            points_balance=User.points_balance - points,
+            points_reserved=User.points_reserved - points,
+        )
+        .returning(User.points_balance)
+        .execution_options(synchronize_session=False)
+    ).scalar_one()
+
+    meta = dict(campaign.meta or {})
+    recipient_ids = [UUID(hex=value) for value in meta.pop(_UNSETTLED_KEY, [])]
+    session.add(
+        WalletTransaction(
+            user_id=campaign.user_id,
+            txn_type=WalletTxnType.DEDUCT,
+            points=-points,
+            balance_after=balance_after,
+            reference=f"campaign:{campaign.id}",
+            meta={
+                "campaign_id": str(campaign.id),
+                "recipients": len(recipient_ids),
+                "points_per_recipient": get_settings().points_per_recipient,
+                "recipient_ids": pack_recipient_ids(recipient_ids),
+            },
+        )
+    )
+    campaign.meta = meta
+    campaign.points_settled += points
+    campaign.points_reserved -= points
+    campaign.points_settled_at = now
+
+
+def release(session: Session, campaign: Campaign) -> int:
+    """Settle what was spent and hand the rest of the escrow back; return the points released."""
+
+    settle(session, campaign, force=True)
+    remainder = campaign.points_reserved
+    if remainder <= 0:
+        return 0
+    session.execute(
+        update(User)
+        .where(User.id == campaign.user_id)
+        .values(points_reserved=User.points_reserved - remainder)
+        .execution_options(synchronize_session=False)
+    )
+    campaign.points_reserved = 0
+    return remainder
+
+
+def release_campaign(session: Session, campaign_id: UUID) -> int:
+    return release(session, lock_campaign(session, campaign_id))
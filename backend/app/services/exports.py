@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import json
+from collections.abc import Callable, Iterable, Sequence
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Literal
+
+import pyarrow as pa
+
+from app.models import DeliveryStatus
+
+
+ExportFormat = Literal["csv", "parquet", "arrow"]
+
+
+@dataclass(frozen=True)
+class ExportColumn:
+    """One exported column: how to read it off a row and what type it has in columnar files.
+
+    Columns with ``categories`` are dictionary-encoded against that fixed list, so every
+    batch shares one dictionary.
+    """
+
+    name: str
+    kind: Literal["string", "bool", "timestamp", "json"]
+    value: Callable[[Any], Any]
+    categories: tuple[str, ...] | None = None
+
+
+RECIPIENT_COLUMNS = (
+    ExportColumn("name", "string", lambda rec: rec.name),
+    ExportColumn("phone", "string", lambda rec: rec.phone_e164),
+    ExportColumn(
+        "status", "string", lambda rec: rec.status.value, categories=tuple(item.value for item in DeliveryStatus)
+    ),
+    ExportColumn("sent_at", "timestamp", lambda rec: rec.sent_at),
+    ExportColumn("read_at", "timestamp", lambda rec: rec.read_at),
+    ExportColumn("last_error", "string", lambda rec: rec.last_error),
+)
+
+CONTACT_COLUMNS = (
+    ExportColumn("name", "string", lambda contact: contact.name),
+    ExportColumn("phone", "string", lambda contact: contact.phone_e164),
+    ExportColumn("consent", "bool", lambda contact: contact.consent),
+    ExportColumn("created_at", "timestamp", lambda contact: contact.created_at),
+    ExportColumn("metadata", "json", lambda contact: contact.meta),
+)
+
+
+def _csv_cell(column: ExportColumn, value: Any) -> Any:
+    if value is None:
+        return ""
+    if column.kind == "timestamp" and isinstance(value, datetime):
+        return value.isoformat()
+    if column.kind == "bool":
+        return "true" if value else "false"
+    if column.kind == "json":
+        return json.dumps(value, default=str)
+    return value
+
+
+def csv_header(columns: Sequence[ExportColumn]) -> list[str]:
+    return [column.name for column in columns]
+
+
+def csv_row(columns: Sequence[ExportColumn], item: Any) -> list[Any]:
+    return [_csv_cell(column, column.value(item)) for column in columns]
+
+
+def _arrow_type(column: ExportColumn) -> pa.DataType:
+    if column.categories is not None:
+        return pa.dictionary(pa.int8(), pa.string())
+    return {
+        "string": pa.string(),
+        "json": pa.string(),
+        "bool": pa.bool_(),
+        "timestamp": pa.timestamp("us", tz="UTC"),
+    }[column.kind]
+
+
+def arrow_schema(columns: Sequence[ExportColumn]) -> pa.Schema:
+    return pa.schema([pa.field(column.name, _arrow_type(column)) for column in columns])
+
+
+def arrow_batch(columns: Sequence[ExportColumn], schema: pa.Schema, items: Iterable[Any]) -> pa.RecordBatch:
+    items = list(items)
+    arrays = []
+    for column, field in zip(columns, schema):
+        values = [column.value(item) for item in items]
+        if column.categories is not None:
+            positions = {category: index for index, category in enumerate(column.categories)}
+            indices = pa.array([positions.get(value) for value in values], type=pa.int8())
+            arrays.append(pa.DictionaryArray.from_arrays(indices, pa.array(column.categories, type=pa.string())))
+        elif column.kind == "json":
+            arrays.append(
+                pa.array([None if value is None else json.dumps(value, default=str) for value in values], pa.string())
+            )
+        else:
+            arrays.append(pa.array(values, type=field.type))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
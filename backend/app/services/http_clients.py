@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+import os
+from typing import Literal
+
+import httpx
+
+from app.core.config import get_settings
+
+
+ClientName = Literal["whatsapp_api", "whatsapp_worker"]
+
+_sync_clients: dict[str, httpx.Client] = {}
+_async_clients: dict[str, httpx.AsyncClient] = {}
+_owner_pid: int | None = None
+
+
+def _client_options(name: ClientName) -> dict:
+    settings = get_settings()
+    options: dict = {
+        "limits": httpx.Limits(
+            max_connections=settings.http_pool_max_connections,
+            max_keepalive_connections=settings.http_pool_max_keepalive,
+            keepalive_expiry=settings.http_keepalive_expiry_seconds,
+        ),
+        "timeout": 30.0,
+    }
+    if name == "whatsapp_api" and settings.whatsapp_api_http2:
+        options["http2"] = True
+    return options
+
+
+def _forget_inherited_clients() -> None:
+    global _owner_pid
+    pid = os.getpid()
+    if _owner_pid == pid:
+        return
+    # Under `app.worker --fork` RQ forks a work horse per job; inherited sockets must not be shared.
+    _sync_clients.clear()
+    _async_clients.clear()
+    _owner_pid = pid
+
+
+def get_http_client(name: ClientName) -> httpx.Client:
+    """Return the process-wide keep-alive client for an outbound messaging backend."""
+
+    _forget_inherited_clients()
+    client = _sync_clients.get(name)
+    if client is None or client.is_closed:
+        client = httpx.Client(**_client_options(name))
+        _sync_clients[name] = client
+    return client
+
+
+def get_async_http_client(name: ClientName) -> httpx.AsyncClient:
+    """Async counterpart of :func:`get_http_client`; clients are bound to the running event loop."""
+
+    _forget_inherited_clients()
+    client = _async_clients.get(name)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(**_client_options(name))
+        _async_clients[name] = client
+    return client
+
+
+def close_http_clients() -> None:
+    for client in _sync_clients.values():
+        client.close()
+    _sync_clients.clear()
+
+
+async def aclose_http_clients() -> None:
+    close_http_clients()
+    for client in _async_clients.values():
+        await client.aclose()
+    _async_clients.clear()
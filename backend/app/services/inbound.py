@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+from collections import defaultdict
+from typing import Iterable
+from uuid import UUID
+
+from redis.asyncio import Redis as AsyncRedis
+from redis.exceptions import ResponseError
+
+from app.core.config import get_settings
+from app.schemas.automation import InboundMessage
+from app.services.queue import get_async_redis_connection
+
+
+INBOUND_STREAM = "automation:inbound"
+INBOUND_GROUP = "automation:inbound:consumers"
+# Entries that cannot be decoded are copied here, with their original id, before being acknowledged.
+INBOUND_DEAD_LETTER_STREAM = "automation:inbound:dead"
+
+# (stream entry id, user id, message)
+InboundEntry = tuple[bytes, UUID, InboundMessage]
+
+
+def encode_entry(user_id: UUID, payload: InboundMessage) -> dict[str, str]:
+    """Stream fields for one inbound message; :func:`decode_entries` reads them back."""
+
+    return {"user_id": str(user_id), "payload": payload.model_dump_json()}
+
+
+async def enqueue_inbound(user_id: UUID, payload: InboundMessage, redis: AsyncRedis | None = None) -> str:
+    """Append an inbound message to the ingestion stream; return its entry id.
+
+    The stream is trimmed to roughly ``INBOUND_STREAM_MAXLEN`` entries so a stalled consumer
+    pool cannot grow it without bound.
+    """
+
+    settings = get_settings()
+    redis = redis or get_async_redis_connection()
+    entry_id = await redis.xadd(
+        INBOUND_STREAM,
+        encode_entry(user_id, payload),
+        maxlen=settings.inbound_stream_maxlen,
+        approximate=True,
+    )
+    return entry_id.decode() if isinstance(entry_id, bytes) else entry_id
+
+
+async def ensure_consumer_group(redis: AsyncRedis) -> None:
+    try:
+        await redis.xgroup_create(INBOUND_STREAM, INBOUND_GROUP, id="0", mkstream=True)
+    except ResponseError as exc:
+        if "BUSYGROUP" not in str(exc):
+            raise
+
+
+def _field(fields: dict, name: str) -> str:
+    value = fields.get(name.encode(), fields.get(name))
+    return value.decode() if isinstance(value, bytes) else value
+
+
+def decode_entry(entry_id: bytes, fields: dict) -> InboundEntry:
+    """Read one stream entry back; raise ``ValueError`` when it is malformed."""
+
+    user_id, payload = _field(fields, "user_id"), _field(fields, "payload")
+    if user_id is None or payload is None:
+        raise ValueError("Entry has no user_id or payload field")
+    return entry_id, UUID(user_id), InboundMessage.model_validate_json(payload)
+
+
+def decode_entries(raw_entries: Iterable[tuple[bytes, dict]]) -> list[InboundEntry]:
+    return [decode_entry(entry_id, fields) for entry_id, fields in raw_entries]
+
+
+async def dead_letter(redis: AsyncRedis, raw_entries: list[tuple[bytes, dict]]) -> None:
+    settings = get_settings()
+    async with redis.pipeline(transaction=False) as pipe:
+        for entry_id, fields in raw_entries:
+            pipe.xadd(
+                INBOUND_DEAD_LETTER_STREAM,
+                {**fields, b"entry_id": entry_id},
+                maxlen=settings.inbound_stream_maxlen,
+                approximate=True,
+            )
+        await pipe.execute()
+
+
+def group_by_user(entries: Iterable[InboundEntry]) -> dict[UUID, list[InboundEntry]]:
+    """Split a batch per user, keeping each user's messages in stream order."""
+
+    grouped: dict[UUID, list[InboundEntry]] = defaultdict(list)
+    for entry in entries:
+        grouped[entry[1]].append(entry)
+    return dict(grouped)
@@ -6,6 +6,7 @@ import httpx
 from loguru import logger
 
 from app.core.config import get_settings
+from app.services.http_clients import get_async_http_client, get_http_client
 
 
 class MessagingError(Exception):
@@ -28,21 +29,18 @@ def _ensure_official_mode() -> None:
         raise MessagingPermanentError("WhatsApp Cloud API credentials are missing.")
 
 
-def _post_payload(payload: dict, context: str) -> None:
+def _api_request_target() -> tuple[str, dict[str, str]]:
     settings = get_settings()
-    base_url = settings.whatsapp_api_base_url.rstrip("/")
+    base_url = settings.whatsapp_api_base_url.unicode_string().rstrip("/")
     url = f"{base_url}/{settings.whatsapp_phone_number_id}/messages"
     headers = {
         "Authorization": f"Bearer {settings.whatsapp_api_token}",
         "Content-Type": "application/json",
     }
+    return url, headers
 
-    try:
-        response = httpx.post(url, json=payload, headers=headers, timeout=30.0)
-    except httpx.RequestError as exc:  # network errors should be retried
-        logger.warning("WhatsApp API request error during %s: %s", context, exc)
-        raise MessagingRetryableError(f"Network error while {context}") from exc
 
+def _check_api_response(response: httpx.Response, context: str) -> None:
     if response.status_code in {429, 500, 502, 503, 504}:
         logger.warning(
             "WhatsApp API transient failure (%s) during %s: %s",
@@ -62,18 +60,37 @@ def _post_payload(payload: dict, context: str) -> None:
         raise MessagingPermanentError(f"API rejected message while {context}: {response.text}")
 
 
-def _send_text(phone: str, body: str) -> None:
-    payload = {
+def _post_payload(payload: dict, context: str) -> None:
+    url, headers = _api_request_target()
+    try:
+        response = get_http_client("whatsapp_api").post(url, json=payload, headers=headers, timeout=30.0)
+    except httpx.RequestError as exc:  # network errors should be retried
+        logger.warning("WhatsApp API request error during %s: %s", context, exc)
+        raise MessagingRetryableError(f"Network error while {context}") from exc
+    _check_api_response(response, context)
+
+
+async def _post_payload_async(payload: dict, context: str) -> None:
+    url, headers = _api_request_target()
+    try:
+        response = await get_async_http_client("whatsapp_api").post(url, json=payload, headers=headers, timeout=30.0)
+    except httpx.RequestError as exc:  # network errors should be retried
+        logger.warning("WhatsApp API request error during %s: %s", context, exc)
+        raise MessagingRetryableError(f"Network error while {context}") from exc
+    _check_api_response(response, context)
+
+
+def _text_payload(phone: str, body: str) -> dict:
+    return {
         "messaging_product": "whatsapp",
         "recipient_type": "individual",
         "to": phone,
         "type": "text",
         "text": {"preview_url": False, "body": body},
     }
-    _post_payload(payload, context="sending text")
 
 
-def _send_media(phone: str, link: str, media_type: Literal["image", "video", "document"]) -> None:
+def _media_payload(phone: str, link: str, media_type: Literal["image", "video", "document"]) -> dict:
     payload: dict = {
         "messaging_product": "whatsapp",
         "recipient_type": "individual",
@@ -83,7 +100,32 @@ def _send_media(phone: str, link: str, media_type: Literal["image", "video", "do
     }
     if media_type == "document":
         payload[media_type]["filename"] = link.split("/")[-1][:50]
-    _post_payload(payload, context=f"sending {media_type}")
+    return payload
+
+
+def _official_payloads(
+    phone: str, body: str, media_url: str | None, document_url: str | None
+) -> list[tuple[dict, str]]:
+    _ensure_official_mode()
+
+    message_body = body.strip() or ""
+    if not message_body and not media_url and not document_url:
+        raise MessagingPermanentError("Message body and media are empty; nothing to send.")
+
+    payloads: list[tuple[dict, str]] = []
+    if message_body:
+        payloads.append((_text_payload(phone, message_body), "sending text"))
+
+    if media_url:
+        media_type: Literal["image", "video", "document"] = "image"
+        lowered = media_url.lower()
+        if lowered.endswith((".mp4", ".mov", ".avi")):
+            media_type = "video"
+        payloads.append((_media_payload(phone, media_url, media_type), f"sending {media_type}"))
+
+    if document_url:
+        payloads.append((_media_payload(phone, document_url, "document"), "sending document"))
+    return payloads
 
 
 def send_campaign_message(*, phone: str, body: str, media_url: str | None, document_url: str | None) -> None:
@@ -91,30 +133,34 @@ def send_campaign_message(*, phone: str, body: str, media_url: str | None, docum
 
     settings = get_settings()
     if settings.official_mode:
-        _ensure_official_mode()
+        for payload, context in _official_payloads(phone, body, media_url, document_url):
+            _post_payload(payload, context)
+        return
 
-        message_body = body.strip() or ""
-        if not message_body and not media_url and not document_url:
-            raise MessagingPermanentError("Message body and media are empty; nothing to send.")
+    _send_via_worker(phone=phone, body=body, media_url=media_url, document_url=document_url)
 
-        if message_body:
-            _send_text(phone, message_body)
 
-        if media_url:
-            media_type: Literal["image", "video", "document"] = "image"
-            lowered = media_url.lower()
-            if lowered.endswith((".mp4", ".mov", ".avi")):
-                media_type = "video"
-            _send_media(phone, media_url, media_type)
+async def send_campaign_message_async(
+    *, phone: str, body: str, media_url: str | None, document_url: str | None
+) -> None:
+    """Send a campaign message via WhatsApp without blocking the event loop."""
 
-        if document_url:
-            _send_media(phone, document_url, "document")
+    settings = get_settings()
+    if settings.official_mode:
+        for payload, context in _official_payloads(phone, body, media_url, document_url):
+            await _post_payload_async(payload, context)
         return
 
-    _send_via_worker(phone=phone, body=body, media_url=media_url, document_url=document_url)
+    url, payload = _worker_request(phone=phone, body=body, media_url=media_url, document_url=document_url)
+    try:
+        response = await get_async_http_client("whatsapp_worker").post(url, json=payload, timeout=60.0)
+    except httpx.RequestError as exc:
+        logger.warning("WhatsApp worker network error while sending to %s: %s", phone, exc)
+        raise MessagingRetryableError("Worker unreachable") from exc
+    _check_worker_response(response, phone)
 
 
-def _send_via_worker(*, phone: str, body: str, media_url: str | None, document_url: str | None) -> None:
+def _worker_request(*, phone: str, body: str, media_url: str | None, document_url: str | None) -> tuple[str, dict]:
     settings = get_settings()
     base_url = settings.whatsapp_worker_url.unicode_string().rstrip("/")
     url = f"{base_url}/send"
@@ -124,13 +170,10 @@ def _send_via_worker(*, phone: str, body: str, media_url: str | None, document_u
         "mediaUrl": media_url,
         "documentUrl": document_url,
     }
+    return url, payload
 
-    try:
-        response = httpx.post(url, json=payload, timeout=60.0)
-    except httpx.RequestError as exc:
-        logger.warning("WhatsApp worker network error while sending to %s: %s", phone, exc)
-        raise MessagingRetryableError("Worker unreachable") from exc
 
+def _check_worker_response(response: httpx.Response, phone: str) -> None:
     if response.status_code in {429, 500, 502, 503, 504}:
         logger.warning(
             "WhatsApp worker transient failure (%s) for %s: %s",
@@ -148,3 +191,13 @@ def _send_via_worker(*, phone: str, body: str, media_url: str | None, document_u
             response.text,
         )
         raise MessagingPermanentError(response.text)
+
+
+def _send_via_worker(*, phone: str, body: str, media_url: str | None, document_url: str | None) -> None:
+    url, payload = _worker_request(phone=phone, body=body, media_url=media_url, document_url=document_url)
+    try:
+        response = get_http_client("whatsapp_worker").post(url, json=payload, timeout=60.0)
+    except httpx.RequestError as exc:
+        logger.warning("WhatsApp worker network error while sending to %s: %s", phone, exc)
+        raise MessagingRetryableError("Worker unreachable") from exc
+    _check_worker_response(response, phone)
@@ -0,0 +1,281 @@
+from __future__ import annotations
+
+import json
+from collections import Counter
+from uuid import UUID
+
+from loguru import logger
+from redis import Redis
+from redis.asyncio.client import Pipeline as AsyncPipeline
+from redis.client import Pipeline
+from redis.exceptions import RedisError
+from sqlalchemy import event, func, inspect, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.models import Campaign, CampaignRecipient, CampaignStatus, DeliveryStatus
+from app.services.queue import get_async_redis_connection, get_redis_connection
+
+
+# The hash is a cache of the recipient table: it is only ever incremented once it exists, and
+# it is rebuilt from a GROUP BY whenever it is missing or a campaign settles. Its ``seq`` field
+# counts the changes applied, and every published delta or snapshot carries the seq it produced,
+# so a viewer can drop deltas that its snapshot already includes.
+PROGRESS_FIELDS = ("total",) + tuple(status.value for status in DeliveryStatus)
+PROGRESS_TTL_SECONDS = 7 * 24 * 3600
+
+_DELTAS_KEY = "campaign_progress_deltas"
+_SNAPSHOTS_KEY = "campaign_progress_snapshots"
+_STATUSES_KEY = "campaign_status_changes"
+
+# Apply HINCRBY pairs from ARGV[3..] when the hash is already seeded and publish the delta
+# event (ARGV[2]) stamped with the new seq. Without a hash there is no seq to order the delta
+# against a snapshot, so nothing is published; whoever seeds the hash sends a snapshot.
+_APPLY_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+  return 0
+end
+for i = 3, #ARGV, 2 do
+  redis.call('HINCRBY', KEYS[1], ARGV[i], ARGV[i + 1])
+end
+local event = cjson.decode(ARGV[2])
+event['seq'] = redis.call('HINCRBY', KEYS[1], 'seq', 1)
+redis.call('EXPIRE', KEYS[1], ARGV[1])
+redis.call('PUBLISH', KEYS[2], cjson.encode(event))
+return 1
+"""
+
+# Overwrite the counters with field/value pairs in ARGV[3..] and publish the snapshot event
+# (ARGV[2]) with the next seq; seq itself keeps counting across snapshots.
+_SNAPSHOT_SCRIPT = """
+redis.call('HSET', KEYS[1], unpack(ARGV, 3))
+local event = cjson.decode(ARGV[2])
+event['seq'] = redis.call('HINCRBY', KEYS[1], 'seq', 1)
+redis.call('EXPIRE', KEYS[1], ARGV[1])
+redis.call('PUBLISH', KEYS[2], cjson.encode(event))
+return 1
+"""
+
+# Seed the hash from field/value pairs in ARGV[2..] unless someone else already did.
+_SEED_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 1 then
+  return 0
+end
+redis.call('HSET', KEYS[1], 'seq', 0, unpack(ARGV, 2))
+redis.call('EXPIRE', KEYS[1], ARGV[1])
+return 1
+"""
+
+
+def _progress_key(campaign_id: UUID | str) -> str:
+    return f"campaign:{campaign_id}:progress"
+
+
+def events_channel(campaign_id: UUID | str) -> str:
+    """Pub/sub channel carrying ``delta``, ``snapshot`` and ``status`` messages for a campaign."""
+
+    return f"campaign:{campaign_id}:events"
+
+
+def empty_progress() -> dict[str, int]:
+    return {field: 0 for field in PROGRESS_FIELDS}
+
+
+def count_progress(session: Session, campaign_id: UUID) -> dict[str, int]:
+    """Count the campaign's recipients per status with a single GROUP BY."""
+
+    result = session.execute(
+        select(CampaignRecipient.status, func.count())
+        .where(CampaignRecipient.campaign_id == campaign_id)
+        .group_by(CampaignRecipient.status)
+    )
+    progress = empty_progress()
+    for delivery_status, count in result.all():
+        progress[delivery_status.value] = count
+        progress["total"] += count
+    return progress
+
+
+def record_transition(
+    session: Session,
+    campaign_id: UUID,
+    source: DeliveryStatus | None,
+    target: DeliveryStatus | None,
+    count: int = 1,
+) -> None:
+    """Queue a status move for the progress hash; it is applied only if the transaction commits."""
+
+    if count <= 0 or source == target:
+        return
+    deltas = session.info.setdefault(_DELTAS_KEY, {}).setdefault(campaign_id, Counter())
+    if source is not None:
+        deltas[source.value] -= count
+    if target is not None:
+        deltas[target.value] += count
+
+
+def record_snapshot(session: Session, campaign_id: UUID, progress: dict[str, int]) -> None:
+    """Replace the progress hash with ``progress`` once the transaction commits."""
+
+    session.info.setdefault(_SNAPSHOTS_KEY, {})[campaign_id] = progress
+    session.info.get(_DELTAS_KEY, {}).pop(campaign_id, None)
+
+
+def record_status(session: Session, campaign_id: UUID, status: CampaignStatus) -> None:
+    """Announce a campaign status change once the transaction commits."""
+
+    session.info.setdefault(_STATUSES_KEY, {})[campaign_id] = status
+
+
+def _progress_pairs(progress: dict[str, int]) -> list[str | int]:
+    pairs: list[str | int] = []
+    for field in PROGRESS_FIELDS:
+        pairs.extend((field, progress.get(field, 0)))
+    return pairs
+
+
+async def load_progress(campaign_id: UUID | str) -> dict[str, int] | None:
+    """Read the campaign's counters and seq in one round trip; ``None`` when the hash is not seeded."""
+
+    try:
+        values = await get_async_redis_connection().hgetall(_progress_key(campaign_id))
+    except RedisError as exc:
+        logger.warning("Progress hash unavailable for campaign %s: %s", campaign_id, exc)
+        return None
+    if not values:
+        return None
+    progress = {**empty_progress(), "seq": 0}
+    for field, value in values.items():
+        name = field.decode() if isinstance(field, bytes) else field
+        if name in progress:
+            progress[name] = int(value)
+    return progress
+
+
+async def seed_progress(campaign_id: UUID | str, progress: dict[str, int]) -> None:
+    """Create the campaign's hash from ``progress`` unless it is already seeded."""
+
+    try:
+        await get_async_redis_connection().eval(
+            _SEED_SCRIPT, 1, _progress_key(campaign_id), PROGRESS_TTL_SECONDS, *_progress_pairs(progress)
+        )
+    except RedisError as exc:
+        logger.warning("Could not seed progress hash for campaign %s: %s", campaign_id, exc)
+
+
+async def reconcile_progress(session: AsyncSession, campaign_id: UUID) -> dict[str, int]:
+    """Recount the campaign from the database and overwrite the hash with the result."""
+
+    progress = await session.run_sync(count_progress, campaign_id)
+    record_snapshot(session.sync_session, campaign_id, progress)
+    await flush_committed(session)
+    return progress
+
+
+def _queue_updates(
+    pipe: Pipeline | AsyncPipeline,
+    deltas: dict[UUID, Counter],
+    snapshots: dict[UUID, dict[str, int]],
+    statuses: dict[UUID, CampaignStatus],
+) -> None:
+    for campaign_id, changes in deltas.items():
+        delta = {field: value for field, value in changes.items() if value}
+        if not delta:
+            continue
+        pairs = [item for field_value in delta.items() for item in field_value]
+        pipe.eval(
+            _APPLY_SCRIPT,
+            2,
+            _progress_key(campaign_id),
+            events_channel(campaign_id),
+            PROGRESS_TTL_SECONDS,
+            json.dumps({"type": "delta", "delta": delta}),
+            *pairs,
+        )
+    for campaign_id, progress in snapshots.items():
+        pipe.eval(
+            _SNAPSHOT_SCRIPT,
+            2,
+            _progress_key(campaign_id),
+            events_channel(campaign_id),
+            PROGRESS_TTL_SECONDS,
+            json.dumps({"type": "snapshot", **progress}),
+            *_progress_pairs(progress),
+        )
+    for campaign_id, status in statuses.items():
+        pipe.publish(events_channel(campaign_id), json.dumps({"type": "status", "status": status.value}))
+
+
+def _take_pending(session: Session | AsyncSession) -> tuple[dict, dict, dict]:
+    return (
+        session.info.pop(_DELTAS_KEY, None) or {},
+        session.info.pop(_SNAPSHOTS_KEY, None) or {},
+        session.info.pop(_STATUSES_KEY, None) or {},
+    )
+
+
+def _apply_after_commit(session: Session) -> None:
+    deltas, snapshots, statuses = _take_pending(session)
+    if not (deltas or snapshots or statuses):
+        return
+    redis = get_redis_connection()
+    try:
+        pipe = redis.pipeline(transaction=False)
+        _queue_updates(pipe, deltas, snapshots, statuses)
+        pipe.execute()
+    except RedisError as exc:
+        # The hashes may now be behind; drop them so the next read recounts instead of serving stale numbers.
+        logger.warning("Could not update campaign progress: %s", exc)
+        for campaign_id in {*deltas, *snapshots}:
+            clear_progress(campaign_id, redis=redis)
+
+
+async def flush_committed(session: AsyncSession) -> None:
+    """Apply the progress an async session recorded, once its transaction has committed.
+
+    Worker sessions from ``install_commit_hook`` do this on their own; async callers await it
+    right after ``await session.commit()`` so the event loop never blocks on Redis.
+    """
+
+    deltas, snapshots, statuses = _take_pending(session)
+    if not (deltas or snapshots or statuses):
+        return
+    redis = get_async_redis_connection()
+    try:
+        pipe = redis.pipeline(transaction=False)
+        _queue_updates(pipe, deltas, snapshots, statuses)
+        await pipe.execute()
+    except RedisError as exc:
+        logger.warning("Could not update campaign progress: %s", exc)
+        try:
+            await redis.delete(*(_progress_key(campaign_id) for campaign_id in {*deltas, *snapshots}))
+        except RedisError as exc:
+            logger.warning("Could not drop progress hashes: %s", exc)
+
+
+def clear_progress(campaign_id: UUID | str, *, redis: Redis | None = None) -> None:
+    redis = redis or get_redis_connection()
+    try:
+        redis.delete(_progress_key(campaign_id))
+    except RedisError as exc:
+        logger.warning("Could not drop progress hash for campaign %s: %s", campaign_id, exc)
+
+
+def install_commit_hook(session_factory: sessionmaker) -> None:
+    """Apply recorded progress to Redis after each commit of the worker's sync sessions."""
+
+    event.listen(session_factory, "after_commit", _apply_after_commit)
+
+
+@event.listens_for(Session, "before_flush")
+def _collect_status_changes(session: Session, flush_context, instances) -> None:
+    for instance in session.dirty:
+        if isinstance(instance, Campaign) and inspect(instance).attrs.status.history.has_changes():
+            record_status(session, instance.id, instance.status)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_after_rollback(session: Session) -> None:
+    session.info.pop(_DELTAS_KEY, None)
+    session.info.pop(_SNAPSHOTS_KEY, None)
+    session.info.pop(_STATUSES_KEY, None)
@@ -1,6 +1,7 @@
 from functools import lru_cache
 
 from redis import Redis
+from redis.asyncio import Redis as AsyncRedis
 from rq import Queue
 
 from app.core.config import get_settings
@@ -12,9 +13,19 @@ def _get_redis() -> Redis:
     return Redis.from_url(settings.redis_url)
 
 
+@lru_cache(maxsize=1)
+def _get_async_redis() -> AsyncRedis:
+    settings = get_settings()
+    return AsyncRedis.from_url(settings.redis_url)
+
+
 def get_queue(name: str) -> Queue:
     return Queue(name, connection=_get_redis())
 
 
 def get_redis_connection() -> Redis:
     return _get_redis()
+
+
+def get_async_redis_connection() -> AsyncRedis:
+    return _get_async_redis()
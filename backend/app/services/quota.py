@@ -0,0 +1,158 @@
+from __future__ import annotations
+
+from datetime import UTC, datetime, timedelta
+from uuid import UUID
+
+from loguru import logger
+from redis import Redis
+from redis.exceptions import RedisError
+from sqlalchemy import and_, func, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core.config import get_settings
+from app.models import Campaign, CampaignRecipient, CampaignStatus, DeliveryStatus
+from app.services.queue import get_async_redis_connection, get_redis_connection
+
+
+# A user's daily counter holds every recipient admitted for that UTC day: delivered, in flight,
+# or still queued. Admission reserves a campaign's pending recipients at once and records the day
+# in meta["quota_day"]; a campaign still sending on a later day is admitted again for that day.
+# Recipients that fail or are cancelled hand their slot back.
+QUOTA_TTL_SECONDS = 2 * 24 * 3600
+
+_PENDING_CAMPAIGN_STATUSES = (CampaignStatus.QUEUED, CampaignStatus.SENDING, CampaignStatus.PAUSED)
+
+# Returns -1 when the counter is not seeded, 0 when ARGV[1] more would exceed ARGV[2], else 1.
+_RESERVE_SCRIPT = """
+local current = redis.call('GET', KEYS[1])
+if not current then
+  return -1
+end
+if tonumber(current) + tonumber(ARGV[1]) > tonumber(ARGV[2]) then
+  return 0
+end
+redis.call('INCRBY', KEYS[1], ARGV[1])
+return 1
+"""
+
+
+def quota_day(moment: datetime | None = None) -> str:
+    return (moment or datetime.now(UTC)).strftime("%Y%m%d")
+
+
+def _quota_key(user_id: UUID | str, day: str) -> str:
+    return f"quota:{user_id}:{day}"
+
+
+def count_used(session: Session, user_id: UUID, day: str) -> int:
+    """Count the user's recipients delivered on ``day`` plus those admitted that day and not sent yet.
+
+    The recipient side is served from the (campaign_id, status) INCLUDE (sent_at) index.
+    """
+
+    day_start = datetime.strptime(day, "%Y%m%d").replace(tzinfo=UTC)
+    delivered = and_(
+        CampaignRecipient.status.in_((DeliveryStatus.SENT, DeliveryStatus.READ)),
+        CampaignRecipient.sent_at >= day_start,
+        CampaignRecipient.sent_at < day_start + timedelta(days=1),
+    )
+    pending = and_(
+        CampaignRecipient.status.in_((DeliveryStatus.QUEUED, DeliveryStatus.SENDING)),
+        Campaign.status.in_(_PENDING_CAMPAIGN_STATUSES),
+        Campaign.meta["quota_day"].astext == day,
+    )
+    result = session.execute(
+        select(func.count())
+        .select_from(CampaignRecipient)
+        .join(Campaign, Campaign.id == CampaignRecipient.campaign_id)
+        .where(Campaign.user_id == user_id, or_(delivered, pending))
+    )
+    return result.scalar_one()
+
+
+def reserve(
+    session: Session, user_id: UUID, count: int, *, day: str | None = None, redis: Redis | None = None
+) -> bool:
+    """Atomically take ``count`` recipients from the user's daily quota, all or nothing."""
+
+    if count <= 0:
+        return True
+    settings = get_settings()
+    day = day or quota_day()
+    key = _quota_key(user_id, day)
+    redis = redis or get_redis_connection()
+    try:
+        granted = redis.eval(_RESERVE_SCRIPT, 1, key, count, settings.max_daily_recipients)
+        if granted == -1:
+            redis.set(key, count_used(session, user_id, day), nx=True, ex=QUOTA_TTL_SECONDS)
+            granted = redis.eval(_RESERVE_SCRIPT, 1, key, count, settings.max_daily_recipients)
+        return granted == 1
+    except RedisError as exc:
+        # Without Redis nothing is reserved, but the database still bounds the day.
+        logger.warning("Quota counter unavailable for user %s: %s", user_id, exc)
+        return count_used(session, user_id, day) + count <= settings.max_daily_recipients
+
+
+async def reserve_async(db: AsyncSession, user_id: UUID, count: int, *, day: str | None = None) -> bool:
+    """:func:`reserve` for request handlers: the counter is reached through the async client."""
+
+    if count <= 0:
+        return True
+    settings = get_settings()
+    day = day or quota_day()
+    key = _quota_key(user_id, day)
+    redis = get_async_redis_connection()
+    try:
+        granted = await redis.eval(_RESERVE_SCRIPT, 1, key, count, settings.max_daily_recipients)
+        if granted == -1:
+            used = await db.run_sync(count_used, user_id, day)
+            await redis.set(key, used, nx=True, ex=QUOTA_TTL_SECONDS)
+            granted = await redis.eval(_RESERVE_SCRIPT, 1, key, count, settings.max_daily_recipients)
+        return granted == 1
+    except RedisError as exc:
+        logger.warning("Quota counter unavailable for user %s: %s", user_id, exc)
+        return await db.run_sync(count_used, user_id, day) + count <= settings.max_daily_recipients
+
+
+def release(user_id: UUID, count: int, *, day: str | None = None, redis: Redis | None = None) -> None:
+    if count <= 0:
+        return
+    redis = redis or get_redis_connection()
+    key = _quota_key(user_id, day or quota_day())
+    try:
+        # Only decrement a live counter; a missing one is reseeded from the database on next use.
+        if redis.exists(key):
+            redis.decrby(key, count)
+    except RedisError as exc:
+        logger.warning("Could not release quota for user %s: %s", user_id, exc)
+
+
+def release_for_campaign(campaign: Campaign, count: int) -> None:
+    """Hand back slots of recipients that will not be sent, from the day the campaign reserved them."""
+
+    # Slots reserved on an earlier day have already lapsed with that day's counter.
+    if (campaign.meta or {}).get("quota_day") == quota_day():
+        release(campaign.user_id, count)
+
+
+def admit_batch(session: Session, campaign: Campaign, count: int) -> bool:
+    """Check a batch against the quota at send time.
+
+    Recipients were reserved when the campaign was admitted. The first batch a campaign sends on
+    a later day admits it again: its remaining recipients take that day's quota together, so
+    their failures are released against the day they were reserved on.
+    """
+
+    today = quota_day()
+    if (campaign.meta or {}).get("quota_day") == today:
+        return True
+    # Concurrent recipient jobs of the campaign must not each admit it.
+    session.refresh(campaign, with_for_update=True)
+    if (campaign.meta or {}).get("quota_day") == today:
+        return True
+    pending = campaign.total_recipients - campaign.sent_count - campaign.failed_count
+    if not reserve(session, campaign.user_id, max(pending, count), day=today):
+        return False
+    campaign.meta = {**(campaign.meta or {}), "quota_day": today}
+    return True
@@ -0,0 +1,38 @@
+from __future__ import annotations
+
+from typing import Any
+
+try:  # a declared dependency; a deployment missing it simply gets no regex triggers
+    import re2
+except ImportError:  # pragma: no cover - depends on the environment
+    re2 = None
+
+
+class UnsafePatternError(ValueError):
+    """A trigger pattern that does not compile or that RE2 cannot run."""
+
+
+def _options() -> Any:
+    options = re2.Options()
+    # Rejected patterns are reported to the user; RE2 would also log each one to stderr.
+    options.log_errors = False
+    return options
+
+
+def compile_pattern(pattern: str) -> Any:
+    """Compile a REGEX trigger with RE2, which matches in time linear in the message.
+
+    Backreferences, lookarounds, atomic groups, possessive quantifiers and repetition counts
+    above 1000 do not compile. There is no fallback to ``re``: a backtracking engine would let
+    one pattern such as ``(a|a)*c`` stall the worker, so without RE2 every pattern is refused.
+    """
+
+    if re2 is None:
+        raise UnsafePatternError("Regex triggers need the google-re2 package installed")
+    try:
+        return re2.compile(pattern, _options())
+    except re2.error as exc:
+        detail = exc.args[0] if exc.args else exc
+        if isinstance(detail, bytes):
+            detail = detail.decode(errors="replace")
+        raise UnsafePatternError(f"Invalid pattern: {detail}") from exc
@@ -0,0 +1,159 @@
+from __future__ import annotations
+
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Iterable
+from uuid import UUID
+
+from loguru import logger
+
+from app.core.config import get_settings
+from app.models import TriggerType
+from app.services.regex_safety import UnsafePatternError, compile_pattern
+from app.services.windows import WindowKey, window_key
+
+
+# Patterns only ever see the start of a message; nobody triggers a reply with the 5000th character.
+MAX_REGEX_INPUT_CHARS = 4096
+
+
+@dataclass(frozen=True)
+class CompiledRule:
+    """The parts of an auto-response rule needed after it matched, detached from any session."""
+
+    id: UUID
+    response_text: str | None
+    response_media_url: str | None
+    cooldown_seconds: int
+    active_windows: WindowKey
+
+
+class AhoCorasick:
+    """Multi-pattern substring matcher: one pass over the text finds every pattern it contains."""
+
+    def __init__(self, patterns: Iterable[tuple[str, int]]) -> None:
+        self._goto: list[dict[str, int]] = [{}]
+        self._fail: list[int] = [0]
+        self._output: list[tuple[int, ...]] = [()]
+        for pattern, value in patterns:
+            node = 0
+            for char in pattern:
+                child = self._goto[node].get(char)
+                if child is None:
+                    child = len(self._goto)
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append(())
+                    self._goto[node][char] = child
+                node = child
+            self._output[node] += (value,)
+        self._link()
+
+    def _link(self) -> None:
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fallback = self._fail[node]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(char, 0)
+                self._output[child] += self._output[self._fail[child]]
+
+    def search(self, text: str) -> set[int]:
+        found: set[int] = set(self._output[0])
+        node = 0
+        for char in text:
+            while node and char not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(char, 0)
+            if self._output[node]:
+                found.update(self._output[node])
+        return found
+
+
+@dataclass
+class RuleMatcher:
+    """A user's active rules compiled for matching; built once and reused across messages."""
+
+    rules: tuple[CompiledRule, ...] = ()
+    keywords: dict[str, tuple[int, ...]] = field(default_factory=dict)
+    contains: AhoCorasick | None = None
+    regexes: tuple[tuple[int, Any], ...] = ()
+    regex_budget_seconds: float = 0.05
+    slow_regex_seconds: float = 0.01
+
+    def match(self, message: str) -> list[CompiledRule]:
+        """Return the rules the message triggers, in the order the rules were listed."""
+
+        normalized = message.lower()
+        positions = set(self.keywords.get(normalized, ()))
+        if self.contains is not None:
+            positions.update(self.contains.search(normalized))
+        if self.regexes:
+            self._match_regexes(message[:MAX_REGEX_INPUT_CHARS], positions)
+        return [self.rules[position] for position in sorted(positions)]
+
+    def _match_regexes(self, subject: str, positions: set[int]) -> None:
+        # A search cannot be interrupted, so the budget is checked between patterns; RE2 keeps
+        # each search linear in the capped message, which bounds the overshoot.
+        deadline = time.perf_counter() + self.regex_budget_seconds
+        for index, (position, pattern) in enumerate(self.regexes):
+            if position in positions:
+                continue
+            started = time.perf_counter()
+            if started > deadline:
+                logger.warning("Regex budget exhausted; skipped %s auto-response patterns", len(self.regexes) - index)
+                return
+            if pattern.search(subject) is not None:
+                positions.add(position)
+            elapsed = time.perf_counter() - started
+            if elapsed > self.slow_regex_seconds:
+                logger.warning(
+                    "Slow auto-response pattern for rule %s: %.1f ms on %s characters",
+                    self.rules[position].id,
+                    elapsed * 1000,
+                    len(subject),
+                )
+
+
+def compile_rules(rules: Iterable[Any]) -> RuleMatcher:
+    compiled: list[CompiledRule] = []
+    keywords: dict[str, tuple[int, ...]] = {}
+    contains: list[tuple[str, int]] = []
+    regexes: list[tuple[int, Any]] = []
+    for rule in rules:
+        position = len(compiled)
+        if rule.trigger_type == TriggerType.KEYWORD:
+            key = rule.trigger_value.lower()
+            keywords[key] = keywords.get(key, ()) + (position,)
+        elif rule.trigger_type == TriggerType.CONTAINS:
+            contains.append((rule.trigger_value.lower(), position))
+        elif rule.trigger_type == TriggerType.REGEX:
+            try:
+                regexes.append((position, compile_pattern(rule.trigger_value)))
+            except UnsafePatternError as exc:
+                logger.warning("Skipping auto-response rule %s with rejected pattern: %s", rule.id, exc)
+                continue
+        else:
+            continue
+        compiled.append(
+            CompiledRule(
+                id=rule.id,
+                response_text=rule.response_text,
+                response_media_url=rule.response_media_url,
+                cooldown_seconds=rule.cooldown_seconds,
+                active_windows=window_key(rule.active_windows or ()),
+            )
+        )
+    settings = get_settings()
+    return RuleMatcher(
+        rules=tuple(compiled),
+        keywords=keywords,
+        contains=AhoCorasick(contains) if contains else None,
+        regexes=tuple(regexes),
+        regex_budget_seconds=settings.auto_response_regex_budget_ms / 1000,
+        slow_regex_seconds=settings.auto_response_regex_slow_ms / 1000,
+    )
@@ -1,7 +1,9 @@
 from __future__ import annotations
 
 import io
+import os
 import uuid
+from typing import BinaryIO
 from urllib.parse import urlparse
 
 from minio import Minio
@@ -39,3 +41,31 @@ def upload_bytes(data: bytes, filename: str, content_type: str | None = None) ->
     stream.seek(0)
     client.put_object(settings.minio_bucket, object_name, stream, length=length, content_type=content_type)
     return f"{settings.minio_endpoint}/{settings.minio_bucket}/{object_name}"
+
+
+def upload_import_file(fileobj: BinaryIO, filename: str, content_type: str | None = None) -> str:
+    """Store an uploaded contact file for a background import and return its object name."""
+
+    settings = get_settings()
+    client = _get_minio_client()
+    _ensure_bucket(client, settings.minio_bucket)
+
+    object_name = f"imports/{uuid.uuid4()}/{os.path.basename(filename)}"
+    fileobj.seek(0, io.SEEK_END)
+    length = fileobj.tell()
+    fileobj.seek(0)
+    client.put_object(settings.minio_bucket, object_name, fileobj, length=length, content_type=content_type)
+    return object_name
+
+
+def download_object(object_name: str, path: str) -> None:
+    client = _get_minio_client()
+    client.fget_object(get_settings().minio_bucket, object_name, path)
+
+
+def remove_object(object_name: str) -> None:
+    client = _get_minio_client()
+    try:
+        client.remove_object(get_settings().minio_bucket, object_name)
+    except S3Error:
+        pass
@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+import re
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Iterable, Mapping
+from uuid import UUID
+
+
+TEMPLATE_PATTERN = re.compile(r"{{\s*(\w+)\s*}}")
+
+# Variables every recipient provides; anything else comes from the contact's upload columns.
+BUILTIN_VARIABLES = frozenset({"name", "phone"})
+
+_CACHE_SIZE = 512
+
+
+@dataclass(frozen=True)
+class CompiledTemplate:
+    """A template body split once into literal text and the variables between it.
+
+    ``literals`` always has one more entry than ``fields``; rendering interleaves them.
+    """
+
+    literals: tuple[str, ...]
+    fields: tuple[str, ...]
+
+    @property
+    def variables(self) -> list[str]:
+        return list(dict.fromkeys(self.fields))
+
+    @property
+    def contact_variables(self) -> list[str]:
+        return [field for field in self.variables if field not in BUILTIN_VARIABLES]
+
+    def render(self, context: Mapping[str, str]) -> str:
+        if not self.fields:
+            return self.literals[0]
+        pieces = [self.literals[0]]
+        for field, literal in zip(self.fields, self.literals[1:]):
+            pieces.append(context.get(field, ""))
+            pieces.append(literal)
+        return "".join(pieces)
+
+    def render_many(self, contexts: Iterable[Mapping[str, str]]) -> list[str]:
+        return [self.render(context) for context in contexts]
+
+
+def compile_template(template_body: str | None) -> CompiledTemplate:
+    body = template_body or ""
+    literals: list[str] = []
+    fields: list[str] = []
+    position = 0
+    for match in TEMPLATE_PATTERN.finditer(body):
+        literals.append(body[position : match.start()])
+        fields.append(match.group(1))
+        position = match.end()
+    literals.append(body[position:])
+    return CompiledTemplate(literals=tuple(literals), fields=tuple(fields))
+
+
+_compiled: OrderedDict[UUID, tuple[str, CompiledTemplate]] = OrderedDict()
+
+
+def campaign_template(campaign_id: UUID, template_body: str | None) -> CompiledTemplate:
+    """Return the campaign's compiled template, parsing the body only when it changes."""
+
+    cached = _compiled.get(campaign_id)
+    if cached is not None and cached[0] == template_body:
+        _compiled.move_to_end(campaign_id)
+        return cached[1]
+    compiled = compile_template(template_body)
+    _compiled[campaign_id] = (template_body, compiled)
+    if len(_compiled) > _CACHE_SIZE:
+        _compiled.popitem(last=False)
+    return compiled
+
+
+def recipient_context(name: str | None, phone: str, variables: Mapping[str, str] | None) -> dict[str, str]:
+    return {**(variables or {}), "name": name or "", "phone": phone}
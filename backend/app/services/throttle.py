@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+import random
+import time
+import uuid
+from uuid import UUID
+
+from redis import Redis
+
+from app.core.config import get_settings
+from app.services.queue import get_redis_connection
+
+
+# Cursor keys outlive any realistic campaign; they are only a pacing hint, never a source of truth.
+CURSOR_TTL_SECONDS = 7 * 24 * 3600
+
+# Atomically take the next send slot at or after ARGV[1] and push the cursor out by ARGV[2] seconds.
+_RESERVE_SLOT_SCRIPT = """
+local current = tonumber(redis.call('GET', KEYS[1]) or '0')
+local slot = math.max(current, tonumber(ARGV[1]))
+redis.call('SET', KEYS[1], tostring(slot + tonumber(ARGV[2])), 'EX', ARGV[3])
+return tostring(slot)
+"""
+
+# Move the cursor forward to ARGV[1] unless another sender already pushed it further.
+_ADVANCE_SCRIPT = """
+local current = tonumber(redis.call('GET', KEYS[1]) or '0')
+if tonumber(ARGV[1]) > current then
+  redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[2])
+end
+return 1
+"""
+
+
+def _cursor_key(campaign_id: UUID | str) -> str:
+    return f"campaign:{campaign_id}:next_send_at"
+
+
+def _dispatcher_key(campaign_id: UUID | str) -> str:
+    return f"campaign:{campaign_id}:dispatcher"
+
+
+def jitter(min_seconds: float, max_seconds: float) -> float:
+    return random.uniform(min_seconds, max_seconds)
+
+
+def next_slot(campaign_id: UUID | str, *, redis: Redis | None = None) -> float:
+    """Return the earliest epoch timestamp at which the campaign may send again."""
+
+    redis = redis or get_redis_connection()
+    value = redis.get(_cursor_key(campaign_id))
+    return float(value) if value is not None else 0.0
+
+
+def plan_slots(
+    start: float,
+    min_seconds: float,
+    max_seconds: float,
+    *,
+    limit: int,
+    deadline: float | None = None,
+) -> tuple[list[float], float]:
+    """Lay out up to ``limit`` send times from ``start``; return them with the following slot.
+
+    When ``deadline`` is given only slots that fall on or before it are returned.
+    """
+
+    slots: list[float] = []
+    cursor = start
+    while len(slots) < limit and (deadline is None or cursor <= deadline):
+        slots.append(cursor)
+        cursor += jitter(min_seconds, max_seconds)
+    return slots, cursor
+
+
+def advance_cursor(campaign_id: UUID | str, timestamp: float, *, redis: Redis | None = None) -> None:
+    redis = redis or get_redis_connection()
+    redis.eval(_ADVANCE_SCRIPT, 1, _cursor_key(campaign_id), repr(timestamp), CURSOR_TTL_SECONDS)
+
+
+def reserve_slot(
+    campaign_id: UUID | str,
+    min_seconds: float,
+    max_seconds: float,
+    *,
+    not_before: float | None = None,
+    redis: Redis | None = None,
+) -> float:
+    """Claim one send slot for the campaign, safe to call from concurrent jobs."""
+
+    redis = redis or get_redis_connection()
+    earliest = not_before if not_before is not None else time.time()
+    slot = redis.eval(
+        _RESERVE_SLOT_SCRIPT,
+        1,
+        _cursor_key(campaign_id),
+        repr(earliest),
+        repr(jitter(min_seconds, max_seconds)),
+        CURSOR_TTL_SECONDS,
+    )
+    return float(slot)
+
+
+def clear_cursor(campaign_id: UUID | str, *, redis: Redis | None = None) -> None:
+    redis = redis or get_redis_connection()
+    redis.delete(_cursor_key(campaign_id))
+
+
+def issue_dispatcher_token(campaign_id: UUID | str, *, redis: Redis | None = None) -> str:
+    """Start a new run of the campaign: only jobs carrying this token may send for it."""
+
+    redis = redis or get_redis_connection()
+    token = uuid.uuid4().hex
+    redis.set(_dispatcher_key(campaign_id), token, ex=CURSOR_TTL_SECONDS)
+    return token
+
+
+def is_current_dispatcher(campaign_id: UUID | str, token: str | None, *, redis: Redis | None = None) -> bool:
+    redis = redis or get_redis_connection()
+    current = redis.get(_dispatcher_key(campaign_id))
+    if current is None:
+        # Key expired or Redis was flushed; let the surviving chain carry on rather than stall.
+        return True
+    return token is not None and current.decode() == token
+
+
+def dispatch_job_timeout() -> int:
+    settings = get_settings()
+    return int(settings.campaign_throttle_inline_seconds) + settings.campaign_dispatch_batch_size * 60 + 60
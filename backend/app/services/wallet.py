@@ -1,7 +1,8 @@
 from datetime import datetime, timedelta, timezone
+from uuid import UUID
 
 from fastapi import HTTPException, status
-from sqlalchemy import select
+from sqlalchemy import select, tuple_
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.config import get_settings
@@ -54,6 +55,7 @@ async def get_wallet_summary(db: AsyncSession, user: User) -> WalletSummary:
 
     return WalletSummary(
         balance=user.points_balance,
+        reserved=user.points_reserved,
         plan_expires_at=user.plan_expires_at,
         points_per_recipient=settings.points_per_recipient,
         max_daily_recipients=settings.max_daily_recipients,
@@ -104,11 +106,21 @@ async def wallet_topup(db: AsyncSession, user: User, payload: WalletTopupRequest
     return await get_wallet_summary(db, user)
 
 
-async def list_wallet_transactions(db: AsyncSession, user: User) -> list[WalletTransaction]:
+async def list_wallet_transactions(
+    db: AsyncSession, user: User, *, limit: int = 100, before: UUID | None = None
+) -> list[WalletTransaction]:
+    """Return the newest transactions first; pass the last id seen as ``before`` for the next page."""
+
+    query = select(WalletTransaction).where(WalletTransaction.user_id == user.id)
+    if before is not None:
+        cursor = await db.get(WalletTransaction, before)
+        if cursor is None or cursor.user_id != user.id:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Unknown transaction cursor")
+        query = query.where(
+            tuple_(WalletTransaction.created_at, WalletTransaction.id) < (cursor.created_at, cursor.id)
+        )
     result = await db.execute(
-        select(WalletTransaction)
-        .where(WalletTransaction.user_id == user.id)
-        .order_by(WalletTransaction.created_at.desc())
+        query.order_by(WalletTransaction.created_at.desc(), WalletTransaction.id.desc()).limit(limit)
     )
     return list(result.scalars().all())
 
@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+from bisect import bisect_right
+from dataclasses import dataclass
+from datetime import datetime, time, timedelta
+from functools import lru_cache
+from typing import Iterable, Mapping
+from zoneinfo import ZoneInfo
+
+
+DAY_SECONDS = 24 * 3600
+WEEK_SECONDS = 7 * DAY_SECONDS
+
+# (day_of_week, start_time, end_time) as stored in schedule and rule JSON; hashable for caching.
+WindowKey = tuple[tuple[int, str, str], ...]
+
+
+@lru_cache(maxsize=256)
+def get_timezone(name: str) -> ZoneInfo:
+    return ZoneInfo(name)
+
+
+def window_key(windows: Iterable[Mapping]) -> WindowKey:
+    return tuple((int(window["day_of_week"]), window["start_time"], window["end_time"]) for window in windows)
+
+
+def _seconds(value: str) -> int:
+    parsed = time.fromisoformat(value)
+    return parsed.hour * 3600 + parsed.minute * 60 + parsed.second
+
+
+@dataclass(frozen=True)
+class WindowIndex:
+    """Weekly windows as sorted, disjoint ``[start, end]`` offsets in seconds from Monday 00:00 local.
+
+    The end is inclusive, so a 09:00-17:00 window is still open at 17:00. ``starts`` and ``ends``
+    are parallel, so both lookups are a single bisect.
+    """
+
+    tz: ZoneInfo
+    starts: tuple[int, ...]
+    ends: tuple[int, ...]
+
+    def _locate(self, moment: datetime) -> tuple[datetime, int]:
+        local = moment.astimezone(self.tz)
+        offset = local.weekday() * DAY_SECONDS + local.hour * 3600 + local.minute * 60 + local.second
+        return local, offset
+
+    def _open_at(self, offset: int) -> bool:
+        position = bisect_right(self.starts, offset) - 1
+        return position >= 0 and offset <= self.ends[position]
+
+    def is_open(self, moment: datetime) -> bool:
+        return self._open_at(self._locate(moment)[1])
+
+    def next_open(self, moment: datetime) -> datetime | None:
+        """Return ``moment`` if a window is open then, else when the next one opens; ``None`` if none exist."""
+
+        if not self.starts:
+            return None
+        local, offset = self._locate(moment)
+        if self._open_at(offset):
+            return moment
+        position = bisect_right(self.starts, offset)
+        start = self.starts[position] if position < len(self.starts) else self.starts[0] + WEEK_SECONDS
+        week_start = (local - timedelta(days=local.weekday())).replace(hour=0, minute=0, second=0, microsecond=0)
+        # Wall-clock arithmetic on the local datetime, so a DST change in between is honoured.
+        opens = week_start + timedelta(seconds=start)
+        return opens.replace(fold=0).astimezone(moment.tzinfo)
+
+
+@lru_cache(maxsize=1024)
+def compile_windows(windows: WindowKey, timezone: str) -> WindowIndex:
+    """Build the weekly index for ``windows`` in ``timezone``; cached per distinct input.
+
+    A window whose end is before its start runs past midnight into the next day.
+    """
+
+    intervals: list[tuple[int, int]] = []
+    for day, start_time, end_time in windows:
+        start = day * DAY_SECONDS + _seconds(start_time)
+        end = day * DAY_SECONDS + _seconds(end_time)
+        if end < start:
+            end += DAY_SECONDS
+        if end > WEEK_SECONDS:
+            intervals.append((start, WEEK_SECONDS))
+            intervals.append((0, end - WEEK_SECONDS))
+        else:
+            intervals.append((start, end))
+
+    merged: list[list[int]] = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return WindowIndex(
+        tz=get_timezone(timezone),
+        starts=tuple(start for start, _ in merged),
+        ends=tuple(end for _, end in merged),
+    )
@@ -0,0 +1,247 @@
+from __future__ import annotations
+
+import asyncio
+import signal
+import time
+import uuid
+from uuid import UUID
+
+from loguru import logger
+from redis.asyncio import Redis
+from sqlalchemy import select
+
+from app.core.config import get_settings
+from app.db.session import async_session
+from app.models import Campaign, CampaignStatus
+from app.services import dispatch, progress, throttle
+from app.services.http_clients import aclose_http_clients
+from app.services.messaging import MessagingError, MessagingRetryableError, send_campaign_message_async
+
+
+ACTIVE_STATUSES = (CampaignStatus.QUEUED, CampaignStatus.SENDING)
+LEASE_SECONDS = 60
+
+# Only recipients due within this window are claimed at once; it bounds how long a pause or
+# cancel can go unnoticed by a running campaign.
+_CLAIM_WINDOW_SECONDS = 10.0
+
+_RENEW_LEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+  return redis.call('EXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+_RELEASE_LEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+  return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+def _lease_key(campaign_id: UUID) -> str:
+    return f"campaign:{campaign_id}:async_lease"
+
+
+class CampaignRuntime:
+    """Drive every active campaign from one event loop, one coroutine per campaign."""
+
+    def __init__(self, redis: Redis) -> None:
+        self.settings = get_settings()
+        self.redis = redis
+        self.worker_id = uuid.uuid4().hex
+        self.tasks: dict[UUID, asyncio.Task] = {}
+
+    async def run(self) -> None:
+        logger.info("Async campaign runtime %s started", self.worker_id)
+        try:
+            while True:
+                self._reap()
+                await self._renew_leases()
+                await self._adopt_campaigns()
+                await asyncio.sleep(self.settings.async_worker_poll_seconds)
+        finally:
+            await self.shutdown()
+
+    async def shutdown(self) -> None:
+        for task in self.tasks.values():
+            task.cancel()
+        await asyncio.gather(*self.tasks.values(), return_exceptions=True)
+        for campaign_id in list(self.tasks):
+            await self._release_lease(campaign_id)
+        self.tasks.clear()
+
+    def _reap(self) -> None:
+        for campaign_id, task in list(self.tasks.items()):
+            if not task.done():
+                continue
+            del self.tasks[campaign_id]
+            if not task.cancelled() and task.exception() is not None:
+                logger.opt(exception=task.exception()).error("Campaign %s runtime crashed", campaign_id)
+
+    async def _renew_leases(self) -> None:
+        for campaign_id, task in list(self.tasks.items()):
+            renewed = await self.redis.eval(
+                _RENEW_LEASE_SCRIPT, 1, _lease_key(campaign_id), self.worker_id, LEASE_SECONDS
+            )
+            if not renewed:
+                logger.warning("Lost lease on campaign %s; stopping it here", campaign_id)
+                task.cancel()
+
+    async def _adopt_campaigns(self) -> None:
+        capacity = self.settings.async_worker_max_campaigns - len(self.tasks)
+        if capacity <= 0:
+            return
+        async with async_session() as session:
+            result = await session.execute(
+                select(Campaign.id)
+                .where(Campaign.status.in_(ACTIVE_STATUSES))
+                .order_by(Campaign.started_at)
+            )
+            candidates = [campaign_id for campaign_id in result.scalars() if campaign_id not in self.tasks]
+
+        for campaign_id in candidates:
+            if capacity <= 0:
+                return
+            acquired = await self.redis.set(_lease_key(campaign_id), self.worker_id, nx=True, ex=LEASE_SECONDS)
+            if not acquired:
+                continue
+            self.tasks[campaign_id] = asyncio.create_task(self._drive(campaign_id))
+            capacity -= 1
+
+    async def _release_lease(self, campaign_id: UUID) -> None:
+        await self.redis.eval(_RELEASE_LEASE_SCRIPT, 1, _lease_key(campaign_id), self.worker_id)
+
+    async def _drive(self, campaign_id: UUID) -> None:
+        retries: set[asyncio.Task] = set()
+        try:
+            await self._recover_inflight(campaign_id)
+            next_send_at = 0.0
+            while True:
+                await asyncio.sleep(max(0.0, next_send_at - time.time()))
+                batch = await self._claim_due(campaign_id, next_send_at, retries)
+                if batch is None:
+                    return
+                claimed, slots, following, campaign = batch
+                if not claimed:
+                    # Only backoff retries remain; they re-queue their recipient when due.
+                    await asyncio.sleep(self.settings.async_worker_poll_seconds)
+                    continue
+
+                outcomes: list[dispatch.SendOutcome] = []
+                consecutive_failures = (campaign.meta or {}).get("consecutive_failures", 0)
+                for recipient, slot in zip(claimed, slots):
+                    await asyncio.sleep(max(0.0, slot - time.time()))
+                    outcome = await self._send(recipient, campaign.media_url, campaign.document_url)
+                    outcomes.append(outcome)
+                    consecutive_failures = 0 if outcome.sent else consecutive_failures + 1
+                    if consecutive_failures >= 3 and not dispatch.will_retry(outcome):
+                        break
+
+                next_send_at = slots[len(outcomes)] if len(outcomes) < len(slots) else following
+                unsent = claimed[len(outcomes):]
+                async with async_session() as session:
+                    # apply_outcomes commits inside run_sync.
+                    backoffs = await session.run_sync(dispatch.apply_outcomes, campaign_id, outcomes, unsent)
+                    await progress.flush_committed(session)
+                for recipient_id, delay in backoffs:
+                    task = asyncio.create_task(self._retry_later(campaign_id, recipient_id, delay))
+                    retries.add(task)
+                    task.add_done_callback(retries.discard)
+        finally:
+            for task in retries:
+                task.cancel()
+            await self._release_lease(campaign_id)
+
+    async def _claim_due(
+        self, campaign_id: UUID, next_send_at: float, retries: set[asyncio.Task]
+    ) -> tuple[list[dispatch.ClaimedRecipient], list[float], float, Campaign] | None:
+        """Claim the recipients due in the next window; ``None`` means the campaign is done here."""
+
+        async with async_session() as session:
+            campaign = await session.get(Campaign, campaign_id)
+            if campaign is None or campaign.status not in ACTIVE_STATUSES:
+                return None
+
+            now = time.time()
+            slots, following = throttle.plan_slots(
+                max(next_send_at, now),
+                campaign.throttle_min_seconds,
+                campaign.throttle_max_seconds,
+                limit=self.settings.campaign_dispatch_batch_size,
+                deadline=now + _CLAIM_WINDOW_SECONDS,
+            )
+            claimed = await session.run_sync(
+                lambda sync_session: dispatch.claim_recipients(sync_session, campaign, len(slots))
+            )
+            if not claimed:
+                if retries:
+                    await session.commit()
+                    await progress.flush_committed(session)
+                    return [], [], following, campaign
+                await session.run_sync(dispatch.finalize_campaign_if_done, campaign_id)
+                await session.commit()
+                await progress.flush_committed(session)
+                return None
+
+            if campaign.status == CampaignStatus.QUEUED:
+                campaign.status = CampaignStatus.SENDING
+            await session.commit()
+            await progress.flush_committed(session)
+            return claimed, slots, following, campaign
+
+    async def _recover_inflight(self, campaign_id: UUID) -> None:
+        # Holding the lease means nobody else is sending; SENDING rows were orphaned by a previous owner.
+        async with async_session() as session:
+            await session.run_sync(dispatch.requeue_recipients, campaign_id)
+            await session.commit()
+            await progress.flush_committed(session)
+
+    async def _retry_later(self, campaign_id: UUID, recipient_id: UUID, delay: int) -> None:
+        await asyncio.sleep(delay)
+        async with async_session() as session:
+            await session.run_sync(dispatch.requeue_recipients, campaign_id, [recipient_id])
+            await session.commit()
+            await progress.flush_committed(session)
+
+    async def _send(
+        self, recipient: dispatch.ClaimedRecipient, media_url: str | None, document_url: str | None
+    ) -> dispatch.SendOutcome:
+        phone = recipient.phone_e164
+        try:
+            await send_campaign_message_async(
+                phone=phone, body=recipient.body, media_url=media_url, document_url=document_url
+            )
+        except MessagingRetryableError as exc:
+            logger.warning("Retryable messaging failure for %s: %s", phone, exc)
+            return dispatch.SendOutcome(recipient, sent=False, transient=True, error_message=str(exc))
+        except MessagingError as exc:
+            logger.error("Permanent messaging failure for %s: %s", phone, exc)
+            return dispatch.SendOutcome(recipient, sent=False, error_message=str(exc))
+        return dispatch.SendOutcome(recipient, sent=True)
+
+
+async def run_async_worker() -> None:
+    settings = get_settings()
+    if settings.campaign_dispatch_mode != "async":
+        logger.warning(
+            "CAMPAIGN_DISPATCH_MODE is %r; the API will keep enqueueing RQ jobs for new campaigns",
+            settings.campaign_dispatch_mode,
+        )
+
+    redis = Redis.from_url(settings.redis_url)
+    runtime = CampaignRuntime(redis)
+    main_task = asyncio.create_task(runtime.run())
+
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, main_task.cancel)
+
+    try:
+        await main_task
+    except asyncio.CancelledError:
+        logger.info("Async campaign runtime %s stopped", runtime.worker_id)
+    finally:
+        await aclose_http_clients()
+        await redis.aclose()
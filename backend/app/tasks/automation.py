@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+import time
+
+from loguru import logger
+from redis import Redis
+from redis.exceptions import RedisError
+
+from app.core.config import get_settings
+from app.services import auto_replies
+from app.services.messaging import MessagingError, MessagingRetryableError, send_campaign_message
+from app.services.queue import get_redis_connection
+
+
+# A job sleeps through the session's pacing gap when it is this short; longer waits (another
+# job holds the next slots) are handed to the RQ scheduler so the worker is free meanwhile.
+_INLINE_WAIT_SECONDS = 5.0
+
+
+def deliver_auto_replies(user_id: str) -> None:
+    """Send a batch from the user's auto-reply outbox at the session's pace, then chain or stop."""
+
+    settings = get_settings()
+    redis = get_redis_connection()
+    replies = auto_replies.take_replies(user_id, settings.auto_response_batch_size, redis=redis)
+    max_wait = max(_INLINE_WAIT_SECONDS, settings.auto_response_send_interval_seconds)
+    index = 0
+    try:
+        for index, reply in enumerate(replies):
+            taken, slot = auto_replies.reserve_send(user_id, max_wait, redis=redis)
+            if not taken:
+                auto_replies.return_replies(user_id, replies[index:], redis=redis)
+                auto_replies.schedule_delivery(user_id, at=slot, redis=redis)
+                return
+            wait = slot - time.time()
+            if wait > 0:
+                time.sleep(wait)
+
+            phone = reply["phone"]
+            try:
+                send_campaign_message(phone=phone, body=reply["body"], media_url=reply["media_url"], document_url=None)
+            except MessagingRetryableError as exc:
+                # Transient failures are usually the session itself, so the whole outbox backs off.
+                logger.warning("Retryable failure sending auto-reply to %s: %s", phone, exc)
+                _back_off(user_id, replies[index:], redis)
+                return
+            except MessagingError as exc:
+                logger.error("Permanent failure sending auto-reply from rule %s to %s: %s", reply["rule_id"], phone, exc)
+            auto_replies.complete_reply(user_id, redis=redis)
+    except Exception:
+        # A Redis error, an unexpected HTTP failure or the job timeout: keep the unsent replies and
+        # the outbox's delivery job rather than leave both to the marker's expiry.
+        logger.exception("Auto-reply delivery for user %s failed", user_id)
+        try:
+            _back_off(user_id, replies[index:], redis)
+        except RedisError as exc:
+            # The replies stay in the processing list; the next delivery job takes them first.
+            logger.error("Could not return auto-replies for user %s: %s", user_id, exc)
+        raise
+
+    if not auto_replies.finish_delivery(user_id, redis=redis):
+        auto_replies.schedule_delivery(user_id, redis=redis)
+
+
+def _back_off(user_id: str, unsent: list[dict], redis: Redis) -> None:
+    """Return ``unsent`` with its first reply's attempt counted and retry the outbox after a backoff."""
+
+    backoff_schedule = get_settings().campaign_failure_backoff_schedule
+    reply, remaining = unsent[0], unsent[1:]
+    attempts = reply["attempts"] + 1
+    if attempts <= len(backoff_schedule):
+        remaining = [{**reply, "attempts": attempts}, *remaining]
+    else:
+        logger.error("Dropping auto-reply from rule %s to %s after retries", reply["rule_id"], reply["phone"])
+    auto_replies.return_replies(user_id, remaining, redis=redis)
+    delay = backoff_schedule[min(attempts, len(backoff_schedule)) - 1] if backoff_schedule else 0
+    auto_replies.schedule_delivery(user_id, at=time.time() + delay, redis=redis)
@@ -1,15 +1,11 @@
 from __future__ import annotations
 
-import random
-import re
 import time
-from datetime import datetime, timedelta, timezone
+from datetime import datetime, timezone
 from uuid import UUID
 
 from loguru import logger
-from redis import Redis
 from rq import Queue
-from sqlalchemy.orm import Session
 
 from app.core.config import get_settings
 from app.models import (
@@ -17,26 +13,50 @@ from app.models import (
     CampaignRecipient,
     CampaignStatus,
     DeliveryStatus,
-    WalletTransaction,
-    WalletTxnType,
 )
+from app.services import dispatch, progress, quota, templates, throttle
 from app.services.messaging import MessagingError, MessagingRetryableError, send_campaign_message
+from app.services.queue import get_redis_connection
 from app.tasks.db import SessionLocal
 
 
 settings = get_settings()
 
 
-def _requeue(recipient_id, delay: int) -> None:
-    queue = Queue("campaigns", connection=Redis.from_url(settings.redis_url))
-    queue.enqueue_in(
-        timedelta(seconds=delay),
+# RQ's scheduler only promotes due jobs about once a second, so a tick may start slightly early.
+_SCHEDULER_SLACK_SECONDS = 1.0
+
+
+def _queue() -> Queue:
+    return Queue("campaigns", connection=get_redis_connection())
+
+
+def _requeue(recipient_id, campaign: Campaign, delay: int, token: str | None) -> None:
+    send_at = throttle.reserve_slot(
+        campaign.id,
+        campaign.throttle_min_seconds,
+        campaign.throttle_max_seconds,
+        not_before=time.time() + delay,
+    )
+    _queue().enqueue_at(
+        datetime.fromtimestamp(send_at, timezone.utc),
         "app.tasks.campaigns.process_campaign_recipient",
         str(recipient_id),
+        token,
+    )
+
+
+def _schedule_dispatch(campaign_id: UUID, token: str | None, send_at: float) -> None:
+    _queue().enqueue_at(
+        datetime.fromtimestamp(send_at, timezone.utc),
+        "app.tasks.campaigns.dispatch_campaign",
+        str(campaign_id),
+        token,
+        job_timeout=throttle.dispatch_job_timeout(),
     )
 
 
-def process_campaign_recipient(recipient_id: str) -> None:
+def process_campaign_recipient(recipient_id: str, token: str | None = None) -> None:
     recipient_uuid = UUID(recipient_id)
 
     with SessionLocal() as session:
@@ -45,147 +65,142 @@ def process_campaign_recipient(recipient_id: str) -> None:
             return
         if recipient.status not in {DeliveryStatus.QUEUED, DeliveryStatus.SENDING}:
             return
+        if recipient.status == DeliveryStatus.QUEUED and not throttle.is_current_dispatcher(
+            recipient.campaign_id, token
+        ):
+            # Scheduled by a run that a pause ended; the resumed run enqueued this recipient again.
+            # A SENDING recipient is a retry nobody else owns, so its job carries on.
+            return
 
         campaign = recipient.campaign
         if campaign.status == CampaignStatus.CANCELLED:
-            recipient.status = DeliveryStatus.FAILED
-            recipient.last_error = "Campaign cancelled"
+            failed = dispatch.transition_recipients(
+                session, campaign.id, [recipient.id], DeliveryStatus.FAILED, last_error="Campaign cancelled"
+            )
+            dispatch.record_transitions(session, campaign.id, failed=len(failed))
             session.commit()
             return
 
         if campaign.status == CampaignStatus.PAUSED:
+            # A retry scheduled after the pause leaves SENDING behind; queue it for resume_campaign.
+            dispatch.requeue_recipients(session, campaign.id, [recipient.id])
+            session.commit()
+            return
+
+        # Retries are still SENDING and already hold their quota slot.
+        if recipient.status == DeliveryStatus.QUEUED and not quota.admit_batch(session, campaign, 1):
+            dispatch.pause_for_quota(campaign)
             session.commit()
-            _requeue(recipient.id, delay=15)
             return
 
+        progress.record_transition(session, campaign.id, recipient.status, DeliveryStatus.SENDING)
         recipient.status = DeliveryStatus.SENDING
         recipient.attempts += 1
+        if campaign.status == CampaignStatus.QUEUED:
+            campaign.status = CampaignStatus.SENDING
         session.commit()
 
-        message_body = _render_message(campaign, recipient)
+        claimed = dispatch.ClaimedRecipient(
+            id=recipient.id,
+            name=recipient.name,
+            phone_e164=recipient.phone_e164,
+            attempts=recipient.attempts,
+            body=_render_message(campaign, recipient),
+        )
         media_url = campaign.media_url
         document_url = campaign.document_url
-        phone = recipient.phone_e164
-        throttle_delay = random.uniform(campaign.throttle_min_seconds, campaign.throttle_max_seconds)
 
-    time.sleep(throttle_delay)
+    outcome = _send_claimed(claimed, media_url, document_url)
+    with SessionLocal() as session:
+        retries = dispatch.apply_outcomes(session, campaign.id, [outcome], [])
+        campaign = session.get(Campaign, campaign.id)
+        for retry_id, delay in retries:
+            _requeue(retry_id, campaign, delay, token)
 
-    try:
-        send_campaign_message(phone=phone, body=message_body, media_url=media_url, document_url=document_url)
-    except MessagingRetryableError as exc:
-        logger.warning("Retryable messaging failure for %s: %s", phone, exc)
-        _handle_failure(recipient_uuid, transient=True, error_message=str(exc))
-        return
-    except MessagingError as exc:
-        logger.error("Permanent messaging failure for %s: %s", phone, exc)
-        _handle_failure(recipient_uuid, transient=False, error_message=str(exc))
-        return
 
-    _handle_success(recipient_uuid)
+def dispatch_campaign(campaign_id: str, token: str | None = None) -> None:
+    """Send the recipients that are due on the campaign's throttle timeline, then schedule the next tick."""
 
+    campaign_uuid = UUID(campaign_id)
+    if not throttle.is_current_dispatcher(campaign_uuid, token):
+        return
 
-def _handle_failure(recipient_id: UUID, transient: bool, error_message: str | None = None) -> None:
     with SessionLocal() as session:
-        recipient = session.get(CampaignRecipient, recipient_id)
-        if recipient is None:
+        campaign = session.get(Campaign, campaign_uuid)
+        if campaign is None:
             return
-        campaign = recipient.campaign
-
-        meta = dict(campaign.meta or {})
-        meta["consecutive_failures"] = meta.get("consecutive_failures", 0) + 1
-        campaign.meta = meta
-
-        if transient and recipient.attempts < len(settings.campaign_failure_backoff_schedule):
-            backoff_seconds = settings.campaign_failure_backoff_schedule[recipient.attempts - 1]
-            recipient.status = DeliveryStatus.QUEUED
-            recipient.last_error = error_message or "Transient failure; retry scheduled"
-            session.commit()
-
-            _requeue(recipient.id, backoff_seconds)
+        if campaign.status in {CampaignStatus.PAUSED, CampaignStatus.CANCELLED}:
+            # resume_campaign starts a fresh dispatcher; cancel_campaign fails the leftovers.
             return
 
-        if campaign.status == CampaignStatus.QUEUED:
-            campaign.status = CampaignStatus.SENDING
-        if meta["consecutive_failures"] >= 3:
-            campaign.status = CampaignStatus.PAUSED
-
-        recipient.status = DeliveryStatus.FAILED
-        recipient.last_error = error_message or "Failed after retries"
-        session.commit()
-        _update_campaign_completion(session, campaign)
-
-
-def _handle_success(recipient_id: UUID) -> None:
-    now = datetime.now(timezone.utc)
-    with SessionLocal() as session:
-        recipient = session.get(CampaignRecipient, recipient_id)
-        if recipient is None:
+        now = time.time()
+        start = max(throttle.next_slot(campaign.id), now)
+        slots, following = throttle.plan_slots(
+            start,
+            campaign.throttle_min_seconds,
+            campaign.throttle_max_seconds,
+            limit=settings.campaign_dispatch_batch_size,
+            deadline=now + settings.campaign_throttle_inline_seconds + _SCHEDULER_SLACK_SECONDS,
+        )
+        if not slots:
+            _schedule_dispatch(campaign.id, token, start)
             return
 
-        campaign = recipient.campaign
-        user = campaign.user
-
-        if campaign.status == CampaignStatus.QUEUED:
-            campaign.status = CampaignStatus.SENDING
-
-        if user.points_balance < settings.points_per_recipient:
-            recipient.status = DeliveryStatus.FAILED
-            recipient.last_error = "Insufficient points"
+        claimed = dispatch.claim_recipients(session, campaign, len(slots))
+        if not claimed:
+            dispatch.finalize_campaign_if_done(session, campaign.id)
             session.commit()
-            _update_campaign_completion(session, campaign)
             return
 
-        meta = dict(campaign.meta or {})
-        meta["consecutive_failures"] = 0
-        campaign.meta = meta
-
-        user.points_balance -= settings.points_per_recipient
-        session.add(
-            WalletTransaction(
-                user_id=user.id,
-                txn_type=WalletTxnType.DEDUCT,
-                points=-settings.points_per_recipient,
-                balance_after=user.points_balance,
-                reference=f"campaign:{campaign.id}",
-            )
-        )
-
-        recipient.status = DeliveryStatus.SENT
-        recipient.sent_at = now
-        recipient.last_error = None
+        if campaign.status == CampaignStatus.QUEUED:
+            campaign.status = CampaignStatus.SENDING
         session.commit()
-        _update_campaign_completion(session, campaign)
 
+        media_url = campaign.media_url
+        document_url = campaign.document_url
+        consecutive_failures = (campaign.meta or {}).get("consecutive_failures", 0)
 
-def _update_campaign_completion(session: Session, campaign: Campaign) -> None:
-    session.refresh(campaign, attribute_names=["recipients"])
-    statuses = {recipient.status for recipient in campaign.recipients}
-    if campaign.status in {CampaignStatus.PAUSED, CampaignStatus.CANCELLED}:
-        session.commit()
-        return
-    if any(status in {DeliveryStatus.QUEUED, DeliveryStatus.SENDING} for status in statuses):
-        return
+    outcomes: list[dispatch.SendOutcome] = []
+    for recipient, slot in zip(claimed, slots):
+        wait = slot - time.time()
+        if wait > 0:
+            # Bounded by CAMPAIGN_THROTTLE_INLINE_SECONDS; longer gaps are left to the RQ scheduler.
+            time.sleep(wait)
+        outcome = _send_claimed(recipient, media_url, document_url)
+        outcomes.append(outcome)
 
-    campaign.completed_at = datetime.now(timezone.utc)
-    if any(status == DeliveryStatus.FAILED for status in statuses):
-        campaign.status = CampaignStatus.FAILED
-    else:
-        campaign.status = CampaignStatus.COMPLETED
-    session.commit()
+        consecutive_failures = 0 if outcome.sent else consecutive_failures + 1
+        if consecutive_failures >= 3 and not dispatch.will_retry(outcome):
+            break
 
+    next_send_at = slots[len(outcomes)] if len(outcomes) < len(slots) else following
+    throttle.advance_cursor(campaign_uuid, next_send_at)
 
-TEMPLATE_PATTERN = re.compile(r"{{\s*(\w+)\s*}}")
+    unsent = claimed[len(outcomes):]
+    with SessionLocal() as session:
+        retries = dispatch.apply_outcomes(session, campaign_uuid, outcomes, unsent)
+        campaign = session.get(Campaign, campaign_uuid)
+        for recipient_id, delay in retries:
+            _requeue(recipient_id, campaign, delay, token)
+        if campaign.status not in {CampaignStatus.PAUSED, CampaignStatus.CANCELLED}:
+            _schedule_dispatch(campaign_uuid, token, next_send_at)
+
+
+def _send_claimed(
+    recipient: dispatch.ClaimedRecipient, media_url: str | None, document_url: str | None
+) -> dispatch.SendOutcome:
+    phone = recipient.phone_e164
+    try:
+        send_campaign_message(phone=phone, body=recipient.body, media_url=media_url, document_url=document_url)
+    except MessagingRetryableError as exc:
+        logger.warning("Retryable messaging failure for %s: %s", phone, exc)
+        return dispatch.SendOutcome(recipient, sent=False, transient=True, error_message=str(exc))
+    except MessagingError as exc:
+        logger.error("Permanent messaging failure for %s: %s", phone, exc)
+        return dispatch.SendOutcome(recipient, sent=False, error_message=str(exc))
+    return dispatch.SendOutcome(recipient, sent=True)
 
 
 def _render_message(campaign: Campaign, recipient: CampaignRecipient) -> str:
-    contact = recipient.contact  # lazy load if necessary
-    context = {
-        "name": (recipient.name or (contact.name if contact else "")) or "",
-        "phone": recipient.phone_e164,
-    }
-
-    def replace(match: re.Match[str]) -> str:
-        key = match.group(1)
-        return str(context.get(key, ""))
-
-    return TEMPLATE_PATTERN.sub(replace, campaign.template_body or "")
+    template = templates.campaign_template(campaign.id, campaign.template_body)
+    return template.render(templates.recipient_context(recipient.name, recipient.phone_e164, recipient.variables))
@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+import os
+import tempfile
+from dataclasses import asdict
+from uuid import UUID
+
+from loguru import logger
+from rq import get_current_job
+from rq.job import Job
+
+from app.models import ContactList, ContactSource
+from app.services import storage
+from app.services.contacts import (
+    ContactImportError,
+    ImportStats,
+    copy_contacts,
+    iter_contact_records,
+    shutdown_validation_pool,
+)
+from app.tasks.db import SessionLocal
+
+
+def _report(job: Job | None, stats: ImportStats, **extra) -> None:
+    if job is None:
+        return
+    job.meta.update(asdict(stats), **extra)
+    job.save_meta()
+
+
+def import_contact_file(user_id: str, object_name: str, filename: str, list_name: str) -> str:
+    """Build a contact list from a stored upload, publishing running counts on the job."""
+
+    job = get_current_job()
+    stats = ImportStats()
+    try:
+        with tempfile.TemporaryDirectory() as workdir:
+            path = os.path.join(workdir, os.path.basename(filename) or "contacts")
+            storage.download_object(object_name, path)
+            with open(path, "rb") as fileobj, SessionLocal() as session:
+                contact_list = ContactList(
+                    user_id=UUID(user_id),
+                    name=list_name,
+                    source=ContactSource.UPLOAD,
+                    meta={"filename": filename},
+                )
+                session.add(contact_list)
+                session.flush()
+                for records in iter_contact_records(fileobj, filename, stats=stats):
+                    copy_contacts(session, contact_list.id, records)
+                    _report(job, stats)
+                if stats.imported == 0:
+                    raise ContactImportError("No valid contacts found")
+                contact_list.total_contacts = stats.imported
+                session.commit()
+    except ContactImportError as exc:
+        _report(job, stats, error=str(exc))
+        raise
+    except Exception:
+        _report(job, stats, error="Import failed")
+        raise
+    finally:
+        storage.remove_object(object_name)
+        # The validation pool's processes would otherwise idle in the worker between imports,
+        # or be orphaned when a forked work horse exits.
+        shutdown_validation_pool()
+
+    _report(job, stats, list_id=str(contact_list.id))
+    logger.info(
+        "Imported %s contacts into list %s (%s rejected, %s duplicates)",
+        stats.imported,
+        contact_list.id,
+        stats.rejected,
+        stats.deduplicated,
+    )
+    return str(contact_list.id)
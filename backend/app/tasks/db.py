@@ -2,11 +2,13 @@ from sqlalchemy import create_engine
 from sqlalchemy.orm import Session, sessionmaker
 
 from app.core.config import get_settings
-from app.db.schema import ensure_wallet_schema_sync
+from app.db.schema import ensure_schema_sync
+from app.services.progress import install_commit_hook
 
 
 settings = get_settings()
 
 engine = create_engine(settings.sync_database_url, future=True)
-ensure_wallet_schema_sync(engine)
+ensure_schema_sync(engine)
 SessionLocal = sessionmaker(engine, class_=Session, expire_on_commit=False)
+install_commit_hook(SessionLocal)
@@ -0,0 +1,172 @@
+from __future__ import annotations
+
+import asyncio
+import signal
+import socket
+import uuid
+
+from loguru import logger
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from app.core.config import get_settings
+from app.db.session import async_session
+from app.models import User
+from app.services.automation import handle_inbound_batch
+from app.services.inbound import (
+    INBOUND_GROUP,
+    INBOUND_STREAM,
+    InboundEntry,
+    dead_letter,
+    decode_entry,
+    ensure_consumer_group,
+    group_by_user,
+)
+
+
+_BLOCK_MS = 1000
+
+# Entries a consumer read but never acknowledged (it crashed, or the batch failed) are claimed
+# by another consumer after this long, up to _MAX_DELIVERIES times before being dropped.
+_RECLAIM_IDLE_MS = 60_000
+_RECLAIM_INTERVAL_SECONDS = 15.0
+_MAX_DELIVERIES = 5
+
+# A consumer that loses Redis waits this long before trying again, doubling up to the maximum.
+_RETRY_MIN_SECONDS = 0.5
+_RETRY_MAX_SECONDS = 30.0
+
+
+class InboundConsumerPool:
+    """Evaluate queued inbound messages with several stream consumers sharing one event loop.
+
+    Each consumer reads a micro-batch, evaluates it one user at a time (rules and schedule are
+    loaded once per user, in a session and transaction of its own) and acknowledges what it
+    processed.
+    """
+
+    def __init__(self, redis: Redis) -> None:
+        self.settings = get_settings()
+        self.redis = redis
+        self.name = f"{socket.gethostname()}-{uuid.uuid4().hex[:8]}"
+
+    async def run(self) -> None:
+        await ensure_consumer_group(self.redis)
+        logger.info("Inbound consumer pool %s started with %s consumers", self.name, self.settings.inbound_consumers)
+        consumers = [
+            asyncio.create_task(self._consume(f"{self.name}-{index}"))
+            for index in range(self.settings.inbound_consumers)
+        ]
+        try:
+            await asyncio.gather(*consumers)
+        finally:
+            for task in consumers:
+                task.cancel()
+            await asyncio.gather(*consumers, return_exceptions=True)
+
+    async def _consume(self, consumer: str) -> None:
+        loop = asyncio.get_running_loop()
+        next_reclaim = loop.time()
+        retry_delay = _RETRY_MIN_SECONDS
+        while True:
+            try:
+                entries: list = []
+                if loop.time() >= next_reclaim:
+                    entries = await self._reclaim(consumer)
+                    next_reclaim = loop.time() + _RECLAIM_INTERVAL_SECONDS
+                if not entries:
+                    response = await self.redis.xreadgroup(
+                        INBOUND_GROUP,
+                        consumer,
+                        {INBOUND_STREAM: ">"},
+                        count=self.settings.inbound_batch_size,
+                        block=_BLOCK_MS,
+                    )
+                    entries = response[0][1] if response else []
+                if entries:
+                    await self._process(entries)
+            except RedisError as exc:
+                # Whatever was read and not acknowledged is reclaimed once Redis is back.
+                logger.warning("Inbound consumer %s lost Redis; retrying in %ss: %s", consumer, retry_delay, exc)
+                await asyncio.sleep(retry_delay)
+                retry_delay = min(retry_delay * 2, _RETRY_MAX_SECONDS)
+                continue
+            retry_delay = _RETRY_MIN_SECONDS
+
+    async def _reclaim(self, consumer: str) -> list:
+        pending = await self.redis.xpending_range(
+            INBOUND_STREAM,
+            INBOUND_GROUP,
+            min="-",
+            max="+",
+            count=self.settings.inbound_batch_size,
+            idle=_RECLAIM_IDLE_MS,
+        )
+        exhausted = [entry["message_id"] for entry in pending if entry["times_delivered"] >= _MAX_DELIVERIES]
+        if exhausted:
+            logger.error("Dropping %s inbound messages after %s failed attempts", len(exhausted), _MAX_DELIVERIES)
+            await self.redis.xack(INBOUND_STREAM, INBOUND_GROUP, *exhausted)
+        retry = [entry["message_id"] for entry in pending if entry["times_delivered"] < _MAX_DELIVERIES]
+        if not retry:
+            return []
+        return await self.redis.xclaim(INBOUND_STREAM, INBOUND_GROUP, consumer, _RECLAIM_IDLE_MS, retry)
+
+    async def _process(self, raw_entries: list) -> None:
+        decoded: list[InboundEntry] = []
+        malformed: list[tuple[bytes, dict]] = []
+        for entry_id, fields in raw_entries:
+            # Entries trimmed from the stream while pending come back without fields; just acknowledge them.
+            if not fields:
+                continue
+            try:
+                decoded.append(decode_entry(entry_id, fields))
+            except ValueError as exc:
+                logger.error("Dead-lettering malformed inbound entry %s: %s", entry_id, exc)
+                malformed.append((entry_id, fields))
+        if malformed:
+            await dead_letter(self.redis, malformed)
+
+        failed: set[bytes] = set()
+        triggered = 0
+        for user_id, entries in group_by_user(decoded).items():
+            # One session per user: a failed group's rollback must not expire another group's objects.
+            async with async_session() as db:
+                try:
+                    user = await db.get(User, user_id)
+                    if user is None:
+                        continue
+                    batch = await handle_inbound_batch(db, user, [payload for _, _, payload in entries])
+                except Exception:
+                    logger.exception("Inbound batch for user %s failed; it will be retried", user_id)
+                    failed.update(entry_id for entry_id, _, _ in entries)
+                    continue
+                triggered += sum(len(results) for results in batch)
+
+        processed = [entry_id for entry_id, _ in raw_entries if entry_id not in failed]
+        if processed:
+            await self.redis.xack(INBOUND_STREAM, INBOUND_GROUP, *processed)
+        logger.debug("Processed %s inbound messages, %s responses triggered", len(processed), triggered)
+
+
+async def run_inbound_consumers() -> None:
+    settings = get_settings()
+    if settings.inbound_ingest_mode != "stream":
+        logger.warning(
+            "INBOUND_INGEST_MODE is %r; the API evaluates inbound messages itself and queues nothing",
+            settings.inbound_ingest_mode,
+        )
+
+    redis = Redis.from_url(settings.redis_url)
+    pool = InboundConsumerPool(redis)
+    main_task = asyncio.create_task(pool.run())
+
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, main_task.cancel)
+
+    try:
+        await main_task
+    except asyncio.CancelledError:
+        logger.info("Inbound consumer pool %s stopped", pool.name)
+    finally:
+        await redis.aclose()
@@ -1,17 +1,67 @@
+import argparse
+import asyncio
+
 from redis import Redis
-from rq import Queue, Worker
+from rq import Queue, SimpleWorker, Worker
 
 from app.core.config import get_settings
+from app.services.http_clients import close_http_clients
 
 
 def main() -> None:
+    parser = argparse.ArgumentParser(description="Run the MassSender background worker.")
+    parser.add_argument(
+        "--async",
+        dest="use_async",
+        action="store_true",
+        help="Drive campaigns from a single asyncio event loop instead of an RQ worker.",
+    )
+    parser.add_argument(
+        "--inbound",
+        action="store_true",
+        help="Evaluate auto-response rules for inbound messages queued on the Redis stream.",
+    )
+    parser.add_argument(
+        "--imports",
+        action="store_true",
+        help="Run contact import jobs, each in a forked work horse, instead of campaigns and auto-replies.",
+    )
+    parser.add_argument(
+        "--fork",
+        action="store_true",
+        help="Run each job in a forked work horse, at the cost of reconnecting HTTP clients per job.",
+    )
+    args = parser.parse_args()
+
+    if args.use_async:
+        from app.tasks.async_runtime import run_async_worker
+
+        asyncio.run(run_async_worker())
+        return
+
+    if args.inbound:
+        from app.tasks.inbound import run_inbound_consumers
+
+        asyncio.run(run_inbound_consumers())
+        return
+
     settings = get_settings()
     redis = Redis.from_url(settings.redis_url)
 
-    queues = [Queue(name, connection=redis) for name in ("campaigns", "automation")]
-
-    worker = Worker(queues)
-    worker.work(with_scheduler=True)
+    if args.imports:
+        # Imports run for up to an hour and load whole files, so they get a worker of their own and
+        # a fresh work horse per job; they make no outbound sends that would keep clients warm.
+        queue_names, worker_class = ("imports",), Worker
+    else:
+        # RQ drains queues in this order, so auto-replies never wait behind a campaign backlog. Jobs
+        # run in this process by default so the keep-alive HTTP clients outlive each job.
+        queue_names = ("automation", "campaigns")
+        worker_class = Worker if args.fork else SimpleWorker
+    worker = worker_class([Queue(name, connection=redis) for name in queue_names])
+    try:
+        worker.work(with_scheduler=True)
+    finally:
+        close_http_clients()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,42 @@
+import pytest
+from redis import Redis
+from redis.exceptions import RedisError
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+from app import models  # noqa: F401
+from app.core.config import get_settings
+from app.db.schema import ensure_schema_sync
+from app.db.session import Base
+
+
+@pytest.fixture
+async def live_backends():
+    """Empty Postgres and Redis from DATABASE_URL/REDIS_URL; the test is skipped when they are unreachable."""
+
+    settings = get_settings()
+    redis = Redis.from_url(settings.redis_url, socket_connect_timeout=1)
+    engine = create_engine(settings.sync_database_url, connect_args={"connect_timeout": 1})
+    try:
+        redis.ping()
+        with engine.begin() as conn:
+            Base.metadata.create_all(conn)
+            tables = ", ".join(table.name for table in Base.metadata.sorted_tables)
+            conn.execute(text(f"TRUNCATE {tables} CASCADE"))
+        ensure_schema_sync(engine)
+    except (OperationalError, RedisError) as exc:
+        engine.dispose()
+        pytest.skip(f"Postgres and Redis are not reachable: {exc}")
+    redis.flushdb()
+
+    yield
+
+    # The async engine and client pools belong to this test's event loop.
+    from app.db.session import engine as async_engine
+    from app.services import queue
+
+    await async_engine.dispose()
+    await queue.get_async_redis_connection().aclose()
+    queue._get_async_redis.cache_clear()
+    engine.dispose()
+    redis.close()
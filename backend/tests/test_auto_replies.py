@@ -0,0 +1,65 @@
+import json
+import uuid
+
+import pytest
+from rq import Queue
+
+from app.schemas.automation import AutoResponseResult
+from app.services import auto_replies
+from app.services.auto_replies import reply_entries
+from app.services.queue import get_redis_connection
+from app.tasks import automation
+
+
+def test_reply_entries_carry_what_the_delivery_job_sends() -> None:
+    rule_id = uuid.uuid4()
+    results = [
+        ("+6281234567890", AutoResponseResult(rule_id=rule_id, response_text="Thanks!", response_media_url=None)),
+        ("+6289876543210", AutoResponseResult(rule_id=rule_id, response_text=None, response_media_url="https://x/a.png")),
+    ]
+
+    entries = [json.loads(entry) for entry in reply_entries(results)]
+
+    assert entries == [
+        {"phone": "+6281234567890", "rule_id": str(rule_id), "body": "Thanks!", "media_url": None, "attempts": 0},
+        {"phone": "+6289876543210", "rule_id": str(rule_id), "body": "", "media_url": "https://x/a.png", "attempts": 0},
+    ]
+
+
+def _fill_outbox(user_id: uuid.UUID, *phones: str) -> None:
+    result = AutoResponseResult(rule_id=uuid.uuid4(), response_text="Thanks!", response_media_url=None)
+    get_redis_connection().rpush(f"automation:outbox:{user_id}", *reply_entries((phone, result) for phone in phones))
+
+
+def test_replies_left_by_a_crashed_job_are_taken_again(live_backends) -> None:
+    user_id = uuid.uuid4()
+    _fill_outbox(user_id, "+6281234567890", "+6289876543210", "+6281111111111")
+
+    first = auto_replies.take_replies(user_id, 2)
+    again = auto_replies.take_replies(user_id, 3)
+
+    assert [reply["phone"] for reply in first] == ["+6281234567890", "+6289876543210"]
+    assert [reply["phone"] for reply in again] == ["+6281234567890", "+6289876543210", "+6281111111111"]
+
+
+def test_unexpected_failure_returns_the_batch_and_reschedules(live_backends, monkeypatch) -> None:
+    user_id = uuid.uuid4()
+    _fill_outbox(user_id, "+6281234567890", "+6289876543210")
+    sent = []
+
+    def send_campaign_message(*, phone, body, media_url, document_url):
+        if sent:
+            raise RuntimeError("connection pool closed")
+        sent.append(phone)
+
+    monkeypatch.setattr(automation, "send_campaign_message", send_campaign_message)
+
+    with pytest.raises(RuntimeError):
+        automation.deliver_auto_replies(str(user_id))
+
+    redis = get_redis_connection()
+    outbox = [json.loads(raw) for raw in redis.lrange(f"automation:outbox:{user_id}", 0, -1)]
+    assert sent == ["+6281234567890"]
+    assert [(reply["phone"], reply["attempts"]) for reply in outbox] == [("+6289876543210", 1)]
+    assert not redis.exists(f"automation:outbox:{user_id}:processing")
+    assert Queue(auto_replies.AUTOMATION_QUEUE, connection=redis).scheduled_job_registry.count == 1
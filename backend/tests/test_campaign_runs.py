@@ -0,0 +1,133 @@
+from collections import Counter
+from datetime import UTC, datetime, timedelta
+
+from rq import Queue
+from rq.job import Job
+from sqlalchemy import select
+
+from app.core.config import get_settings
+from app.core.security import get_password_hash
+from app.db.session import async_session
+from app.models import CampaignRecipient, CampaignStatus, Contact, ContactList, ContactSource, DeliveryStatus, User
+from app.schemas.campaigns import CampaignCreate
+from app.services import campaigns as campaign_service
+from app.services import quota
+from app.services.messaging import MessagingError, MessagingRetryableError
+from app.services.queue import get_redis_connection
+
+
+def _take_jobs() -> list[Job]:
+    """Remove every pending campaigns job from RQ and return them, whatever their due time."""
+
+    queue = Queue("campaigns", connection=get_redis_connection())
+    registry = queue.scheduled_job_registry
+    job_ids = [*registry.get_job_ids(), *queue.get_job_ids()]
+    for job_id in job_ids:
+        registry.remove(job_id)
+    queue.empty()
+    return Job.fetch_many(job_ids, connection=queue.connection)
+
+
+async def test_retry_fired_while_paused_is_sent_once_after_resume(live_backends, monkeypatch) -> None:
+    # Imported here: the task modules open the worker's database engine on import.
+    from app.tasks import campaigns as campaign_tasks
+
+    monkeypatch.setattr(get_settings(), "campaign_dispatch_mode", "recipient")
+    sends: Counter[str] = Counter()
+    failing = {"+628111000001"}
+
+    def send_campaign_message(*, phone, body, media_url, document_url):
+        if phone in failing:
+            failing.discard(phone)
+            raise MessagingRetryableError("session busy")
+        sends[phone] += 1
+
+    monkeypatch.setattr(campaign_tasks, "send_campaign_message", send_campaign_message)
+
+    async with async_session() as db:
+        user = User(email="runs@example.com", hashed_password=get_password_hash("secret"), points_balance=100)
+        contact_list = ContactList(user=user, name="Customers", source=ContactSource.UPLOAD, total_contacts=2)
+        db.add_all(
+            [
+                user,
+                contact_list,
+                Contact(contact_list=contact_list, name="Ayu", phone_e164="+628111000001"),
+                Contact(contact_list=contact_list, name="Budi", phone_e164="+628111000002"),
+            ]
+        )
+        await db.commit()
+        payload = CampaignCreate(name="Promo", template_body="Hi {{name}}", list_id=contact_list.id)
+        campaign, _ = await campaign_service.create_campaign(db, user, payload)
+        await campaign_service.start_campaign(db, user, campaign)
+        rows = await db.execute(select(CampaignRecipient.id, CampaignRecipient.phone_e164))
+        phones = {str(recipient_id): phone for recipient_id, phone in rows}
+
+    first_run = {phones[job.args[0]]: job for job in _take_jobs()}
+    first_run["+628111000001"].func(*first_run["+628111000001"].args)
+    [retry] = _take_jobs()
+
+    async with async_session() as db:
+        campaign = await db.merge(campaign)
+        await campaign_service.pause_campaign(db, campaign)
+    retry.func(*retry.args)
+
+    async with async_session() as db:
+        campaign = await db.merge(campaign)
+        await campaign_service.resume_campaign(db, campaign)
+    first_run["+628111000002"].func(*first_run["+628111000002"].args)
+    assert not sends
+
+    for job in _take_jobs():
+        job.func(*job.args)
+
+    assert sends == {"+628111000001": 1, "+628111000002": 1}
+    async with async_session() as db:
+        campaign = await db.merge(campaign)
+        await db.refresh(campaign)
+        statuses = (await db.execute(select(CampaignRecipient.status))).scalars().all()
+    assert campaign.status == CampaignStatus.COMPLETED
+    assert statuses == [DeliveryStatus.SENT, DeliveryStatus.SENT]
+
+
+async def test_failure_on_a_later_day_releases_that_days_quota(live_backends, monkeypatch) -> None:
+    from app.tasks import campaigns as campaign_tasks
+
+    monkeypatch.setattr(get_settings(), "campaign_dispatch_mode", "recipient")
+    sends: Counter[str] = Counter()
+
+    def send_campaign_message(*, phone, body, media_url, document_url):
+        if phone == "+628111000001":
+            raise MessagingError("number not on WhatsApp")
+        sends[phone] += 1
+
+    monkeypatch.setattr(campaign_tasks, "send_campaign_message", send_campaign_message)
+
+    async with async_session() as db:
+        user = User(email="carry@example.com", hashed_password=get_password_hash("secret"), points_balance=100)
+        contact_list = ContactList(user=user, name="Customers", source=ContactSource.UPLOAD, total_contacts=2)
+        db.add_all(
+            [
+                user,
+                contact_list,
+                Contact(contact_list=contact_list, name="Ayu", phone_e164="+628111000001"),
+                Contact(contact_list=contact_list, name="Budi", phone_e164="+628111000002"),
+            ]
+        )
+        await db.commit()
+        payload = CampaignCreate(name="Promo", template_body="Hi {{name}}", list_id=contact_list.id)
+        campaign, _ = await campaign_service.create_campaign(db, user, payload)
+        await campaign_service.start_campaign(db, user, campaign)
+        # Carry the campaign over: it was admitted yesterday and today's counter starts afresh.
+        campaign.meta = {**campaign.meta, "quota_day": quota.quota_day(datetime.now(UTC) - timedelta(days=1))}
+        await db.commit()
+        rows = await db.execute(select(CampaignRecipient.id, CampaignRecipient.phone_e164))
+        phones = {str(recipient_id): phone for recipient_id, phone in rows}
+    today_key = f"quota:{user.id}:{quota.quota_day()}"
+    get_redis_connection().delete(today_key)
+
+    jobs = sorted(_take_jobs(), key=lambda job: phones[job.args[0]])
+    for job in jobs:
+        job.func(*job.args)
+
+    assert sends == {"+628111000002": 1}
+    assert int(get_redis_connection().get(today_key)) == 1
@@ -1,4 +1,10 @@
-from app.services.contacts import parse_contacts_file
+import io
+
+import pytest
+from openpyxl import Workbook
+
+from app.services import contacts
+from app.services.contacts import ContactImportError, parse_contacts_file
 
 
 def test_parse_contacts_valid_csv() -> None:
@@ -8,3 +14,77 @@ def test_parse_contacts_valid_csv() -> None:
     assert len(records) == 2
     assert records[0]["phone_e164"] == "+6281234567890"
     assert records[1]["phone_e164"].startswith("+")
+
+
+def test_parse_contacts_skips_non_consenting_and_duplicate_numbers() -> None:
+    csv_content = (
+        "name,phone_e164,consent,city\n"
+        "Ayu,+6281234567890,yes,Bandung\n"
+        "Ayu again,6281234567890,yes,Jakarta\n"
+        "Cici,6281234567892,no,Solo\n"
+        ",6281234567893,1,\n"
+    ).encode()
+    records = parse_contacts_file(csv_content, "contacts.csv")
+
+    assert [record["phone_e164"] for record in records] == ["+6281234567890", "+6281234567893"]
+    assert records[0]["metadata"]["city"] == "Bandung"
+    assert records[1]["name"] is None
+    assert records[1]["metadata"]["city"] is None
+
+
+def test_parse_contacts_reports_missing_headers_as_import_error() -> None:
+    with pytest.raises(ContactImportError, match="Missing required headers: consent"):
+        parse_contacts_file(b"name,phone_e164\nAyu,+6281234567890\n", "contacts.csv")
+
+
+def test_validate_numbers_in_process_pool(monkeypatch) -> None:
+    monkeypatch.setattr(contacts, "PARALLEL_VALIDATION_THRESHOLD", 2)
+    try:
+        formatted = contacts.validate_numbers(["+6281234567890", "+6281234567890", "+12"])
+    finally:
+        contacts.shutdown_validation_pool()
+
+    assert formatted == {"+6281234567890": "+6281234567890", "+12": None}
+
+
+def test_iter_contact_records_deduplicates_across_chunks() -> None:
+    csv_content = (
+        "name,phone_e164,consent\n"
+        "Ayu,6281234567890,yes\n"
+        "Bimo,6281234567891,yes\n"
+        "Ayu again,6281234567890,yes\n"
+    ).encode()
+    chunks = list(contacts.iter_contact_records(io.BytesIO(csv_content), "contacts.csv", chunk_size=2))
+
+    assert [[record["name"] for record in chunk] for chunk in chunks] == [["Ayu", "Bimo"]]
+
+
+def test_iter_contact_records_streams_xlsx() -> None:
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.append(["Name", "Phone_E164", "Consent"])
+    sheet.append(["Ayu", "+6281234567890", "yes"])
+    sheet.append(["Bimo", 6281234567891, "y"])
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    buffer.seek(0)
+
+    chunks = list(contacts.iter_contact_records(buffer, "contacts.xlsx", chunk_size=1))
+
+    assert [record["phone_e164"] for chunk in chunks for record in chunk] == ["+6281234567890", "+6281234567891"]
+
+
+def test_iter_contact_records_counts_rejected_and_duplicate_rows() -> None:
+    csv_content = (
+        "name,phone_e164,consent\n"
+        "Ayu,6281234567890,yes\n"
+        "Bimo,12,yes\n"
+        "Cici,6281234567892,no\n"
+        "Dodi,,yes\n"
+        "Ayu again,6281234567890,yes\n"
+    ).encode()
+    stats = contacts.ImportStats()
+    chunks = list(contacts.iter_contact_records(io.BytesIO(csv_content), "contacts.csv", stats=stats))
+
+    assert sum(len(chunk) for chunk in chunks) == 1
+    assert stats == contacts.ImportStats(processed=5, rejected=3, deduplicated=1, imported=1)
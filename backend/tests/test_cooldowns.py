@@ -0,0 +1,16 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from app.services.cooldowns import RedisCooldownStore
+
+
+async def test_cooldown_runs_from_the_message_timestamp(live_backends) -> None:
+    store = RedisCooldownStore(audit=False)
+    rule_id = uuid.uuid4()
+    # Messages received two hours ago and only processed now, as after a reclaim.
+    received = datetime.now(timezone.utc) - timedelta(hours=2)
+
+    assert await store.acquire(rule_id, "+6281234567890", 3600, received)
+    assert not await store.acquire(rule_id, "+6281234567890", 3600, received + timedelta(minutes=59))
+    assert await store.acquire(rule_id, "+6281234567890", 3600, received + timedelta(minutes=61))
+    assert not await store.acquire(rule_id, "+6281234567890", 3600, datetime.now(timezone.utc))
@@ -0,0 +1,17 @@
+import uuid
+
+from app.services.escrow import pack_recipient_ids, unpack_recipient_ids
+
+
+def test_recipient_ids_round_trip_through_packed_form() -> None:
+    recipient_ids = [uuid.uuid4() for _ in range(5)]
+
+    packed = pack_recipient_ids(recipient_ids)
+
+    assert len(packed) < 5 * 24
+    assert unpack_recipient_ids(packed) == recipient_ids
+
+
+def test_empty_recipient_list_packs_to_empty_string() -> None:
+    assert pack_recipient_ids([]) == ""
+    assert unpack_recipient_ids("") == []
@@ -0,0 +1,42 @@
+import io
+from datetime import datetime, timezone
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from app.api.streaming import _ChunkSink
+from app.models import CampaignRecipient, DeliveryStatus
+from app.services import exports
+
+
+def _recipient(status: DeliveryStatus, sent_at: datetime | None = None) -> CampaignRecipient:
+    return CampaignRecipient(
+        name="Ayu", phone_e164="+6281234567890", status=status, sent_at=sent_at, read_at=None, last_error=None
+    )
+
+
+def test_csv_row_formats_blanks_and_timestamps() -> None:
+    sent_at = datetime(2024, 5, 1, 8, 30, tzinfo=timezone.utc)
+    row = exports.csv_row(exports.RECIPIENT_COLUMNS, _recipient(DeliveryStatus.SENT, sent_at))
+
+    assert row == ["Ayu", "+6281234567890", "sent", "2024-05-01T08:30:00+00:00", "", ""]
+
+
+@pytest.mark.parametrize("export_format", ["parquet", "arrow"])
+def test_columnar_batches_round_trip_through_drained_sink(export_format: str) -> None:
+    schema = exports.arrow_schema(exports.RECIPIENT_COLUMNS)
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema) if export_format == "parquet" else pa.ipc.new_file(sink, schema)
+    chunks = []
+    for batch in ([_recipient(DeliveryStatus.SENT, datetime.now(timezone.utc))], [_recipient(DeliveryStatus.FAILED)]):
+        writer.write_batch(exports.arrow_batch(exports.RECIPIENT_COLUMNS, schema, batch))
+        chunks.append(sink.drain())
+    writer.close()
+    chunks.append(sink.drain())
+
+    data = io.BytesIO(b"".join(chunks))
+    table = pq.read_table(data) if export_format == "parquet" else pa.ipc.open_file(data).read_all()
+    assert table.column("status").to_pylist() == ["sent", "failed"]
+    assert pa.types.is_dictionary(table.schema.field("status").type)
+    assert pa.types.is_timestamp(table.schema.field("sent_at").type)
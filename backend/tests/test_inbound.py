@@ -0,0 +1,157 @@
+import asyncio
+import uuid
+from datetime import datetime, timezone
+
+from redis.exceptions import ConnectionError as RedisConnectionError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.security import get_password_hash
+from app.db.session import async_session
+from app.models import AutoResponseRule, TriggerType, User
+from app.schemas.automation import InboundMessage
+from app.services.inbound import (
+    INBOUND_DEAD_LETTER_STREAM,
+    INBOUND_GROUP,
+    INBOUND_STREAM,
+    decode_entries,
+    encode_entry,
+    enqueue_inbound,
+    ensure_consumer_group,
+    group_by_user,
+)
+from app.services.queue import get_async_redis_connection
+from app.tasks import inbound as inbound_tasks
+from app.tasks.inbound import InboundConsumerPool
+
+
+def _fields(user_id: uuid.UUID, message: str) -> dict[bytes, bytes]:
+    payload = InboundMessage(contact_phone="+6281234567890", message=message, timestamp=datetime.now(timezone.utc))
+    # Redis hands stream fields back as bytes.
+    return {name.encode(): value.encode() for name, value in encode_entry(user_id, payload).items()}
+
+
+def test_stream_entries_are_grouped_per_user_in_stream_order() -> None:
+    first, second = uuid.uuid4(), uuid.uuid4()
+    raw = [
+        (b"1-0", _fields(first, "hi")),
+        (b"2-0", _fields(second, "price?")),
+        (b"3-0", _fields(first, "hello again")),
+    ]
+
+    grouped = group_by_user(decode_entries(raw))
+
+    assert list(grouped) == [first, second]
+    assert [(entry_id, payload.message) for entry_id, _, payload in grouped[first]] == [
+        (b"1-0", "hi"),
+        (b"3-0", "hello again"),
+    ]
+    assert grouped[second][0][2].contact_phone == "+6281234567890"
+
+
+async def test_failed_user_group_is_retried_without_affecting_the_others(live_backends, monkeypatch) -> None:
+    async with async_session() as db:
+        users = [
+            User(email=f"inbound{index}@example.com", hashed_password=get_password_hash("secret")) for index in range(2)
+        ]
+        rules = [
+            AutoResponseRule(
+                user=user, name="Price", trigger_type=TriggerType.CONTAINS, trigger_value="price", response_text="Rp 10k"
+            )
+            for user in users
+        ]
+        db.add_all([*users, *rules])
+        await db.commit()
+    first, second = (user.id for user in users)
+
+    redis = get_async_redis_connection()
+    await ensure_consumer_group(redis)
+    for user_id in (first, second):
+        await enqueue_inbound(
+            user_id, InboundMessage(contact_phone="+6281234567890", message="price?", timestamp=datetime.now(timezone.utc))
+        )
+    [(_, entries)] = await redis.xreadgroup(INBOUND_GROUP, "test", {INBOUND_STREAM: ">"})
+
+    commit = AsyncSession.commit
+    calls = []
+
+    async def commit_failing_first_group(self) -> None:
+        calls.append(self)
+        if len(calls) == 1:
+            raise RuntimeError("connection lost")
+        await commit(self)
+
+    monkeypatch.setattr(AsyncSession, "commit", commit_failing_first_group)
+    pool = InboundConsumerPool(redis)
+    await pool._process(entries)
+
+    pending = await redis.xpending_range(INBOUND_STREAM, INBOUND_GROUP, min="-", max="+", count=10)
+    assert [entry["message_id"] for entry in pending] == [entries[0][0]]
+    assert await redis.llen(f"automation:outbox:{first}") == 0
+    assert await redis.llen(f"automation:outbox:{second}") == 1
+
+    # The retry triggers the rule again: the failed attempt gave its cooldown back.
+    await pool._process(entries[:1])
+    assert await redis.llen(f"automation:outbox:{first}") == 1
+
+
+async def _user_with_rule() -> uuid.UUID:
+    async with async_session() as db:
+        user = User(email="stream@example.com", hashed_password=get_password_hash("secret"))
+        rule = AutoResponseRule(
+            user=user, name="Price", trigger_type=TriggerType.CONTAINS, trigger_value="price", response_text="Rp 10k"
+        )
+        db.add_all([user, rule])
+        await db.commit()
+    return user.id
+
+
+async def test_malformed_entries_are_dead_lettered_and_the_rest_processed(live_backends) -> None:
+    user_id = await _user_with_rule()
+    redis = get_async_redis_connection()
+    await ensure_consumer_group(redis)
+    bad_id = await redis.xadd(INBOUND_STREAM, {"user_id": "not-a-uuid", "payload": "{}"})
+    await enqueue_inbound(
+        user_id, InboundMessage(contact_phone="+6281234567890", message="price?", timestamp=datetime.now(timezone.utc))
+    )
+    [(_, entries)] = await redis.xreadgroup(INBOUND_GROUP, "test", {INBOUND_STREAM: ">"})
+
+    await InboundConsumerPool(redis)._process(entries)
+
+    assert await redis.xpending_range(INBOUND_STREAM, INBOUND_GROUP, min="-", max="+", count=10) == []
+    [(_, dead)] = await redis.xrange(INBOUND_DEAD_LETTER_STREAM)
+    assert dead[b"entry_id"] == bad_id
+    assert await redis.llen(f"automation:outbox:{user_id}") == 1
+
+
+async def test_consumer_keeps_going_after_a_redis_error(live_backends, monkeypatch) -> None:
+    user_id = await _user_with_rule()
+    redis = get_async_redis_connection()
+    await ensure_consumer_group(redis)
+    await enqueue_inbound(
+        user_id, InboundMessage(contact_phone="+6281234567890", message="price?", timestamp=datetime.now(timezone.utc))
+    )
+
+    pool = InboundConsumerPool(redis)
+    xreadgroup = redis.xreadgroup
+    calls = []
+
+    async def xreadgroup_failing_once(*args, **kwargs):
+        calls.append(args)
+        if len(calls) == 1:
+            raise RedisConnectionError("connection reset")
+        return await xreadgroup(*args, **kwargs)
+
+    monkeypatch.setattr(redis, "xreadgroup", xreadgroup_failing_once)
+    monkeypatch.setattr(inbound_tasks, "_RETRY_MIN_SECONDS", 0)
+    consumer = asyncio.create_task(pool._consume("test"))
+    try:
+        for _ in range(50):
+            if await redis.llen(f"automation:outbox:{user_id}"):
+                break
+            await asyncio.sleep(0.1)
+    finally:
+        consumer.cancel()
+        await asyncio.gather(consumer, return_exceptions=True)
+
+    assert len(calls) >= 2
+    assert await redis.llen(f"automation:outbox:{user_id}") == 1
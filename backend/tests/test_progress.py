@@ -0,0 +1,70 @@
+import json
+import uuid
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.models import DeliveryStatus
+from app.services import progress
+from app.services.progress import (
+    events_channel,
+    install_commit_hook,
+    load_progress,
+    record_snapshot,
+    record_transition,
+    seed_progress,
+)
+from app.services.queue import get_async_redis_connection
+
+
+def test_record_transition_nets_moves_per_campaign() -> None:
+    session = Session()
+    campaign_id = uuid.uuid4()
+
+    record_transition(session, campaign_id, DeliveryStatus.QUEUED, DeliveryStatus.SENDING, 3)
+    record_transition(session, campaign_id, DeliveryStatus.SENDING, DeliveryStatus.SENT, 2)
+    record_transition(session, campaign_id, DeliveryStatus.SENDING, DeliveryStatus.SENDING)
+
+    deltas = session.info["campaign_progress_deltas"][campaign_id]
+    assert dict(deltas) == {"queued": -3, "sending": 1, "sent": 2}
+
+
+def test_snapshot_replaces_pending_deltas() -> None:
+    session = Session()
+    campaign_id = uuid.uuid4()
+
+    record_transition(session, campaign_id, DeliveryStatus.SENDING, DeliveryStatus.FAILED)
+    record_snapshot(session, campaign_id, {"total": 1, "failed": 1})
+
+    assert campaign_id not in session.info["campaign_progress_deltas"]
+    assert session.info["campaign_progress_snapshots"][campaign_id] == {"total": 1, "failed": 1}
+
+
+def test_commit_hook_is_limited_to_the_worker_sessionmaker() -> None:
+    worker_sessions = sessionmaker(class_=Session)
+
+    install_commit_hook(worker_sessions)
+
+    assert event.contains(worker_sessions, "after_commit", progress._apply_after_commit)
+    assert not event.contains(Session, "after_commit", progress._apply_after_commit)
+
+
+async def test_published_events_carry_the_seq_they_produced(live_backends) -> None:
+    campaign_id = uuid.uuid4()
+    await seed_progress(campaign_id, {"total": 2, "queued": 2})
+    pubsub = get_async_redis_connection().pubsub()
+    await pubsub.subscribe(events_channel(campaign_id))
+    await pubsub.get_message(timeout=1)
+
+    session = Session()
+    record_transition(session, campaign_id, DeliveryStatus.QUEUED, DeliveryStatus.SENDING)
+    progress._apply_after_commit(session)
+    record_snapshot(session, campaign_id, {"total": 2, "sent": 2})
+    progress._apply_after_commit(session)
+
+    delta = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1)
+    snapshot = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1)
+    await pubsub.aclose()
+    assert json.loads(delta["data"]) == {"type": "delta", "delta": {"queued": -1, "sending": 1}, "seq": 1}
+    assert json.loads(snapshot["data"])["seq"] == 2
+    assert (await load_progress(campaign_id))["seq"] == 2
@@ -0,0 +1,38 @@
+import time
+
+import pytest
+
+from app.services import regex_safety
+from app.services.regex_safety import UnsafePatternError, compile_pattern
+
+
+@pytest.mark.parametrize("pattern", [r"order #\d+", r"(?i)^(hi|hello)\b", r"(?i)price[s]?\s*list", r"\d{3,12}"])
+def test_linear_patterns_compile(pattern: str) -> None:
+    assert compile_pattern(pattern).search("Hello, order #42 and the PRICE list 0812345") is not None
+
+
+@pytest.mark.parametrize(
+    "pattern",
+    [r"(", r"(a)\1", r"foo(?=bar)", r"(?<!x)y", r"(?>ab)c", r"a++", r"x{1001}", r"x{2,5000}"],
+)
+def test_unsupported_patterns_are_rejected(pattern: str) -> None:
+    with pytest.raises(UnsafePatternError):
+        compile_pattern(pattern)
+
+
+@pytest.mark.parametrize("pattern", [r"(a|a)*c", r"(a|aa)*c", r"^(\w+\s?)*$"])
+def test_backtracking_patterns_run_within_the_budget(pattern: str) -> None:
+    # Python's re needs seconds on these; RE2 stays linear.
+    compiled = compile_pattern(pattern)
+    started = time.perf_counter()
+
+    assert compiled.search("a" * 26 + "!") is None
+
+    assert time.perf_counter() - started < 0.05
+
+
+def test_patterns_are_refused_without_re2(monkeypatch) -> None:
+    monkeypatch.setattr(regex_safety, "re2", None)
+
+    with pytest.raises(UnsafePatternError, match="google-re2"):
+        compile_pattern(r"order #\d+")
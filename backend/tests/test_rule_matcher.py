@@ -0,0 +1,54 @@
+import uuid
+
+from app.models import AutoResponseRule, TriggerType
+from app.services.rule_matcher import MAX_REGEX_INPUT_CHARS, AhoCorasick, compile_rules
+
+
+def _rule(trigger_type: TriggerType, trigger_value: str) -> AutoResponseRule:
+    return AutoResponseRule(
+        id=uuid.uuid4(),
+        user_id=uuid.uuid4(),
+        name=trigger_value,
+        trigger_type=trigger_type,
+        trigger_value=trigger_value,
+        response_text=trigger_value,
+        response_media_url=None,
+        cooldown_seconds=3600,
+        active_windows=[],
+    )
+
+
+def test_aho_corasick_finds_overlapping_patterns() -> None:
+    automaton = AhoCorasick([("he", 0), ("she", 1), ("his", 2), ("hers", 3)])
+
+    assert automaton.search("ushers") == {0, 1, 3}
+    assert automaton.search("this") == {2}
+    assert automaton.search("nothing") == set()
+
+
+def test_rule_matcher_matches_each_trigger_type_in_rule_order() -> None:
+    rules = [
+        _rule(TriggerType.CONTAINS, "price"),
+        _rule(TriggerType.KEYWORD, "Hello"),
+        _rule(TriggerType.REGEX, r"order #\d+"),
+        _rule(TriggerType.REGEX, "("),
+        _rule(TriggerType.CONTAINS, "refund"),
+    ]
+    matcher = compile_rules(rules)
+
+    assert [rule.id for rule in matcher.match("HELLO")] == [rules[1].id]
+    assert [rule.id for rule in matcher.match("Refund for order #42, what PRICE?")] == [
+        rules[0].id,
+        rules[2].id,
+        rules[4].id,
+    ]
+    assert matcher.match("hello there") == []
+
+
+def test_regex_rules_only_see_the_start_of_long_messages() -> None:
+    rule = _rule(TriggerType.REGEX, r"unsubscribe$")
+    matcher = compile_rules([rule, _rule(TriggerType.REGEX, r"(a)\1")])
+
+    assert len(matcher.regexes) == 1
+    assert [matched.id for matched in matcher.match("please unsubscribe")] == [rule.id]
+    assert matcher.match("x" * MAX_REGEX_INPUT_CHARS + " unsubscribe") == []
@@ -0,0 +1,24 @@
+import asyncio
+import gzip
+import zlib
+
+from app.api.streaming import gzip_chunks
+
+
+async def _collect(chunks) -> list[bytes]:
+    return [chunk async for chunk in chunks]
+
+
+async def _source(parts: list[bytes]):
+    for part in parts:
+        yield part
+
+
+def test_gzip_chunks_yields_one_decodable_member_per_stream() -> None:
+    parts = [b"name,phone\n", b"Ayu,+6281234567890\n", b"Bimo,+6281234567891\n"]
+    chunks = asyncio.run(_collect(gzip_chunks(_source(parts))))
+
+    assert len(chunks) == len(parts) + 1
+    assert gzip.decompress(b"".join(chunks)) == b"".join(parts)
+    # Every flushed prefix already decodes to the rows written so far.
+    assert zlib.decompressobj(wbits=zlib.MAX_WBITS | 16).decompress(chunks[0]) == parts[0]
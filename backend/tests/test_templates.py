@@ -0,0 +1,35 @@
+import uuid
+
+from app.services.templates import (
+    campaign_template,
+    compile_template,
+    recipient_context,
+)
+
+
+def test_compiled_template_renders_builtins_and_contact_columns() -> None:
+    template = compile_template("Hi {{ name }}, your order from {{city}} ships to {{phone}}.")
+
+    assert template.variables == ["name", "city", "phone"]
+    assert template.contact_variables == ["city"]
+
+    context = recipient_context("Ayu", "+6281234567890", {"city": "Bandung"})
+    assert template.render(context) == "Hi Ayu, your order from Bandung ships to +6281234567890."
+
+
+def test_render_many_leaves_missing_variables_blank() -> None:
+    template = compile_template("{{name}} / {{tier}}")
+
+    bodies = template.render_many(
+        [recipient_context("Ayu", "+1", {"tier": "gold"}), recipient_context(None, "+2", {})]
+    )
+
+    assert bodies == ["Ayu / gold", " / "]
+
+
+def test_campaign_template_is_reparsed_only_when_the_body_changes() -> None:
+    campaign_id = uuid.uuid4()
+
+    first = campaign_template(campaign_id, "Hello {{name}}")
+    assert campaign_template(campaign_id, "Hello {{name}}") is first
+    assert campaign_template(campaign_id, "Bye {{name}}") is not first
@@ -0,0 +1,17 @@
+from app.services.throttle import plan_slots
+
+
+def test_plan_slots_spaces_sends_within_throttle_range() -> None:
+    slots, following = plan_slots(100.0, 2, 5, limit=10)
+
+    assert len(slots) == 10
+    assert slots[0] == 100.0
+    gaps = [b - a for a, b in zip(slots, slots[1:] + [following])]
+    assert all(2 <= gap <= 5 for gap in gaps)
+
+
+def test_plan_slots_stops_at_deadline() -> None:
+    slots, following = plan_slots(100.0, 2, 2, limit=10, deadline=104.0)
+
+    assert slots == [100.0, 102.0, 104.0]
+    assert following == 106.0
@@ -0,0 +1,59 @@
+from datetime import datetime, timezone
+from zoneinfo import ZoneInfo
+
+from app.services.windows import compile_windows, window_key
+
+JAKARTA = ZoneInfo("Asia/Jakarta")
+
+
+def test_window_index_checks_day_and_time_in_the_schedule_timezone() -> None:
+    index = compile_windows(window_key([{"day_of_week": 0, "start_time": "09:00", "end_time": "17:00"}]), "Asia/Jakarta")
+
+    # 2024-01-01 was a Monday; 02:30 UTC is 09:30 in Jakarta.
+    assert index.is_open(datetime(2024, 1, 1, 2, 30, tzinfo=timezone.utc))
+    assert not index.is_open(datetime(2024, 1, 1, 1, 30, tzinfo=timezone.utc))
+    assert not index.is_open(datetime(2024, 1, 2, 2, 30, tzinfo=timezone.utc))
+
+
+def test_window_end_minute_is_inclusive() -> None:
+    index = compile_windows(window_key([{"day_of_week": 0, "start_time": "09:00", "end_time": "17:00"}]), "Asia/Jakarta")
+
+    at_end = datetime(2024, 1, 1, 17, 0, tzinfo=JAKARTA)
+    assert index.is_open(at_end)
+    assert index.next_open(at_end) == at_end
+    assert not index.is_open(datetime(2024, 1, 1, 17, 1, tzinfo=JAKARTA))
+    assert index.is_open(datetime(2024, 1, 1, 9, 0, tzinfo=JAKARTA))
+
+
+def test_overlapping_windows_merge_and_overnight_windows_wrap() -> None:
+    windows = window_key(
+        [
+            {"day_of_week": 2, "start_time": "09:00", "end_time": "12:00"},
+            {"day_of_week": 2, "start_time": "11:00", "end_time": "14:00"},
+            {"day_of_week": 6, "start_time": "22:00", "end_time": "02:00"},
+        ]
+    )
+    index = compile_windows(windows, "Asia/Jakarta")
+
+    assert len(index.starts) == 3  # Wednesday merged; Sunday night split across the week boundary
+    assert index.is_open(datetime(2024, 1, 3, 13, 0, tzinfo=JAKARTA))
+    assert index.is_open(datetime(2024, 1, 7, 23, 0, tzinfo=JAKARTA))
+    assert index.is_open(datetime(2024, 1, 8, 1, 0, tzinfo=JAKARTA))
+    assert not index.is_open(datetime(2024, 1, 8, 3, 0, tzinfo=JAKARTA))
+
+
+def test_next_open_wraps_into_the_following_week() -> None:
+    index = compile_windows(window_key([{"day_of_week": 0, "start_time": "09:00", "end_time": "17:00"}]), "Asia/Jakarta")
+
+    inside = datetime(2024, 1, 1, 10, 0, tzinfo=JAKARTA)
+    assert index.next_open(inside) == inside
+    assert index.next_open(datetime(2024, 1, 1, 18, 0, tzinfo=JAKARTA)) == datetime(2024, 1, 8, 9, 0, tzinfo=JAKARTA)
+    assert compile_windows((), "Asia/Jakarta").next_open(inside) is None
+
+
+def test_next_open_keeps_wall_clock_time_across_dst() -> None:
+    index = compile_windows(window_key([{"day_of_week": 0, "start_time": "09:00", "end_time": "10:00"}]), "Europe/Berlin")
+
+    # Clocks go forward on Sunday 2024-03-31; Monday 09:00 is then UTC+2.
+    opens = index.next_open(datetime(2024, 3, 30, 12, 0, tzinfo=timezone.utc))
+    assert opens == datetime(2024, 4, 1, 7, 0, tzinfo=timezone.utc)
@@ -1,38 +1,70 @@
 "use client";
 
-import { useState } from "react";
+import { useEffect, useState } from "react";
 import { useMutation, useQuery } from "@tanstack/react-query";
 
 import { ExcelUploader } from "@/components/excel-uploader";
 import { apiClient } from "@/lib/api-client";
-import type { ContactList } from "@/types/api";
+import type { ContactImport, ContactList } from "@/types/api";
 
 const fetchLists = async () => {
   const { data } = await apiClient.get<ContactList[]>("/contacts/lists");
   return data;
 };
 
+const ACTIVE_IMPORT_STATUSES = new Set(["queued", "started", "deferred", "scheduled"]);
+
+const fetchImport = async (jobId: string) => {
+  const { data } = await apiClient.get<ContactImport>(`/contacts/imports/${jobId}`);
+  return data;
+};
+
 export default function UploadContactsPage() {
   const [selectedFile, setSelectedFile] = useState<File | null>(null);
   const [name, setName] = useState("Classmates");
   const [message, setMessage] = useState<string | null>(null);
+  const [importJobId, setImportJobId] = useState<string | null>(null);
 
   const { data: lists, refetch } = useQuery({ queryKey: ["contact-lists"], queryFn: fetchLists });
 
+  const { data: importJob } = useQuery({
+    queryKey: ["contact-import", importJobId],
+    queryFn: () => fetchImport(importJobId as string),
+    enabled: importJobId !== null,
+    refetchInterval: (query) =>
+      query.state.data && !ACTIVE_IMPORT_STATUSES.has(query.state.data.status) ? false : 1000,
+  });
+
+  useEffect(() => {
+    if (!importJob) return;
+    if (importJob.status === "finished") {
+      setMessage(
+        `Imported ${importJob.imported} contacts to ${name} (${importJob.rejected} rejected, ${importJob.deduplicated} duplicates)`,
+      );
+      setImportJobId(null);
+      void refetch();
+    } else if (importJob.status === "failed") {
+      setMessage(importJob.error ?? "Failed to import contacts");
+      setImportJobId(null);
+    } else {
+      setMessage(`Importing... ${importJob.processed} rows processed`);
+    }
+  }, [importJob, name, refetch]);
+
   const uploadMutation = useMutation({
     mutationFn: async () => {
       if (!selectedFile) throw new Error("No file selected");
       const formData = new FormData();
       formData.append("file", selectedFile);
       formData.append("name", name);
-      const { data } = await apiClient.post<ContactList>("/contacts/upload", formData, {
+      const { data } = await apiClient.post<ContactImport>("/contacts/upload", formData, {
         headers: { "Content-Type": "multipart/form-data" },
       });
       return data;
     },
     onSuccess: (data) => {
-      setMessage(`Uploaded ${data.total_contacts} contacts to ${data.name}`);
-      void refetch();
+      setMessage("Upload received, importing...");
+      setImportJobId(data.job_id);
     },
     onError: (error) => {
       console.error(error);
@@ -61,7 +93,7 @@ export default function UploadContactsPage() {
           <ExcelUploader onFileSelected={setSelectedFile} />
           <button
             onClick={() => uploadMutation.mutate()}
-            disabled={!selectedFile || uploadMutation.isPending}
+            disabled={!selectedFile || uploadMutation.isPending || importJobId !== null}
             className="rounded-lg bg-slate-900 px-4 py-2 text-sm font-semibold text-white transition hover:bg-slate-800 disabled:opacity-60"
           >
             {uploadMutation.isPending ? "Uploading..." : "Upload contacts"}
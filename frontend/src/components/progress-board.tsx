@@ -16,7 +16,31 @@ const deriveWsUrl = (campaignId: string, token: string) => {
   return `${base}/api/campaigns/ws/${campaignId}?token=${token}`;
 };
 
-type Progress = CampaignProgress & { status: string };
+// A delta whose seq is not above the last snapshot's is already included in it.
+type Progress = CampaignProgress & { status: string; seq?: number };
+
+type ProgressEvent =
+  | ({ type: "snapshot" } & Partial<Progress>)
+  | { type: "delta"; seq?: number; delta: Partial<Record<keyof CampaignProgress, number>> }
+  | { type: "status"; status: string };
+
+const RECIPIENT_REFRESH_MS = 2000;
+
+const applyEvent = (current: Progress | null, event: ProgressEvent): Progress | null => {
+  if (event.type === "snapshot") {
+    const { type: _type, ...snapshot } = event;
+    return { ...(current ?? { status: "unknown" }), ...snapshot } as Progress;
+  }
+  if (!current) return current;
+  if (event.type === "status") return { ...current, status: event.status };
+  if (event.seq !== undefined && current.seq !== undefined && event.seq <= current.seq) return current;
+  const next = { ...current, seq: event.seq ?? current.seq };
+  for (const [key, value] of Object.entries(event.delta)) {
+    const field = key as keyof CampaignProgress;
+    next[field] = Number(next[field] ?? 0) + Number(value ?? 0);
+  }
+  return next;
+};
 
 export const ProgressBoard = ({ campaignId }: { campaignId: string }) => {
   const [progress, setProgress] = useState<Progress | null>(null);
@@ -31,15 +55,25 @@ export const ProgressBoard = ({ campaignId }: { campaignId: string }) => {
     const token = getAccessToken() ?? loadTokens()?.access_token;
     if (!campaignId || !token) return;
     const ws = new WebSocket(deriveWsUrl(campaignId, token));
+    let refreshTimer: ReturnType<typeof setTimeout> | null = null;
     ws.onmessage = (event) => {
-      const payload = JSON.parse(event.data) as Progress;
-      setProgress(payload);
-      void refetch();
+      const payload = JSON.parse(event.data) as ProgressEvent;
+      setProgress((current) => applyEvent(current, payload));
+      // Counters update on every event; the recipient table only needs an occasional refresh.
+      if (!refreshTimer) {
+        refreshTimer = setTimeout(() => {
+          refreshTimer = null;
+          void refetch();
+        }, RECIPIENT_REFRESH_MS);
+      }
     };
     ws.onerror = () => {
       console.warn("WebSocket error");
     };
-    return () => ws.close();
+    return () => {
+      if (refreshTimer) clearTimeout(refreshTimer);
+      ws.close();
+    };
   }, [campaignId, refetch]);
 
   const totals = useMemo(() => {
@@ -42,6 +42,17 @@ export type ContactList = {
   created_at: string;
 };
 
+export type ContactImport = {
+  job_id: string;
+  status: string;
+  processed: number;
+  rejected: number;
+  deduplicated: number;
+  imported: number;
+  list_id?: string | null;
+  error?: string | null;
+};
+
 export type Contact = {
   id: string;
   name?: string | null;
@@ -66,6 +77,10 @@ export type Campaign = {
   started_at?: string | null;
   completed_at?: string | null;
   created_at: string;
+  total_recipients: number;
+  sent_count: number;
+  failed_count: number;
+  skipped_recipients?: number | null;
 };
 
 export type CampaignProgress = {
@@ -93,6 +108,7 @@ export type CampaignRecipient = {
 
 export type WalletSummary = {
   balance: number;
+  reserved: number;
   plan_expires_at?: string | null;
   points_per_recipient: number;
   max_daily_recipients: number;
@@ -109,6 +125,7 @@ export type WalletTransaction = {
   points: number;
   balance_after: number;
   reference?: string | null;
+  recipients?: number | null;
   expires_at?: string | null;
   created_at: string;
 };